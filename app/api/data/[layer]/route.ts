@@ -15,6 +15,30 @@ const hasRealData = {
   'solar-flares': true // NOAA SWPC doesn't need API key
 }
 
+interface LayerManifest {
+  hash: string
+  etag: string
+  count: number
+  bytes: number
+  updated_at: string
+}
+
+async function readManifest(manifestPath: string): Promise<LayerManifest | null> {
+  try {
+    return JSON.parse(await fs.readFile(manifestPath, 'utf-8'))
+  } catch {
+    return null
+  }
+}
+
+// If-None-Match may list several ETags, weak ones (W/"...") included, or be *
+function matchesEtag(header: string | null, etag: string): boolean {
+  if (!header) return false
+  if (header.trim() === '*') return true
+  const opaque = etag.replace(/^W\//, '')
+  return header.split(',').some(tag => tag.trim().replace(/^W\//, '') === opaque)
+}
+
 export async function GET(
   request: NextRequest,
   { params }: { params: Promise<{ layer: string }> }
@@ -44,7 +68,25 @@ export async function GET(
 
   try {
     // Read data from public/data directory
-    const filePath = path.join(process.cwd(), 'public', 'data', fileName)
+    const dataDir = path.join(process.cwd(), 'public', 'data')
+    const filePath = path.join(dataDir, fileName)
+    const dataMode = hasRealData[layer as keyof typeof hasRealData] ? 'live' : 'demo'
+
+    // The ingest scripts write a manifest with a content hash per layer,
+    // so conditional requests can be answered without reading the layer
+    const manifest = await readManifest(path.join(dataDir, 'manifests', fileName))
+    const layerSize = await fs.stat(filePath).then(stat => stat.size, () => -1)
+    // A size mismatch means the layer and manifest are mid-update; skip the ETag
+    const etag = manifest?.etag && manifest.bytes === layerSize
+      ? `${manifest.etag.slice(0, -1)}-${dataMode}"`
+      : null
+    const cacheHeaders: Record<string, string> = etag
+      ? { ETag: etag, 'Cache-Control': 'public, max-age=0, must-revalidate' }
+      : {}
+
+    if (etag && matchesEtag(request.headers.get('if-none-match'), etag)) {
+      return new NextResponse(null, { status: 304, headers: cacheHeaders })
+    }
     
     // Check if file exists, if not return empty GeoJSON
     try {
@@ -58,13 +100,13 @@ export async function GET(
         metadata: {
           ...jsonData.metadata,
           isRealData: hasRealData[layer as keyof typeof hasRealData] || false,
-          dataMode: hasRealData[layer as keyof typeof hasRealData] ? 'live' : 'demo',
+          dataMode,
           apiKeyPresent: layer === 'earthquakes' ? 'not_required' : 
                         (hasRealData[layer as keyof typeof hasRealData] ? 'yes' : 'no')
         }
       }
       
-      return NextResponse.json(enrichedData)
+      return NextResponse.json(enrichedData, { headers: cacheHeaders })
     } catch {
       // Return empty GeoJSON if file doesn't exist
       return NextResponse.json({
@@ -0,0 +1,163 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { promises as fs } from 'fs'
+import path from 'path'
+
+// Layer names as in /api/data/[layer]; history directories are named after the data files
+const historyDirs: Record<string, string> = {
+  'fires': 'nasa-firms',
+  'earthquakes': 'usgs-earthquakes',
+  'weather': 'openweather',
+  'emissions': 'carbon-monitor',
+  'noaa-alerts': 'noaa-alerts',
+  'nasa-eonet': 'nasa-eonet',
+  'air-quality': 'air-quality',
+  'volcanoes': 'volcanoes',
+  'solar-flares': 'solar-flares'
+}
+
+const MAX_WINDOW_DAYS = 90
+const DEFAULT_LIMIT = 10000
+const MAX_LIMIT = 50000
+const COMPACTED = 'compacted.ndjson'
+
+type BBox = [number, number, number, number] // west, south, east, north
+
+// "west,south,east,north"; west > east crosses the antimeridian
+function parseBBox(value: string | null): BBox | null | undefined {
+  if (value === null) return undefined
+  const parts = value.split(',').map(Number)
+  return parts.length === 4 && parts.every(Number.isFinite) ? (parts as BBox) : null
+}
+
+function positions(coordinates: unknown, out: number[][] = []): number[][] {
+  if (Array.isArray(coordinates) && typeof coordinates[0] === 'number') {
+    out.push(coordinates as number[])
+  } else if (Array.isArray(coordinates)) {
+    for (const part of coordinates) positions(part, out)
+  }
+  return out
+}
+
+// Same test as _in_bbox in scripts/ingest/history.py: the feature's bbox property, else its geometry's extent
+function intersects(feature: any, [west, south, east, north]: BBox): boolean {
+  let box = feature?.properties?.bbox
+  if (!Array.isArray(box) || box.length !== 4) {
+    const points = positions(feature?.geometry?.coordinates)
+    if (!points.length) return false
+    const lons = points.map(p => p[0])
+    const lats = points.map(p => p[1])
+    box = [Math.min(...lons), Math.min(...lats), Math.max(...lons), Math.max(...lats)]
+  }
+  if (box[3] < south || box[1] > north) return false
+  return west <= east ? box[2] >= west && box[0] <= east : box[2] >= west || box[0] <= east
+}
+
+// Same merge order as scripts/ingest/history.py: compacted file first, then run segments oldest first
+async function partitionFiles(dir: string): Promise<string[]> {
+  const names = (await fs.readdir(dir)).filter(name => name.endsWith('.ndjson') && !name.startsWith('.'))
+  const segments = names.filter(name => name !== COMPACTED).sort()
+  return names.includes(COMPACTED) ? [COMPACTED, ...segments] : segments
+}
+
+// Lines are "<epoch seconds>\t<feature key>\t<feature JSON>"; the latest run's copy of a feature wins
+async function readPartition(dir: string, start: number, end: number): Promise<[number, string][]> {
+  const latest = new Map<string, [number, string]>()
+  for (const name of await partitionFiles(dir)) {
+    let text: string
+    try {
+      text = await fs.readFile(path.join(dir, name), 'utf-8')
+    } catch {
+      continue // compacted away since the listing; compacted.ndjson holds it now
+    }
+    for (const line of text.split('\n')) {
+      if (!line) continue
+      const first = line.indexOf('\t')
+      const second = line.indexOf('\t', first + 1)
+      const stamp = line.slice(0, first)
+      const key = line.slice(first + 1, second)
+      const seconds = stamp ? Number(stamp) : -Infinity
+      if (!stamp || (seconds >= start && seconds < end)) {
+        latest.set(key, [seconds, line.slice(second + 1)])
+      } else {
+        latest.delete(key)
+      }
+    }
+  }
+  return [...latest.values()].sort((a, b) => a[0] - b[0])
+}
+
+export async function GET(
+  request: NextRequest,
+  { params }: { params: Promise<{ layer: string }> }
+) {
+  const { layer } = await params
+  const historyDir = historyDirs[layer]
+  if (!historyDir) {
+    return NextResponse.json({ error: 'Invalid layer specified' }, { status: 400 })
+  }
+
+  const { searchParams } = new URL(request.url)
+  const end = searchParams.get('end') ? new Date(searchParams.get('end')!) : new Date()
+  const start = searchParams.get('start')
+    ? new Date(searchParams.get('start')!)
+    : new Date(end.getTime() - 7 * 24 * 60 * 60 * 1000)
+  if (isNaN(start.getTime()) || isNaN(end.getTime()) || start >= end) {
+    return NextResponse.json({ error: 'Invalid time window' }, { status: 400 })
+  }
+  if (end.getTime() - start.getTime() > MAX_WINDOW_DAYS * 24 * 60 * 60 * 1000) {
+    return NextResponse.json({ error: `Time window is limited to ${MAX_WINDOW_DAYS} days` }, { status: 400 })
+  }
+  const limit = Math.min(Number(searchParams.get('limit') ?? DEFAULT_LIMIT), MAX_LIMIT)
+  if (!Number.isInteger(limit) || limit < 1) {
+    return NextResponse.json({ error: 'Invalid limit' }, { status: 400 })
+  }
+  const bbox = parseBBox(searchParams.get('bbox'))
+  if (bbox === null) {
+    return NextResponse.json({ error: 'bbox must be west,south,east,north' }, { status: 400 })
+  }
+  const kind = searchParams.get('type')
+
+  try {
+    const root = path.join(process.cwd(), 'public', 'data', 'history', historyDir)
+    const days = await fs.readdir(root).catch(() => [] as string[])
+    // Only the day partitions overlapping the window are read
+    const firstDay = start.toISOString().slice(0, 10)
+    const lastDay = new Date(end.getTime() - 1).toISOString().slice(0, 10)
+    const selected = days.filter(day => !day.startsWith('.') && day >= firstDay && day <= lastDay).sort()
+
+    const startSeconds = start.getTime() / 1000
+    const endSeconds = end.getTime() / 1000
+    // Partitions are read oldest first and reading stops once the limit is reached
+    const features = []
+    let truncated = false
+    scan: for (const day of selected) {
+      for (const [, encoded] of await readPartition(path.join(root, day), startSeconds, endSeconds)) {
+        const feature = JSON.parse(encoded)
+        if (kind && feature?.properties?.type !== kind) continue
+        if (bbox && !intersects(feature, bbox)) continue
+        if (features.length === limit) {
+          truncated = true
+          break scan
+        }
+        features.push(feature)
+      }
+    }
+
+    return NextResponse.json({
+      type: 'FeatureCollection',
+      metadata: {
+        source: layer,
+        start: start.toISOString(),
+        end: end.toISOString(),
+        days: selected,
+        total_features: features.length,
+        limit,
+        truncated
+      },
+      features
+    })
+  } catch (error) {
+    console.error('Error reading history:', error)
+    return NextResponse.json({ error: 'Failed to load history' }, { status: 500 })
+  }
+}
@@ -0,0 +1,90 @@
+'use client'
+
+import { useState, useEffect, useCallback } from 'react'
+import dynamic from 'next/dynamic'
+import LayerToggle from '@/components/LayerToggle'
+import TimeSlider, { HistoryCollection } from '@/components/TimeSlider'
+import DataPanel from '@/components/DataPanel'
+import { fetchColumnarLayer, toFeatureCollection } from '@/lib/columnar'
+
+// Mapbox touches window on import
+const GlobalMap = dynamic(() => import('@/components/GlobalMap'), {
+  loading: () => <div className="w-full h-full bg-gray-900 animate-pulse" />,
+  ssr: false
+})
+
+const DAY_MS = 24 * 60 * 60 * 1000
+
+// Layer ids -> layer files, as in /api/data/[layer]
+const LAYER_FILES: Record<string, string> = {
+  'fires': 'nasa-firms',
+  'earthquakes': 'usgs-earthquakes',
+  'weather': 'openweather',
+  'emissions': 'carbon-monitor',
+  'noaa-alerts': 'noaa-alerts',
+  'nasa-eonet': 'nasa-eonet',
+  'air-quality': 'air-quality',
+  'volcanoes': 'volcanoes',
+  'solar-flares': 'solar-flares'
+}
+
+// Point layers have a columnar export, a fraction of the GeoJSON's size and parse time;
+// other layers (alert polygons) and layers without one yet come from the data API
+async function loadLayer(layer: string) {
+  try {
+    return toFeatureCollection(await fetchColumnarLayer(LAYER_FILES[layer]))
+  } catch {
+    const response = await fetch(`/api/data/${layer}`)
+    return response.ok ? response.json() : null
+  }
+}
+
+export default function MapPage() {
+  const [activeLayer, setActiveLayer] = useState('fires')
+  const [timeRange, setTimeRange] = useState(() => {
+    const end = new Date()
+    return { start: new Date(end.getTime() - 7 * DAY_MS), end }
+  })
+  const [live, setLive] = useState<any>(null)
+  const [history, setHistory] = useState<HistoryCollection | null>(null)
+  const [loading, setLoading] = useState(true)
+
+  useEffect(() => {
+    let cancelled = false
+    setLoading(true)
+    setHistory(null)
+    loadLayer(activeLayer)
+      .then(data => { if (!cancelled) setLive(data) })
+      .catch(() => { if (!cancelled) setLive(null) })
+      .finally(() => { if (!cancelled) setLoading(false) })
+    return () => { cancelled = true }
+  }, [activeLayer])
+
+  // Stable, so the slider only reloads when the layer or range changes
+  const handleHistory = useCallback((collection: HistoryCollection) => setHistory(collection), [])
+
+  // The slider's window replaces the live layer once the layer has history on disk;
+  // a response still in flight for the previous layer is ignored
+  const rendered = history && history.metadata.source === activeLayer && history.metadata.days.length ? history : live
+
+  return (
+    <div className="flex h-screen bg-black text-white">
+      <div className="relative flex-1">
+        <GlobalMap data={rendered} activeLayer={activeLayer} timeRange={timeRange} />
+        <div className="absolute top-4 left-4 right-4 overflow-x-auto">
+          <LayerToggle activeLayer={activeLayer} onLayerChange={setActiveLayer} />
+        </div>
+        <div className="absolute bottom-4 left-4 w-96">
+          <TimeSlider
+            startDate={timeRange.start}
+            endDate={timeRange.end}
+            onChange={setTimeRange}
+            layer={activeLayer}
+            onHistory={handleHistory}
+          />
+        </div>
+      </div>
+      <DataPanel data={rendered} loading={loading} activeLayer={activeLayer} />
+    </div>
+  )
+}
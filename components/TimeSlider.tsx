@@ -1,18 +1,48 @@
 'use client'
 
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useCallback } from 'react'
 import { format } from 'date-fns'
 import { Calendar, Clock } from 'lucide-react'
 
+export interface HistoryCollection {
+  type: 'FeatureCollection'
+  metadata: {
+    source: string
+    start: string
+    end: string
+    days: string[]
+    total_features: number
+    limit: number
+    truncated: boolean
+  }
+  features: any[]
+}
+
 interface TimeSliderProps {
   startDate: Date
   endDate: Date
   onChange: (range: { start: Date; end: Date }) => void
+  // With a layer, the slider loads that layer's history (/api/history/[layer]) for
+  // the selected range and can scrub through it one day at a time
+  layer?: string
+  onHistory?: (history: HistoryCollection) => void
+  historyLimit?: number
+}
+
+const DAY_MS = 24 * 60 * 60 * 1000
+
+async function fetchHistory(layer: string, start: Date, end: Date, limit: number): Promise<HistoryCollection | null> {
+  const params = new URLSearchParams({ start: start.toISOString(), end: end.toISOString(), limit: String(limit) })
+  const response = await fetch(`/api/history/${encodeURIComponent(layer)}?${params}`)
+  return response.ok ? response.json() : null
 }
 
-export default function TimeSlider({ startDate, endDate, onChange }: TimeSliderProps) {
+export default function TimeSlider({ startDate, endDate, onChange, layer, onHistory, historyLimit = 10000 }: TimeSliderProps) {
   const [isDragging, setIsDragging] = useState(false)
   const [selectedRange, setSelectedRange] = useState(7) // Days
+  const [days, setDays] = useState<string[]>([])
+  const [playhead, setPlayhead] = useState<number | null>(null) // index into days, null = whole range
+  const [loading, setLoading] = useState(false)
 
   const ranges = [
     { label: '24h', days: 1 },
@@ -22,13 +52,41 @@ export default function TimeSlider({ startDate, endDate, onChange }: TimeSliderP
     { label: '30d', days: 30 }
   ]
 
+  const loadHistory = useCallback(async (start: Date, end: Date, keepDays: boolean) => {
+    if (!layer) return
+    setLoading(true)
+    try {
+      const history = await fetchHistory(layer, start, end, historyLimit)
+      if (!history) return
+      if (!keepDays) setDays(history.metadata.days)
+      onHistory?.(history)
+    } finally {
+      setLoading(false)
+    }
+  }, [layer, historyLimit, onHistory])
+
+  // The whole selected range whenever it or the layer changes
+  useEffect(() => {
+    setPlayhead(null)
+    loadHistory(startDate, endDate, false)
+  }, [startDate.getTime(), endDate.getTime(), loadHistory])
+
+  // Scrubbing loads a single day partition; dragging waits for the release
+  useEffect(() => {
+    if (playhead === null || isDragging || !days[playhead]) return
+    const dayStart = new Date(`${days[playhead]}T00:00:00Z`)
+    loadHistory(dayStart, new Date(dayStart.getTime() + DAY_MS), true)
+  }, [playhead, isDragging, days, loadHistory])
+
   const handleRangeChange = (days: number) => {
     setSelectedRange(days)
     const end = new Date()
-    const start = new Date(end.getTime() - days * 24 * 60 * 60 * 1000)
+    const start = new Date(end.getTime() - days * DAY_MS)
     onChange({ start, end })
   }
 
+  const playheadDay = playhead !== null ? days[playhead] : null
+
   return (
     <div className="bg-gray-900/90 backdrop-blur-lg rounded-lg p-4 border border-gray-800">
       <div className="flex items-center justify-between mb-3">
@@ -39,7 +97,9 @@ export default function TimeSlider({ startDate, endDate, onChange }: TimeSliderP
         <div className="flex items-center gap-2">
           <Clock className="w-4 h-4 text-blue-400" />
           <span className="text-xs text-gray-400">
-            {format(startDate, 'MMM d')} - {format(endDate, 'MMM d, yyyy')}
+            {playheadDay
+              ? format(new Date(`${playheadDay}T00:00:00Z`), 'MMM d, yyyy')
+              : `${format(startDate, 'MMM d')} - ${format(endDate, 'MMM d, yyyy')}`}
           </span>
         </div>
       </div>
@@ -64,27 +124,50 @@ export default function TimeSlider({ startDate, endDate, onChange }: TimeSliderP
       {/* Visual Timeline */}
       <div className="relative h-2 bg-gray-800 rounded-full overflow-hidden">
         <div className="absolute inset-0 bg-gradient-to-r from-blue-500/20 to-blue-500" />
-        
+
         {/* Animated pulse */}
         <div className="absolute right-0 top-0 h-full w-1 bg-blue-400 animate-pulse" />
-        
-        {/* Date markers */}
+
+        {/* Day markers: one per day with history in the range */}
         <div className="absolute inset-0 flex justify-between px-1">
-          {[...Array(5)].map((_, i) => (
+          {(days.length ? days : [...Array(5)]).map((day, i) => (
             <div
-              key={i}
-              className="w-0.5 h-full bg-gray-700"
-              style={{ opacity: 0.3 + (i * 0.15) }}
+              key={day ?? i}
+              className={`w-0.5 h-full ${i === playhead ? 'bg-blue-200' : 'bg-gray-700'}`}
+              style={{ opacity: i === playhead ? 1 : 0.3 + (i * 0.7) / Math.max(days.length || 5, 1) }}
             />
           ))}
         </div>
       </div>
 
+      {/* Scrub through the days on disk */}
+      {layer && days.length > 1 && (
+        <input
+          type="range"
+          min={0}
+          max={days.length - 1}
+          value={playhead ?? days.length - 1}
+          onChange={(event) => setPlayhead(Number(event.target.value))}
+          onPointerDown={() => setIsDragging(true)}
+          onPointerUp={() => setIsDragging(false)}
+          className="w-full mt-3 accent-blue-500"
+          aria-label="History day"
+        />
+      )}
+
       {/* Live Update Indicator */}
       <div className="mt-3 flex items-center justify-center gap-2">
-        <div className="w-2 h-2 bg-green-400 rounded-full animate-pulse" />
-        <span className="text-xs text-gray-400">Live data updates every 3 hours</span>
+        <div className={`w-2 h-2 rounded-full animate-pulse ${loading ? 'bg-yellow-400' : 'bg-green-400'}`} />
+        <span className="text-xs text-gray-400">
+          {playheadDay ? 'Replaying history' : 'Live data updates every 3 hours'}
+        </span>
+        {playheadDay && (
+          <button onClick={() => { setPlayhead(null); loadHistory(startDate, endDate, false) }}
+                  className="text-xs text-blue-400 hover:text-blue-300">
+            Back to range
+          </button>
+        )}
       </div>
     </div>
   )
-}
\ No newline at end of file
+}
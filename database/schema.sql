@@ -377,6 +377,10 @@ INSERT INTO data_sources (source_id, name, provider, verification_type, base_tru
 ('nasa-eonet', 'NASA Earth Observatory', 'NASA', 'satellite_confirmed', 91.00),
 ('openaq', 'OpenAQ Air Quality', 'OpenAQ', 'sensor_network', 78.00);
 
+-- Requests per minute the fetch scripts pace themselves to
+INSERT INTO data_sources (source_id, name, provider, verification_type, base_trust_score, rate_limit) VALUES
+('openweather', 'OpenWeatherMap Current Weather', 'OpenWeather', 'sensor_network', 80.00, 60);
+
 -- =====================================================
 -- VIEWS FOR COMMON QUERIES
 -- =====================================================
@@ -0,0 +1,116 @@
+// Terra Atlas columnar layer decoder
+// Reads the public/data/columnar/<layer>.bin files written by scripts/ingest/columnar.py
+
+export interface ColumnInfo {
+  name: string;
+  // float64 holds integers past int32, exact up to 2**53
+  type: 'float32' | 'float64' | 'int32' | 'uint32' | 'uint8';
+  offset: number;
+  length: number;
+  null?: number;
+  encoding?: 'dictionary';
+}
+
+export interface ColumnarHeader {
+  version: number;
+  count: number;
+  columns: ColumnInfo[];
+  strings: string[];
+  metadata: Record<string, unknown>;
+}
+
+export type ColumnArray = Float32Array | Float64Array | Int32Array | Uint32Array | Uint8Array;
+
+export interface ColumnarLayer {
+  header: ColumnarHeader;
+  count: number;
+  lon: Float32Array;
+  lat: Float32Array;
+  columns: Record<string, ColumnArray>;
+  // Decode one cell; dictionary columns resolve to their string, nulls to null
+  value: (column: string, row: number) => string | number | boolean | null;
+}
+
+const MAGIC = 'TAC1';
+const VERSION = 2;
+
+const ARRAY_TYPES = {
+  float32: Float32Array,
+  float64: Float64Array,
+  int32: Int32Array,
+  uint32: Uint32Array,
+  uint8: Uint8Array,
+};
+
+export function decodeColumnar(buffer: ArrayBuffer): ColumnarLayer {
+  const bytes = new Uint8Array(buffer);
+  const magic = String.fromCharCode(bytes[0], bytes[1], bytes[2], bytes[3]);
+  if (magic !== MAGIC) {
+    throw new Error('Not a Terra Atlas columnar file');
+  }
+
+  const headerLength = new DataView(buffer).getUint32(4, true);
+  const header: ColumnarHeader = JSON.parse(
+    new TextDecoder().decode(bytes.subarray(8, 8 + headerLength))
+  );
+  if (header.version > VERSION) {
+    throw new Error(`Unsupported columnar version ${header.version}`);
+  }
+  const dataStart = 8 + headerLength;
+
+  // Buffers are 8-byte aligned, so typed arrays can view the file without copying
+  const columns: Record<string, ColumnArray> = {};
+  const info: Record<string, ColumnInfo> = {};
+  for (const column of header.columns) {
+    const ArrayType = ARRAY_TYPES[column.type];
+    columns[column.name] = new ArrayType(buffer, dataStart + column.offset, column.length);
+    info[column.name] = column;
+  }
+
+  const value = (name: string, row: number) => {
+    const column = info[name];
+    const cell = columns[name]?.[row];
+    if (column === undefined || cell === undefined) return null;
+    if ((column.type === 'float32' || column.type === 'float64') && Number.isNaN(cell)) return null;
+    if (column.null !== undefined && cell === column.null) return null;
+    if (column.encoding === 'dictionary') return header.strings[cell];
+    if (column.type === 'uint8') return cell === 1;
+    return cell;
+  };
+
+  return {
+    header,
+    count: header.count,
+    lon: columns.lon as Float32Array,
+    lat: columns.lat as Float32Array,
+    columns,
+    value,
+  };
+}
+
+export async function fetchColumnarLayer(layerFile: string): Promise<ColumnarLayer> {
+  const response = await fetch(`/data/columnar/${layerFile}.bin`);
+  if (!response.ok) {
+    throw new Error(`Failed to load columnar layer ${layerFile}: ${response.status}`);
+  }
+  return decodeColumnar(await response.arrayBuffer());
+}
+
+// GeoJSON points for renderers that take a FeatureCollection (mapbox-gl sources)
+export function toFeatureCollection(layer: ColumnarLayer) {
+  const names = layer.header.columns.map(column => column.name).filter(name => name !== 'lon' && name !== 'lat');
+  const features = new Array(layer.count);
+  for (let row = 0; row < layer.count; row++) {
+    const properties: Record<string, string | number | boolean> = {};
+    for (const name of names) {
+      const cell = layer.value(name, row);
+      if (cell !== null) properties[name] = cell;
+    }
+    features[row] = {
+      type: 'Feature',
+      properties,
+      geometry: { type: 'Point', coordinates: [layer.lon[row], layer.lat[row]] },
+    };
+  }
+  return { type: 'FeatureCollection' as const, metadata: layer.header.metadata, features };
+}
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Terra Atlas Ingest Benchmarks
+Runs the fetch_* transforms against synthetic FIRMS, USGS and NOAA feeds
+served locally, and compares rows/sec, peak RSS and output bytes to a
+saved baseline. benchmarks/ingest-baseline.json is the development
+reference; refresh it (--save-baseline, with --cases for just the cases a
+change moved) in any change that intentionally moves these numbers. CI
+keeps its own baseline, recorded by the runners on every push to main, and
+only reports regressions without blocking a deploy.
+"""
+
+import argparse
+import json
+import sys
+
+from ingest.bench import (
+    BASELINE_PATH, CASES, FIRMS_FULL_SIZES, FIRMS_QUICK_SIZES, FIRMS_SIZES, TOLERANCE,
+    compare, load_baseline, run_suite, same_environment, save_baseline
+)
+
+def parse_sizes(text: str):
+    """'1k,100k,1m' -> [1000, 100000, 1000000]"""
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    sizes = []
+    for part in text.split(','):
+        part = part.strip().lower()
+        if part[-1:] in multipliers:
+            sizes.append(int(float(part[:-1]) * multipliers[part[-1]]))
+        else:
+            sizes.append(int(part))
+    return sizes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data ingestion transforms")
+    parser.add_argument('--quick', action='store_true', help="small FIRMS sizes only (CI)")
+    parser.add_argument('--full', action='store_true', help="include the 5M-row FIRMS feed")
+    parser.add_argument('--sizes', type=parse_sizes, help="FIRMS row counts, e.g. 1k,100k,1m")
+    parser.add_argument('--cases', help=f"comma-separated subset of: {', '.join(CASES)}")
+    parser.add_argument('--save-baseline', action='store_true', help="record this run as the baseline")
+    parser.add_argument('--compare', action='store_true', help="exit 1 if any case regressed against the baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--report', help="also write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    sizes = args.sizes or (FIRMS_QUICK_SIZES if args.quick else FIRMS_FULL_SIZES if args.full else FIRMS_SIZES)
+    cases = args.cases.split(',') if args.cases else None
+
+    print("⏱️  Running ingest benchmarks...")
+    report = run_suite(sizes, cases)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    # Compare before saving, so --compare --save-baseline checks against the previous run
+    status = 0
+    if args.compare:
+        baseline = load_baseline(args.baseline)
+        if baseline is None:
+            print(f"⚠️  No baseline at {args.baseline}, nothing to compare")
+        else:
+            if not same_environment(baseline.get('host', {}), report['host']):
+                print("ℹ️  Baseline was recorded in another environment; only calibrated rows/sec is compared")
+            regressions = compare(report, baseline, args.tolerance)
+            if regressions:
+                print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+                for line in regressions:
+                    print(f"   - {line}")
+                status = 1
+            else:
+                print("✅ No regressions against baseline")
+
+    if args.save_baseline:
+        save_baseline(report, args.baseline)
+        print(f"💾 Baseline saved to {args.baseline}")
+
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,11 +3,12 @@
 Create simple icon placeholders for Terra Atlas PWA
 """
 
-from PIL import Image, ImageDraw, ImageFont
 import os
 
 def create_icon(size, output_path):
     """Create a simple Terra Atlas icon"""
+    from PIL import Image, ImageDraw
+
     # Create a new image with a gradient background
     img = Image.new('RGB', (size, size), color='#030712')
     draw = ImageDraw.Draw(img)
@@ -48,21 +49,22 @@ def main():
     """Generate PWA icons"""
     public_dir = os.path.join(os.path.dirname(__file__), '..', 'public')
     
-    # Create icons
-    create_icon(192, os.path.join(public_dir, 'icon-192.png'))
-    create_icon(512, os.path.join(public_dir, 'icon-512.png'))
-    
-    print("✨ Icons created successfully!")
-
-if __name__ == "__main__":
     # Check if PIL is available
     try:
-        from PIL import Image, ImageDraw
-        main()
+        import PIL  # noqa: F401
     except ImportError:
         print("⚠️  PIL not available, creating placeholder icons...")
         # Create empty placeholder files
-        public_dir = os.path.join(os.path.dirname(__file__), '..', 'public')
         open(os.path.join(public_dir, 'icon-192.png'), 'w').close()
         open(os.path.join(public_dir, 'icon-512.png'), 'w').close()
-        print("✅ Placeholder icons created")
\ No newline at end of file
+        print("✅ Placeholder icons created")
+        return
+    
+    # Create icons
+    create_icon(192, os.path.join(public_dir, 'icon-192.png'))
+    create_icon(512, os.path.join(public_dir, 'icon-512.png'))
+    
+    print("✨ Icons created successfully!")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -9,10 +9,18 @@ import json
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
-import urllib.request
-import urllib.error
+
+from ingest.geojson_writer import save_geojson
+from ingest.geometry import prepare_polygon_features
+from ingest import metrics, profiling
+from ingest.httpcache import NotModified, commit, fetch_text
+from ingest.normalize import eonet_features, openaq_features
+from ingest.orchestrator import previous_summary_sources, resolve_unchanged, run_concurrently
+from ingest.pgload import mark_unchanged
+from ingest.zones import resolve_alert_geometries
 
 # Additional data sources that don't require API keys
+NOAA_ALERTS_URL = "https://api.weather.gov/alerts/active"
 
 def fetch_noaa_alerts() -> Dict[str, Any]:
     """
@@ -21,40 +29,51 @@ def fetch_noaa_alerts() -> Dict[str, Any]:
     """
     try:
         # NOAA Weather Alerts API (free, no key required)
-        url = "https://api.weather.gov/alerts/active"
+        url = NOAA_ALERTS_URL
         
         print("⚠️  Fetching NOAA weather alerts...")
-        with urllib.request.urlopen(url, timeout=30) as response:
-            content = response.read().decode('utf-8')
+        content = fetch_text(url, timeout=30)
         
         data = json.loads(content)
         
+        # Only include significant alerts
+        alerts = [
+            feature for feature in data.get('features', [])
+            if feature.get('properties', {}).get('severity', 'Unknown') in ['Extreme', 'Severe', 'Moderate']
+        ]
+        
+        metrics.rows(len(data.get('features', [])), len(alerts), 'severity')
+        
+        # Zone-only alerts get the merged shape of their affected zones (cached on disk)
+        zone_geometries = resolve_alert_geometries(alerts)
+        
         features = []
-        for feature in data.get('features', []):
+        for i, feature in enumerate(alerts):
             props = feature.get('properties', {})
-            
-            # Only include significant alerts
             severity = props.get('severity', 'Unknown')
-            if severity in ['Extreme', 'Severe', 'Moderate']:
-                features.append({
-                    "type": "Feature",
-                    "properties": {
-                        "type": "weather_alert",
-                        "source": "NOAA",
-                        "event": props.get('event', 'Unknown'),
-                        "severity": severity,
-                        "urgency": props.get('urgency', 'Unknown'),
-                        "certainty": props.get('certainty', 'Unknown'),
-                        "headline": props.get('headline', ''),
-                        "description": props.get('description', '')[:200],  # First 200 chars
-                        "effective": props.get('effective', ''),
-                        "expires": props.get('expires', ''),
-                        "quality_score": 0.95,  # NOAA data is highly reliable
-                        "data_lineage": ["NOAA", "National Weather Service", "Real-time"],
-                        "verification_status": "official"
-                    },
-                    "geometry": feature.get('geometry')
-                })
+            features.append({
+                "type": "Feature",
+                "properties": {
+                    "type": "weather_alert",
+                    "source": "NOAA",
+                    "event": props.get('event', 'Unknown'),
+                    "severity": severity,
+                    "urgency": props.get('urgency', 'Unknown'),
+                    "certainty": props.get('certainty', 'Unknown'),
+                    "headline": props.get('headline', ''),
+                    "description": props.get('description', '')[:200],  # First 200 chars
+                    "effective": props.get('effective', ''),
+                    "expires": props.get('expires', ''),
+                    "quality_score": 0.95,  # NOAA data is highly reliable
+                    "data_lineage": ["NOAA", "National Weather Service", "Real-time"],
+                    "verification_status": "official",
+                    "geometry_source": "zones" if i in zone_geometries else "alert"
+                },
+                "geometry": feature.get('geometry') or zone_geometries.get(i)
+            })
+        
+        # Simplified, quantized polygons with bbox/centroid for culling on the globe
+        features = prepare_polygon_features(features)
         
         print(f"✅ Fetched {len(features)} weather alerts from NOAA")
         return {
@@ -67,8 +86,11 @@ def fetch_noaa_alerts() -> Dict[str, Any]:
                 "trust_level": "official_government"
             }
         }
+    except NotModified:
+        raise
     except Exception as e:
         print(f"❌ Error fetching NOAA data: {e}")
+        metrics.record_error(e)
         return {"type": "FeatureCollection", "features": []}
 
 def fetch_eonet_events() -> Dict[str, Any]:
@@ -81,41 +103,13 @@ def fetch_eonet_events() -> Dict[str, Any]:
         url = "https://eonet.gsfc.nasa.gov/api/v3/events?limit=100&status=open"
         
         print("🌍 Fetching NASA EONET natural events...")
-        with urllib.request.urlopen(url, timeout=30) as response:
-            content = response.read().decode('utf-8')
+        content = fetch_text(url, timeout=30)
         
         data = json.loads(content)
         
-        features = []
-        for event in data.get('events', []):
-            # Get the most recent geometry
-            geometries = event.get('geometry', [])
-            if geometries and len(geometries) > 0:
-                latest_geom = geometries[-1]
-                
-                features.append({
-                    "type": "Feature",
-                    "properties": {
-                        "type": "natural_event",
-                        "source": "NASA EONET",
-                        "title": event.get('title', 'Unknown'),
-                        "categories": [cat.get('title') for cat in event.get('categories', [])],
-                        "event_id": event.get('id', ''),
-                        "link": event.get('link', ''),
-                        "closed": event.get('closed', None),
-                        "magnitude": latest_geom.get('magnitudeValue', None),
-                        "magnitude_unit": latest_geom.get('magnitudeUnit', ''),
-                        "date": latest_geom.get('date', ''),
-                        "quality_score": 0.9,
-                        "data_lineage": ["NASA", "EONET", "Satellite Observation"],
-                        "verification_status": "satellite_confirmed"
-                    },
-                    "geometry": {
-                        "type": "Point",
-                        "coordinates": latest_geom.get('coordinates', [0, 0])
-                    }
-                })
+        features = eonet_features(data.get('events', []))
         
+        metrics.rows(len(data.get('events', [])), len(features), 'no_geometry')
         print(f"✅ Fetched {len(features)} natural events from NASA EONET")
         return {
             "type": "FeatureCollection",
@@ -127,8 +121,11 @@ def fetch_eonet_events() -> Dict[str, Any]:
                 "trust_level": "official_space_agency"
             }
         }
+    except NotModified:
+        raise
     except Exception as e:
         print(f"❌ Error fetching EONET data: {e}")
+        metrics.record_error(e)
         return {"type": "FeatureCollection", "features": []}
 
 def fetch_air_quality() -> Dict[str, Any]:
@@ -141,62 +138,13 @@ def fetch_air_quality() -> Dict[str, Any]:
         url = "https://api.openaq.org/v2/latest?limit=100&parameter=pm25&order_by=value&sort=desc"
         
         print("💨 Fetching air quality data from OpenAQ...")
-        req = urllib.request.Request(url, headers={'User-Agent': 'Terra Atlas/1.0'})
-        with urllib.request.urlopen(req, timeout=30) as response:
-            content = response.read().decode('utf-8')
+        content = fetch_text(url, timeout=30)
         
         data = json.loads(content)
         
-        features = []
-        for result in data.get('results', []):
-            coords = result.get('coordinates', {})
-            measurements = result.get('measurements', [])
-            
-            if coords and measurements:
-                pm25 = next((m for m in measurements if m.get('parameter') == 'pm25'), None)
-                if pm25:
-                    # Calculate air quality index
-                    value = pm25.get('value', 0)
-                    if value <= 12:
-                        aqi_category = "Good"
-                        aqi_color = "green"
-                    elif value <= 35.4:
-                        aqi_category = "Moderate"
-                        aqi_color = "yellow"
-                    elif value <= 55.4:
-                        aqi_category = "Unhealthy for Sensitive"
-                        aqi_color = "orange"
-                    elif value <= 150.4:
-                        aqi_category = "Unhealthy"
-                        aqi_color = "red"
-                    else:
-                        aqi_category = "Hazardous"
-                        aqi_color = "purple"
-                    
-                    features.append({
-                        "type": "Feature",
-                        "properties": {
-                            "type": "air_quality",
-                            "source": "OpenAQ",
-                            "location": result.get('location', 'Unknown'),
-                            "city": result.get('city', 'Unknown'),
-                            "country": result.get('country', 'Unknown'),
-                            "parameter": "PM2.5",
-                            "value": value,
-                            "unit": pm25.get('unit', 'µg/m³'),
-                            "aqi_category": aqi_category,
-                            "aqi_color": aqi_color,
-                            "last_updated": pm25.get('lastUpdated', ''),
-                            "quality_score": 0.85,
-                            "data_lineage": ["OpenAQ", "Ground Sensors", "Real-time"],
-                            "verification_status": "sensor_network"
-                        },
-                        "geometry": {
-                            "type": "Point",
-                            "coordinates": [coords.get('longitude', 0), coords.get('latitude', 0)]
-                        }
-                    })
+        features = openaq_features(data.get('results', []))
         
+        metrics.rows(len(data.get('results', [])), len(features), 'no_pm25')
         print(f"✅ Fetched {len(features)} air quality measurements from OpenAQ")
         return {
             "type": "FeatureCollection",
@@ -208,8 +156,11 @@ def fetch_air_quality() -> Dict[str, Any]:
                 "trust_level": "community_sensors"
             }
         }
+    except NotModified:
+        raise
     except Exception as e:
         print(f"❌ Error fetching OpenAQ data: {e}")
+        metrics.record_error(e)
         return {"type": "FeatureCollection", "features": []}
 
 def fetch_volcano_activity() -> Dict[str, Any]:
@@ -268,6 +219,7 @@ def fetch_volcano_activity() -> Dict[str, Any]:
         }
     except Exception as e:
         print(f"❌ Error fetching volcano data: {e}")
+        metrics.record_error(e)
         return {"type": "FeatureCollection", "features": []}
 
 def fetch_solar_flares() -> Dict[str, Any]:
@@ -280,8 +232,7 @@ def fetch_solar_flares() -> Dict[str, Any]:
         url = "https://services.swpc.noaa.gov/json/goes/primary/xray-flares-latest.json"
         
         print("☀️ Fetching solar flare data...")
-        with urllib.request.urlopen(url, timeout=30) as response:
-            content = response.read().decode('utf-8')
+        content = fetch_text(url, timeout=30)
         
         data = json.loads(content)
         
@@ -308,6 +259,7 @@ def fetch_solar_flares() -> Dict[str, Any]:
                 }
             })
         
+        metrics.rows(len(data), len(features), 'older_than_latest_20')
         print(f"✅ Fetched {len(features)} solar flare events")
         return {
             "type": "FeatureCollection",
@@ -319,58 +271,73 @@ def fetch_solar_flares() -> Dict[str, Any]:
                 "trust_level": "official_space_weather"
             }
         }
+    except NotModified:
+        raise
     except Exception as e:
         print(f"❌ Error fetching solar flare data: {e}")
+        metrics.record_error(e)
         return {"type": "FeatureCollection", "features": []}
 
 def save_data(data: Dict[str, Any], filename: str):
     """Save data to public/data directory"""
-    os.makedirs('public/data', exist_ok=True)
     filepath = f"public/data/{filename}"
+    result = save_geojson(data, filepath)
     
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
-    
-    if 'features' in data:
-        print(f"💾 Saved {filename}: {len(data['features'])} features")
+    if 'features' in data and not result['changed']:
+        print(f"♻️  {filename} unchanged ({result['count']} features), kept existing file")
+    elif 'features' in data:
+        print(f"💾 Saved {filename}: {result['count']} features")
 
 def main():
     """Main function to fetch all extended data sources"""
     print("\n🌍 Terra Atlas Extended Data Fetcher")
     print("=" * 50)
     print("Fetching additional real-time data sources...")
+    if profiling.requested():
+        profiling.enable()
+    metrics.start_run('fetch-extended-data')
     
-    # Fetch all extended data sources
-    data_sources = {
-        'noaa-alerts.json': fetch_noaa_alerts(),
-        'nasa-eonet.json': fetch_eonet_events(),
-        'air-quality.json': fetch_air_quality(),
-        'volcanoes.json': fetch_volcano_activity(),
-        'solar-flares.json': fetch_solar_flares()
+    # Fetch all extended data sources concurrently
+    jobs = {
+        'noaa-alerts.json': fetch_noaa_alerts,
+        'nasa-eonet.json': fetch_eonet_events,
+        'air-quality.json': fetch_air_quality,
+        'volcanoes.json': fetch_volcano_activity,
+        'solar-flares.json': fetch_solar_flares
     }
+    data_sources = run_concurrently(jobs)
+    
+    # Feeds that answered 304 keep their current file untouched
+    unchanged = resolve_unchanged(jobs, data_sources, lambda name: os.path.exists(f"public/data/{name}"))
+    mark_unchanged(unchanged)
+    previous = previous_summary_sources('public/data/extended-data-summary.json')
     
     # Save all data
     print("\n💾 Saving extended data files...")
-    total_features = 0
+    sources = {}
     for filename, data in data_sources.items():
+        layer = filename.replace('.json', '')
+        if filename in unchanged:
+            print(f"♻️  Kept {filename} (unchanged upstream)")
+            sources[layer] = previous.get(layer, {"feature_count": 0, "trust_level": "unknown"})
+            continue
         save_data(data, filename)
-        if 'features' in data:
-            total_features += len(data['features'])
+        commit(filename)
+        sources[layer] = {
+            "feature_count": len(data.get('features', [])),
+            "trust_level": data.get('metadata', {}).get('trust_level', 'unknown')
+        }
+    total_features = sum(source["feature_count"] for source in sources.values())
     
     # Create extended data summary
     summary = {
         "generated_at": datetime.now().isoformat(),
         "total_features": total_features,
-        "sources": {
-            name.replace('.json', ''): {
-                "feature_count": len(data.get('features', [])),
-                "trust_level": data.get('metadata', {}).get('trust_level', 'unknown')
-            }
-            for name, data in data_sources.items()
-        }
+        "sources": sources
     }
     
     save_data(summary, 'extended-data-summary.json')
+    metrics.print_summary(metrics.export())
     
     print("\n✅ Extended data fetch complete!")
     print(f"📊 Total new features: {total_features}")
@@ -5,15 +5,60 @@ Fetches near real-time active fire data from NASA's MODIS and VIIRS satellites
 """
 
 import json
-import requests
 from datetime import datetime, timedelta
 import os
 import sys
 
+from ingest import metrics, profiling
+from ingest.dedup import merge_duplicate_fires
+from ingest.firms_shards import iter_sharded_rows
+from ingest.geojson_writer import default_exports, save_geojson, write_feature_collection
+from ingest.normalize import HAVE_NUMPY, iter_active_fires_parallel
+
 # NASA FIRMS API endpoints
 FIRMS_API_BASE = "https://firms.modaps.eosdis.nasa.gov"
 FIRMS_MAP_KEY = "da1c20a8b5ff92cc45077f6c3f60d5cc"  # Public demo key - replace with your own for production
 
+def stream_active_fires(days_back=1):
+    """
+    Stream active fire detections from NASA FIRMS
+    
+    Args:
+        days_back: Number of days of historical data to fetch (max 10 for public key)
+    
+    Yields:
+        Normalized GeoJSON features, shard by shard
+    """
+    print(f"Fetching NASA FIRMS data for last {days_back} day(s)...")
+    
+    # One request per region and sensor, downloaded in parallel; each shard
+    # is normalized as soon as it (and every shard before it) has arrived
+    for shard, columns, rows in iter_sharded_rows(FIRMS_API_BASE, FIRMS_MAP_KEY, days_back):
+        metrics.count(rows_parsed=len(rows))
+        headers = sorted(columns, key=columns.get)
+        if HAVE_NUMPY:
+            # Normalize in column batches, on the transform pool for large shards;
+            # the per-row path is kept for numpy-less installs
+            features = iter_active_fires_parallel(headers, rows, parse_confidence, parse_firms_datetime)
+        else:
+            features = iter_active_fires(headers, rows)
+        source = f"NASA_FIRMS_{shard.product.split('_')[0]}"
+        for feature in features:
+            feature['properties']['source'] = source
+            yield feature
+
+def fire_metadata(total_features):
+    """Metadata block for the fire layer"""
+    return {
+        "source": "NASA FIRMS",
+        "description": "Active fire detections from MODIS and VIIRS satellites",
+        "last_updated": datetime.now().isoformat(),
+        "update_frequency": "3 hours",
+        "license": "Public Domain (US Government Work)",
+        "attribution": "NASA Fire Information for Resource Management System (FIRMS)",
+        "total_features": total_features
+    }
+
 def fetch_active_fires(days_back=1):
     """
     Fetch active fire data from NASA FIRMS
@@ -24,90 +69,73 @@ def fetch_active_fires(days_back=1):
     Returns:
         Normalized GeoJSON feature collection
     """
-    
-    # Calculate date range
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days_back)
-    
-    # FIRMS API URL for global MODIS + VIIRS data
-    # Format: area/csv/map_key/source/days
-    url = f"{FIRMS_API_BASE}/api/area/csv/{FIRMS_MAP_KEY}/MODIS_NRT/world/{days_back}"
-    
-    print(f"Fetching NASA FIRMS data for last {days_back} day(s)...")
-    
     try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
+        features = list(merge_duplicate_fires(stream_active_fires(days_back)))
         
-        # Parse CSV response
-        lines = response.text.strip().split('\n')
-        if len(lines) < 2:
+        if not features:
             print("No fire data available")
             return create_empty_geojson()
         
-        # Parse header and data
-        headers = lines[0].split(',')
-        features = []
-        
-        for line in lines[1:]:
-            values = line.split(',')
-            if len(values) != len(headers):
-                continue
-                
-            # Create a dictionary from CSV row
-            fire_data = dict(zip(headers, values))
-            
-            # Convert to GeoJSON feature
-            feature = {
-                "type": "Feature",
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [
-                        float(fire_data.get('longitude', 0)),
-                        float(fire_data.get('latitude', 0))
-                    ]
-                },
-                "properties": {
-                    "id": f"firms_{fire_data.get('latitude')}_{fire_data.get('longitude')}_{fire_data.get('acq_date')}_{fire_data.get('acq_time')}",
-                    "source": "NASA_FIRMS_MODIS",
-                    "type": "active_fire",
-                    "timestamp": parse_firms_datetime(
-                        fire_data.get('acq_date', ''),
-                        fire_data.get('acq_time', '')
-                    ),
-                    "confidence": parse_confidence(fire_data.get('confidence', '')),
-                    "brightness": float(fire_data.get('bright_t31', 0)),
-                    "frp": float(fire_data.get('frp', 0)),  # Fire Radiative Power (MW)
-                    "satellite": fire_data.get('satellite', 'Unknown'),
-                    "quality_score": calculate_quality_score(fire_data)
-                }
-            }
-            
-            features.append(feature)
-        
         print(f"Successfully fetched {len(features)} active fire detections")
         
         # Create GeoJSON FeatureCollection
         geojson = {
             "type": "FeatureCollection",
-            "metadata": {
-                "source": "NASA FIRMS",
-                "description": "Active fire detections from MODIS and VIIRS satellites",
-                "last_updated": datetime.now().isoformat(),
-                "update_frequency": "3 hours",
-                "license": "Public Domain (US Government Work)",
-                "attribution": "NASA Fire Information for Resource Management System (FIRMS)",
-                "total_features": len(features)
-            },
+            "metadata": fire_metadata(len(features)),
             "features": features
         }
         
         return geojson
         
-    except requests.RequestException as e:
+    except Exception as e:
         print(f"Error fetching NASA FIRMS data: {e}")
+        metrics.record_error(e)
         return create_empty_geojson()
 
+def iter_active_fires(headers, rows):
+    """
+    Convert FIRMS CSV rows into GeoJSON features
+    
+    Args:
+        headers: Column names in file order
+        rows: Iterable of parsed CSV rows
+    
+    Yields:
+        Normalized GeoJSON features, one per detection
+    """
+    for values in rows:
+        if len(values) != len(headers):
+            continue
+            
+        # Create a dictionary from CSV row
+        fire_data = dict(zip(headers, values))
+        
+        # Convert to GeoJSON feature
+        yield {
+            "type": "Feature",
+            "geometry": {
+                "type": "Point",
+                "coordinates": [
+                    float(fire_data.get('longitude', 0)),
+                    float(fire_data.get('latitude', 0))
+                ]
+            },
+            "properties": {
+                "id": f"firms_{fire_data.get('latitude')}_{fire_data.get('longitude')}_{fire_data.get('acq_date')}_{fire_data.get('acq_time')}",
+                "source": "NASA_FIRMS_MODIS",
+                "type": "active_fire",
+                "timestamp": parse_firms_datetime(
+                    fire_data.get('acq_date', ''),
+                    fire_data.get('acq_time', '')
+                ),
+                "confidence": parse_confidence(fire_data.get('confidence', '')),
+                "brightness": float(fire_data.get('bright_t31', 0)),
+                "frp": float(fire_data.get('frp', 0)),  # Fire Radiative Power (MW)
+                "satellite": fire_data.get('satellite', 'Unknown'),
+                "quality_score": calculate_quality_score(fire_data)
+            }
+        }
+
 def parse_firms_datetime(date_str, time_str):
     """Convert FIRMS date and time to ISO format"""
     try:
@@ -172,35 +200,78 @@ def create_empty_geojson():
 def save_to_file(data, filename):
     """Save data to JSON file"""
     output_path = os.path.join(os.path.dirname(__file__), '..', 'public', 'data', filename)
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
-    with open(output_path, 'w') as f:
-        json.dump(data, f, indent=2)
+    save_geojson(data, output_path)
     
     print(f"Data saved to {output_path}")
     return output_path
 
+def load_previous_summary():
+    """The last run's summary, reused when a failed refresh keeps the old layer"""
+    path = os.path.join(os.path.dirname(__file__), '..', 'public', 'data', 'nasa-firms-summary.json')
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
 def main():
     """Main execution function"""
-    # Fetch last 2 days of fire data (for better coverage)
-    fire_data = fetch_active_fires(days_back=2)
+    output_path = os.path.join(os.path.dirname(__file__), '..', 'public', 'data', 'nasa-firms.json')
+    high_confidence = 0
+    if profiling.requested():
+        profiling.enable()
+    metrics.start_run('fetch-nasa-firms')
     
-    # Save to public/data directory
-    output_file = save_to_file(fire_data, 'nasa-firms.json')
+    def track_confidence(features):
+        nonlocal high_confidence
+        for feature in features:
+            if feature['properties']['confidence'] >= 70:
+                high_confidence += 1
+            yield feature
+    
+    # Fetch last 2 days of fire data (for better coverage) and write it to
+    # public/data; features stream through dedup (spooled, see ingest.dedup)
+    # without holding the whole layer in memory. Download and write overlap,
+    # so the fetch span covers both and the save span nests inside it.
+    try:
+        with metrics.span('fetch', 'nasa-firms.json'):
+            result = write_feature_collection(
+                output_path,
+                track_confidence(merge_duplicate_fires(stream_active_fires(days_back=2))),
+                fire_metadata,
+                exports=default_exports(output_path)
+            )
+        total_fires = result['count']
+        print(f"Successfully fetched {total_fires} active fire detections")
+        if result['changed']:
+            print(f"Data saved to {output_path}")
+        else:
+            print(f"Fire detections unchanged, kept {output_path}")
+    except Exception as e:
+        # Shard, HTTP (e.g. a rejected MAP_KEY), parse and disk errors alike.
+        # The writer only replaces the layer once it is complete, so the
+        # previous refresh is still on disk and its summary stays valid.
+        print(f"Error fetching NASA FIRMS data: {e}")
+        if os.path.exists(output_path):
+            print(f"Kept existing {output_path}")
+            previous = load_previous_summary()
+            total_fires = previous.get('total_fires', 0)
+            high_confidence = previous.get('high_confidence_fires', 0)
+        else:
+            save_to_file(create_empty_geojson(), 'nasa-firms.json')
+            total_fires = high_confidence = 0
     
     # Also create a summary file for quick stats
     summary = {
         "last_updated": datetime.now().isoformat(),
-        "total_fires": len(fire_data['features']),
-        "high_confidence_fires": len([
-            f for f in fire_data['features'] 
-            if f['properties']['confidence'] >= 70
-        ]),
+        "total_fires": total_fires,
+        "high_confidence_fires": high_confidence,
         "data_source": "NASA FIRMS",
         "update_frequency": "Every 3 hours"
     }
     
     save_to_file(summary, 'nasa-firms-summary.json')
+    metrics.print_summary(metrics.export())
     
     print(f"✅ NASA FIRMS data pipeline complete!")
     print(f"   Total fires detected: {summary['total_fires']}")
@@ -1,24 +1,23 @@
 #!/usr/bin/env python3
 """
 Terra Atlas Real Data Fetcher (Simplified)
-Works without python-dotenv dependency
+Fewer sources than fetch-real-data.py and no .env.local: API keys come from
+the environment only, so python-dotenv is not used. It does need the rest of
+requirements.txt: requests (the shared HTTP client) and NumPy (seeded demo
+layers).
 """
 
 import os
 import json
 import time
 from datetime import datetime, timedelta
+from functools import partial
 from typing import Dict, List, Any
 
-# Try to import requests, use urllib as fallback
-try:
-    import requests
-    USE_REQUESTS = True
-except ImportError:
-    import urllib.request
-    import urllib.error
-    USE_REQUESTS = False
-    print("⚠️  Using urllib instead of requests")
+from ingest import metrics
+from ingest.geojson_writer import RUN_STAMP_PROPERTIES, save_geojson
+from ingest.httpcache import NotModified, commit, fetch_text, unconditional
+from ingest.orchestrator import fetch_layer
 
 # Read environment variables directly
 FIRMS_API_KEY = os.environ.get('FIRMS_API_KEY', '')
@@ -30,14 +29,11 @@ USGS_API_BASE = "https://earthquake.usgs.gov/earthquakes/feed/v1.0"
 OPENWEATHER_API_BASE = "https://api.openweathermap.org/data/2.5"
 
 def fetch_url(url: str) -> str:
-    """Fetch URL content with requests or urllib fallback"""
-    if USE_REQUESTS:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        return response.text
-    else:
-        with urllib.request.urlopen(url, timeout=30) as response:
-            return response.read().decode('utf-8')
+    """
+    Fetch URL content through the shared conditional HTTP cache
+    Raises NotModified when the feed is unchanged since the last run
+    """
+    return fetch_text(url, timeout=30)
 
 def fetch_usgs_earthquakes(days_back: int = 7) -> Dict[str, Any]:
     """
@@ -82,6 +78,7 @@ def fetch_usgs_earthquakes(days_back: int = 7) -> Dict[str, Any]:
                     "geometry": feature.get('geometry')
                 })
         
+        metrics.rows(len(data.get('features', [])), len(features), 'magnitude<=2.5')
         print(f"✅ Fetched {len(features)} earthquakes from USGS")
         return {
             "type": "FeatureCollection",
@@ -93,15 +90,18 @@ def fetch_usgs_earthquakes(days_back: int = 7) -> Dict[str, Any]:
             }
         }
         
+    except NotModified:
+        raise
     except Exception as e:
         print(f"❌ Error fetching USGS data: {e}")
+        metrics.record_error(e)
         return {"type": "FeatureCollection", "features": []}
 
 def generate_demo_fires() -> Dict[str, Any]:
-    """Generate demo fire data when no API key is available"""
-    import random
+    """Generate demo fire data when no API key is available (seeded, so reruns match)"""
+    import numpy as np
+    from ingest.demogen import DEMO_SEED, shard_rng
     
-    features = []
     # Generate 50 demo fires around the world
     fire_regions = [
         {"name": "California", "lat": 37.0, "lon": -120.0, "count": 10},
@@ -111,26 +111,34 @@ def generate_demo_fires() -> Dict[str, Any]:
         {"name": "Siberia", "lat": 60.0, "lon": 100.0, "count": 10}
     ]
     
-    for region in fire_regions:
-        for i in range(region["count"]):
-            lat = region["lat"] + random.uniform(-5, 5)
-            lon = region["lon"] + random.uniform(-5, 5)
-            features.append({
-                "type": "Feature",
-                "properties": {
-                    "type": "fire",
-                    "source": "Demo Data",
-                    "confidence": random.randint(50, 100),
-                    "brightness": random.uniform(300, 500),
-                    "detection_time": datetime.now().isoformat(),
-                    "quality_score": random.uniform(0.5, 1.0),
-                    "data_lineage": ["Demo", "Synthetic", "Generated"]
-                },
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [lon, lat]
-                }
-            })
+    rng = shard_rng(DEMO_SEED, 0)
+    region = np.repeat(np.arange(len(fire_regions)), [r["count"] for r in fire_regions])
+    n = len(region)
+    lat = np.array([r["lat"] for r in fire_regions])[region] + rng.uniform(-5, 5, n)
+    lon = np.array([r["lon"] for r in fire_regions])[region] + rng.uniform(-5, 5, n)
+    detection_time = datetime.now().isoformat()
+    features = [
+        {
+            "type": "Feature",
+            "properties": {
+                "type": "fire",
+                "source": "Demo Data",
+                "confidence": confidence,
+                "brightness": brightness,
+                "detection_time": detection_time,
+                "quality_score": quality,
+                "data_lineage": ["Demo", "Synthetic", "Generated"]
+            },
+            "geometry": {
+                "type": "Point",
+                "coordinates": [x, y]
+            }
+        }
+        for x, y, confidence, brightness, quality in zip(
+            lon.tolist(), lat.tolist(), rng.integers(50, 101, n).tolist(),
+            rng.uniform(300, 500, n).tolist(), rng.uniform(0.5, 1.0, n).tolist()
+        )
+    ]
     
     return {
         "type": "FeatureCollection",
@@ -144,7 +152,7 @@ def generate_demo_fires() -> Dict[str, Any]:
 
 def generate_demo_weather() -> Dict[str, Any]:
     """Generate demo weather data"""
-    import random
+    from ingest.demogen import DEMO_SEED, shard_rng
     
     cities = [
         {"name": "New York", "lat": 40.7128, "lon": -74.0060},
@@ -153,28 +161,36 @@ def generate_demo_weather() -> Dict[str, Any]:
         {"name": "Sydney", "lat": -33.8688, "lon": 151.2093},
         {"name": "Mumbai", "lat": 19.0760, "lon": 72.8777}
     ]
+    conditions = ["Clear", "Cloudy", "Rainy", "Sunny"]
     
-    features = []
-    for city in cities:
-        features.append({
+    rng = shard_rng(DEMO_SEED, 1)
+    n = len(cities)
+    timestamp = datetime.utcnow().isoformat()
+    features = [
+        {
             "type": "Feature",
             "properties": {
                 "type": "weather",
                 "source": "Demo Data",
                 "city": city["name"],
-                "temperature": random.uniform(10, 35),
-                "humidity": random.randint(30, 90),
-                "wind_speed": random.uniform(0, 20),
-                "weather": random.choice(["Clear", "Cloudy", "Rainy", "Sunny"]),
+                "temperature": temperature,
+                "humidity": humidity,
+                "wind_speed": wind_speed,
+                "weather": conditions[condition],
                 "quality_score": 0.8,
                 "data_lineage": ["Demo", "Synthetic"],
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": timestamp
             },
             "geometry": {
                 "type": "Point",
                 "coordinates": [city["lon"], city["lat"]]
             }
-        })
+        }
+        for city, temperature, humidity, wind_speed, condition in zip(
+            cities, rng.uniform(10, 35, n).tolist(), rng.integers(30, 91, n).tolist(),
+            rng.uniform(0, 20, n).tolist(), rng.integers(len(conditions), size=n).tolist()
+        )
+    ]
     
     return {
         "type": "FeatureCollection",
@@ -186,35 +202,50 @@ def generate_demo_weather() -> Dict[str, Any]:
         }
     }
 
-def save_data(data: Dict[str, Any], filename: str):
-    """Save data to public/data directory"""
-    os.makedirs('public/data', exist_ok=True)
+def save_data(data: Dict[str, Any], filename: str, run_stamps=()):
+    """Save data to public/data directory; run_stamps names properties stamped at fetch time"""
     filepath = f"public/data/{filename}"
+    result = save_geojson(data, filepath, run_stamps=run_stamps)
     
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
-    
-    if 'features' in data:
-        print(f"💾 Saved {filename}: {len(data['features'])} features")
+    if 'features' in data and not result['changed']:
+        print(f"♻️  {filename} unchanged ({result['count']} features), kept existing file")
+    elif 'features' in data:
+        print(f"💾 Saved {filename}: {result['count']} features")
 
 def main():
     """Main function to fetch all data sources"""
     print("\n🌍 Terra Atlas Real Data Fetcher (Simplified)")
     print("=" * 50)
     
+    metrics.start_run('fetch-real-data-simple')
+    
     # Always fetch USGS earthquakes (no key required)
     print("\n📊 Fetching real earthquake data...")
-    earthquakes = fetch_usgs_earthquakes(7)
-    save_data(earthquakes, 'usgs-earthquakes.json')
+    try:
+        earthquakes = fetch_layer('usgs-earthquakes.json', partial(fetch_usgs_earthquakes, 7))
+    except NotModified:
+        earthquakes = None
+    
+    if earthquakes is None and os.path.exists('public/data/usgs-earthquakes.json'):
+        # Feed unchanged since the last run - keep the existing layer file
+        print("♻️  USGS feed unchanged, keeping usgs-earthquakes.json")
+        earthquake_status = "unchanged"
+    else:
+        if earthquakes is None:
+            with unconditional():
+                earthquakes = fetch_layer('usgs-earthquakes.json', partial(fetch_usgs_earthquakes, 7))
+        save_data(earthquakes, 'usgs-earthquakes.json')
+        commit('usgs-earthquakes.json')
+        earthquake_status = f"{len(earthquakes['features'])} features"
     
     # Generate demo data for other sources
     print("\n🔥 Generating demo fire data...")
     fires = generate_demo_fires()
-    save_data(fires, 'nasa-firms.json')
+    save_data(fires, 'nasa-firms.json', RUN_STAMP_PROPERTIES | {'detection_time'})
     
     print("\n☁️  Generating demo weather data...")
     weather = generate_demo_weather()
-    save_data(weather, 'openweather.json')
+    save_data(weather, 'openweather.json', RUN_STAMP_PROPERTIES)
     
     # Simple emissions data
     print("\n📊 Generating demo emissions data...")
@@ -228,10 +259,11 @@ def main():
         }
     }
     save_data(emissions, 'carbon-monitor.json')
+    metrics.print_summary(metrics.export())
     
     # Summary
     print("\n✅ Data fetch complete!")
-    print(f"📊 Real data: USGS Earthquakes ({len(earthquakes['features'])} features)")
+    print(f"📊 Real data: USGS Earthquakes ({earthquake_status})")
     print("📊 Demo data: Fires, Weather, Emissions")
     print("\n💡 To get more real data:")
     print("1. Get API keys from:")
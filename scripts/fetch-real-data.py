@@ -6,14 +6,26 @@ Fetches actual data from multiple environmental APIs
 
 import os
 import json
-import requests
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
-from dotenv import load_dotenv
+from typing import Dict, Iterable, Iterator, List, Any, Tuple
+from functools import partial
 import time
 
+from ingest import metrics, profiling
+from ingest.config import load_env
+from ingest.async_fetch import fetch_json_batch_sync
+from ingest.dedup import merge_duplicate_fires
+from ingest.firms_shards import iter_sharded_rows, pull_deadline
+from ingest.geojson_writer import RUN_STAMP_PROPERTIES, save_geojson
+from ingest.httpcache import NotModified, commit, fetch_json, unconditional
+from ingest.httpclient import client
+from ingest.normalize import HAVE_NUMPY, firms_detection_time, normalize_usgs_features
+from ingest.orchestrator import FETCH_DEADLINE, previous_summary_sources, resolve_unchanged, run_concurrently
+from ingest.pgload import mark_unchanged, source_rate_limit
+from ingest.watermark import WatermarkState, now_ms
+
 # Load environment variables
-load_dotenv('.env.local')
+load_env()
 
 # API Keys
 FIRMS_API_KEY = os.getenv('FIRMS_API_KEY', '')
@@ -23,8 +35,127 @@ CARBON_API_KEY = os.getenv('CARBON_API_KEY', '')
 # API Endpoints
 FIRMS_API_BASE = "https://firms.modaps.eosdis.nasa.gov"
 USGS_API_BASE = "https://earthquake.usgs.gov/earthquakes/feed/v1.0"
+USGS_QUERY_URL = "https://earthquake.usgs.gov/fdsnws/event/1/query"
 OPENWEATHER_API_BASE = "https://api.openweathermap.org/data/2.5"
 
+# OpenWeather batch settings: 'auto' switches to asyncio above the threshold.
+# The rate limit (requests per minute) is data_sources.rate_limit for 'openweather'
+# when the database is configured; OPENWEATHER_RATE_LIMIT overrides it.
+WEATHER_FETCH_MODE = os.getenv('WEATHER_FETCH_MODE', 'auto')
+ASYNC_WEATHER_THRESHOLD = 25
+OPENWEATHER_SOURCE = 'openweather'
+OPENWEATHER_DEFAULT_RATE_LIMIT = 60  # free tier
+OPENWEATHER_CONCURRENCY = int(os.getenv('OPENWEATHER_CONCURRENCY', '20'))
+OPENWEATHER_TIMEOUT = 10
+
+# Default major cities for the weather layer
+WEATHER_CITIES = [
+    {"name": "New York", "lat": 40.7128, "lon": -74.0060},
+    {"name": "London", "lat": 51.5074, "lon": -0.1278},
+    {"name": "Tokyo", "lat": 35.6762, "lon": 139.6503},
+    {"name": "Sydney", "lat": -33.8688, "lon": 151.2093},
+    {"name": "Mumbai", "lat": 19.0760, "lon": 72.8777},
+    {"name": "Cairo", "lat": 30.0444, "lon": 31.2357},
+    {"name": "São Paulo", "lat": -23.5505, "lon": -46.6333},
+    {"name": "Moscow", "lat": 55.7558, "lon": 37.6173},
+    {"name": "Beijing", "lat": 39.9042, "lon": 116.4074},
+    {"name": "Lagos", "lat": 6.5244, "lon": 3.3792}
+]
+
+# USGS: 'incremental' asks only for events updated since the last refresh and
+# merges them into the saved layer; 'full' always downloads the summary feed.
+# Incremental state is rebuilt from the full feed every USGS_RESYNC_INTERVAL seconds.
+USGS_FETCH_MODE = os.getenv('USGS_FETCH_MODE', 'incremental')
+USGS_RESYNC_INTERVAL = float(os.getenv('USGS_RESYNC_INTERVAL', str(6 * 3600)))
+
+# Layers whose features carry the time of the fetch rather than an upstream time
+RUN_STAMPED_LAYERS = frozenset({'openweather.json', 'carbon-monitor.json'})
+
+def iter_fire_features(columns: Dict[str, int], rows: Iterable[List[str]], product: str = '') -> Iterator[Dict[str, Any]]:
+    """
+    Convert FIRMS CSV rows into GeoJSON features
+    Column positions are resolved once, not per row
+    """
+    lat_i = columns.get('latitude')
+    lon_i = columns.get('longitude')
+    brightness_i = columns.get('brightness')
+    confidence_i = columns.get('confidence')
+    date_i = columns.get('acq_date')
+    time_i = columns.get('acq_time')
+    satellite_i = columns.get('satellite')
+    if lat_i is None or lon_i is None:
+        return
+    
+    for values in rows:
+        if len(values) >= 3:
+            try:
+                lat = float(values[lat_i])
+                lon = float(values[lon_i])
+                brightness = float(values[brightness_i] if brightness_i is not None else '300')
+                confidence = int(values[confidence_i] if confidence_i is not None else '50')
+                if date_i is not None:
+                    detection_time = firms_detection_time(values[date_i], values[time_i] if time_i is not None else '')
+                else:
+                    detection_time = datetime.now().isoformat()
+                
+                yield {
+                    "type": "Feature",
+                    "properties": {
+                        "type": "fire",
+                        "source": "NASA FIRMS",
+                        "product": product,
+                        "satellite": values[satellite_i] if satellite_i is not None else product,
+                        "confidence": confidence,
+                        "brightness": brightness,
+                        "detection_time": detection_time,
+                        "quality_score": confidence / 100.0,
+                        "data_lineage": ["NASA", "MODIS/VIIRS", "Real-time"]
+                    },
+                    "geometry": {
+                        "type": "Point",
+                        "coordinates": [lon, lat]
+                    }
+                }
+            except (ValueError, IndexError):
+                continue
+
+def fire_features_from_shards(shards: Iterable[tuple]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Normalize (shard, columns, rows) from iter_sharded_rows and merge duplicates
+    Each feature carries its shard's product and satellite, so detections of
+    the same fire by different sensors merge and pixels of one scan do not:
+
+    >>> from ingest.firms_shards import Shard
+    >>> columns = {name: i for i, name in enumerate(
+    ...     ['latitude', 'longitude', 'brightness', 'acq_date', 'acq_time', 'satellite', 'confidence'])}
+    >>> modis = (Shard('MODIS_NRT', (-180, -90, 180, 90)), columns,
+    ...          [['38.5', '-120.2', '320.1', '2024-07-01', '2030', 'Aqua', '80']])
+    >>> viirs = (Shard('VIIRS_SNPP_NRT', (-180, -90, 180, 90)), columns,
+    ...          [['38.502', '-120.201', '330.4', '2024-07-01', '2042', 'N', '95']])
+    >>> fires, parsed = fire_features_from_shards([modis, viirs])
+    🔗 Merged 2 fire detections into 1 fires
+    >>> parsed, len(fires), fires[0]['properties']['sensors']
+    (2, 1, ['NASA FIRMS/Aqua', 'NASA FIRMS/N'])
+
+    Returns:
+        The merged features and the number of CSV rows parsed
+    """
+    parsed = normalized = 0
+
+    def normalized_features():
+        # Shards stream through dedup; only the merged layer is held
+        nonlocal parsed, normalized
+        for shard, columns, rows in shards:
+            parsed += len(rows)
+            for feature in iter_fire_features(columns, rows, shard.product):
+                normalized += 1
+                yield feature
+
+    features = list(merge_duplicate_fires(normalized_features()))
+    metrics.dropped('invalid_row', parsed - normalized)
+    metrics.dropped('duplicate_detection', normalized - len(features))
+    return features, parsed
+
 def fetch_nasa_fires(days_back: int = 1) -> Dict[str, Any]:
     """
     Fetch active fire data from NASA FIRMS
@@ -34,45 +165,11 @@ def fetch_nasa_fires(days_back: int = 1) -> Dict[str, Any]:
         return load_demo_data('nasa-firms.json')
     
     try:
-        # FIRMS API URL for global MODIS/VIIRS data
-        url = f"{FIRMS_API_BASE}/api/area/csv/{FIRMS_API_KEY}/MODIS_NRT/world/{days_back}"
-        
         print(f"🔥 Fetching NASA FIRMS data...")
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
         
-        # Parse CSV response
-        lines = response.text.strip().split('\n')
-        headers = lines[0].split(',')
-        
-        features = []
-        for line in lines[1:]:
-            values = line.split(',')
-            if len(values) >= 3:
-                try:
-                    lat = float(values[headers.index('latitude')])
-                    lon = float(values[headers.index('longitude')])
-                    brightness = float(values[headers.index('brightness')] if 'brightness' in headers else '300')
-                    confidence = int(values[headers.index('confidence')] if 'confidence' in headers else '50')
-                    
-                    features.append({
-                        "type": "Feature",
-                        "properties": {
-                            "type": "fire",
-                            "source": "NASA FIRMS",
-                            "confidence": confidence,
-                            "brightness": brightness,
-                            "detection_time": values[headers.index('acq_date')] if 'acq_date' in headers else datetime.now().isoformat(),
-                            "quality_score": confidence / 100.0,
-                            "data_lineage": ["NASA", "MODIS/VIIRS", "Real-time"]
-                        },
-                        "geometry": {
-                            "type": "Point",
-                            "coordinates": [lon, lat]
-                        }
-                    })
-                except (ValueError, IndexError):
-                    continue
+        # Regions and sensors download in parallel; a failed shard only loses its own region
+        features, parsed = fire_features_from_shards(iter_sharded_rows(FIRMS_API_BASE, FIRMS_API_KEY, days_back))
+        metrics.rows(parsed, len(features))
         
         print(f"✅ Fetched {len(features)} active fires from NASA FIRMS")
         return {
@@ -87,69 +184,185 @@ def fetch_nasa_fires(days_back: int = 1) -> Dict[str, Any]:
         
     except Exception as e:
         print(f"❌ Error fetching NASA FIRMS data: {e}")
+        metrics.record_error(e)
         return load_demo_data('nasa-firms.json')
 
+def iter_earthquake_features(raw_features: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Convert USGS GeoJSON features into our standard earthquake features"""
+    for feature in raw_features:
+        props = feature.get('properties', {})
+        magnitude = props.get('mag', 0)
+        
+        # Only include earthquakes with magnitude > 2.5 for relevance
+        if magnitude > 2.5:
+            yield {
+                "type": "Feature",
+                "properties": {
+                    "id": feature.get('id'),
+                    "type": "earthquake",
+                    "source": "USGS",
+                    "magnitude": magnitude,
+                    "depth": feature.get('geometry', {}).get('coordinates', [0, 0, 0])[2],
+                    "place": props.get('place', 'Unknown'),
+                    "time": datetime.fromtimestamp(props.get('time', 0) / 1000).isoformat() if props.get('time') else datetime.now().isoformat(),
+                    "quality_score": min(magnitude / 10.0, 1.0),  # Normalize magnitude to 0-1
+                    "data_lineage": ["USGS", "Seismic Network", "Real-time"],
+                    "alert": props.get('alert', None),
+                    "tsunami": props.get('tsunami', 0)
+                },
+                "geometry": feature.get('geometry')
+            }
+
+def usgs_feed_days(days_back: int) -> int:
+    """Window covered by the summary feed chosen for days_back"""
+    if days_back == 1:
+        return 1
+    return 7 if days_back <= 7 else 30
+
+def usgs_collection(features: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "metadata": {
+            "source": "USGS",
+            "timestamp": datetime.utcnow().isoformat(),
+            "count": len(features)
+        }
+    }
+
+def merge_usgs_events(state: WatermarkState, raw_features: List[Dict[str, Any]]):
+    """
+    Fold raw USGS events into the state by event id
+    Deleted events and events that no longer pass the magnitude filter are
+    removed; everything else replaces the previous version of the event
+    """
+    normalize = normalize_usgs_features if HAVE_NUMPY else iter_earthquake_features
+    live = [feature for feature in raw_features if feature.get('properties', {}).get('status') != 'deleted']
+    kept = {feature['properties']['id']: feature for feature in normalize(live)}
+    metrics.rows(len(raw_features), len(kept))
+    metrics.dropped('deleted', len(raw_features) - len(live))
+    metrics.dropped('magnitude<=2.5', len(live) - len(kept))
+
+    for feature in raw_features:
+        event_id = feature.get('id')
+        props = feature.get('properties', {})
+        state.advance(props.get('updated'))
+        if not event_id:
+            continue
+        if event_id in kept:
+            state.upsert(event_id, props.get('time') or props.get('updated') or now_ms(), kept[event_id])
+        else:
+            state.remove([event_id])
+
+def usgs_feed_url(days_back: int) -> str:
+    # USGS provides different feeds based on time and magnitude
+    feed = {1: 'all_day', 7: 'all_week'}.get(usgs_feed_days(days_back), 'all_month')
+    return f"{USGS_API_BASE}/summary/{feed}.geojson"
+
+def fetch_usgs_changes(state: WatermarkState) -> int:
+    """
+    Merge events updated after the watermark, including deletions
+    The query URL changes every run, so it goes straight to the shared client
+    instead of filling the response cache with entries nothing revalidates
+    """
+    since = datetime.utcfromtimestamp(state.watermark / 1000).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]
+    params = {'format': 'geojson', 'orderby': 'time', 'includedeleted': 'true', 'updatedafter': since}
+    data = client().get_json(USGS_QUERY_URL, params=params, timeout=30)
+    merge_usgs_events(state, data.get('features', []))
+    return len(data.get('features', []))
+
+def fetch_usgs_incremental(days_back: int) -> List[Dict[str, Any]]:
+    """
+    Continue from the saved watermark, or seed it from the summary feed
+    when there is no usable state or a periodic resync is due
+    """
+    state = WatermarkState('usgs-earthquakes', usgs_feed_days(days_back) * 86_400_000)
+    if state.load() and now_ms() - state.resynced_at < USGS_RESYNC_INTERVAL * 1000:
+        changed = fetch_usgs_changes(state)
+        expired = state.expire()
+        print(f"🔁 USGS: {changed} updated events, {expired} expired")
+    else:
+        # The state needs the body even when the feed itself is unchanged
+        with unconditional():
+            data = fetch_json(usgs_feed_url(days_back), timeout=30)
+        state.reset()
+        merge_usgs_events(state, data.get('features', []))
+        state.expire()
+    state.save()
+    return state.features()
+
 def fetch_usgs_earthquakes(days_back: int = 7) -> Dict[str, Any]:
     """
     Fetch recent earthquake data from USGS
     No API key required
     """
     try:
-        # USGS provides different feeds based on time and magnitude
-        # Using "all" earthquakes from past week
-        if days_back == 1:
-            url = f"{USGS_API_BASE}/summary/all_day.geojson"
-        elif days_back <= 7:
-            url = f"{USGS_API_BASE}/summary/all_week.geojson"
-        else:
-            url = f"{USGS_API_BASE}/summary/all_month.geojson"
-        
         print(f"🌍 Fetching USGS earthquake data...")
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # Transform USGS format to our standard format
-        features = []
-        for feature in data.get('features', []):
-            props = feature.get('properties', {})
-            magnitude = props.get('mag', 0)
+        if USGS_FETCH_MODE == 'incremental':
+            features = fetch_usgs_incremental(days_back)
+        else:
+            data = fetch_json(usgs_feed_url(days_back), timeout=30)
             
-            # Only include earthquakes with magnitude > 2.5 for relevance
-            if magnitude > 2.5:
-                features.append({
-                    "type": "Feature",
-                    "properties": {
-                        "type": "earthquake",
-                        "source": "USGS",
-                        "magnitude": magnitude,
-                        "depth": feature.get('geometry', {}).get('coordinates', [0, 0, 0])[2],
-                        "place": props.get('place', 'Unknown'),
-                        "time": datetime.fromtimestamp(props.get('time', 0) / 1000).isoformat() if props.get('time') else datetime.now().isoformat(),
-                        "quality_score": min(magnitude / 10.0, 1.0),  # Normalize magnitude to 0-1
-                        "data_lineage": ["USGS", "Seismic Network", "Real-time"],
-                        "alert": props.get('alert', None),
-                        "tsunami": props.get('tsunami', 0)
-                    },
-                    "geometry": feature.get('geometry')
-                })
+            # Transform USGS format to our standard format
+            normalize = normalize_usgs_features if HAVE_NUMPY else iter_earthquake_features
+            features = list(normalize(data.get('features', [])))
+            metrics.rows(len(data.get('features', [])), len(features), 'magnitude<=2.5')
         
         print(f"✅ Fetched {len(features)} earthquakes from USGS")
-        return {
-            "type": "FeatureCollection",
-            "features": features,
-            "metadata": {
-                "source": "USGS",
-                "timestamp": datetime.utcnow().isoformat(),
-                "count": len(features)
-            }
-        }
+        return usgs_collection(features)
         
+    except NotModified:
+        raise
     except Exception as e:
         print(f"❌ Error fetching USGS data: {e}")
+        metrics.record_error(e)
         return load_demo_data('usgs-earthquakes.json')
 
+def weather_params(city: Dict[str, Any]) -> Dict[str, Any]:
+    """Query parameters for the current-weather endpoint"""
+    return {
+        "lat": city["lat"],
+        "lon": city["lon"],
+        "appid": OPENWEATHER_API_KEY,
+        "units": "metric"
+    }
+
+def weather_feature(city: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert an OpenWeatherMap response into a GeoJSON feature"""
+    return {
+        "type": "Feature",
+        "properties": {
+            "type": "weather",
+            "source": "OpenWeatherMap",
+            "city": city["name"],
+            "temperature": data.get('main', {}).get('temp', 0),
+            "feels_like": data.get('main', {}).get('feels_like', 0),
+            "humidity": data.get('main', {}).get('humidity', 0),
+            "pressure": data.get('main', {}).get('pressure', 0),
+            "wind_speed": data.get('wind', {}).get('speed', 0),
+            "weather": data.get('weather', [{}])[0].get('main', 'Unknown'),
+            "description": data.get('weather', [{}])[0].get('description', ''),
+            "quality_score": 0.95,  # OpenWeatherMap data is generally reliable
+            "data_lineage": ["OpenWeatherMap", "Weather Stations", "Real-time"],
+            "timestamp": datetime.utcnow().isoformat()
+        },
+        "geometry": {
+            "type": "Point",
+            "coordinates": [city["lon"], city["lat"]]
+        }
+    }
+
+_openweather_rate_limit = None
+
+def openweather_rate_limit() -> int:
+    """Requests per minute for OpenWeather, looked up once per run"""
+    global _openweather_rate_limit
+    if _openweather_rate_limit is None:
+        override = os.getenv('OPENWEATHER_RATE_LIMIT')
+        _openweather_rate_limit = int(override) if override else source_rate_limit(
+            OPENWEATHER_SOURCE, OPENWEATHER_DEFAULT_RATE_LIMIT)
+    return _openweather_rate_limit
+
 def fetch_weather_data(cities: List[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Fetch weather data from OpenWeatherMap
@@ -160,66 +373,46 @@ def fetch_weather_data(cities: List[Dict[str, Any]] = None) -> Dict[str, Any]:
     
     # Default major cities if none provided
     if not cities:
-        cities = [
-            {"name": "New York", "lat": 40.7128, "lon": -74.0060},
-            {"name": "London", "lat": 51.5074, "lon": -0.1278},
-            {"name": "Tokyo", "lat": 35.6762, "lon": 139.6503},
-            {"name": "Sydney", "lat": -33.8688, "lon": 151.2093},
-            {"name": "Mumbai", "lat": 19.0760, "lon": 72.8777},
-            {"name": "Cairo", "lat": 30.0444, "lon": 31.2357},
-            {"name": "São Paulo", "lat": -23.5505, "lon": -46.6333},
-            {"name": "Moscow", "lat": 55.7558, "lon": 37.6173},
-            {"name": "Beijing", "lat": 39.9042, "lon": 116.4074},
-            {"name": "Lagos", "lat": 6.5244, "lon": 3.3792}
-        ]
+        cities = WEATHER_CITIES
     
     features = []
+    url = f"{OPENWEATHER_API_BASE}/weather"
+    rate_limit = openweather_rate_limit()
     
-    for city in cities:
-        try:
-            url = f"{OPENWEATHER_API_BASE}/weather"
-            params = {
-                "lat": city["lat"],
-                "lon": city["lon"],
-                "appid": OPENWEATHER_API_KEY,
-                "units": "metric"
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            features.append({
-                "type": "Feature",
-                "properties": {
-                    "type": "weather",
-                    "source": "OpenWeatherMap",
-                    "city": city["name"],
-                    "temperature": data.get('main', {}).get('temp', 0),
-                    "feels_like": data.get('main', {}).get('feels_like', 0),
-                    "humidity": data.get('main', {}).get('humidity', 0),
-                    "pressure": data.get('main', {}).get('pressure', 0),
-                    "wind_speed": data.get('wind', {}).get('speed', 0),
-                    "weather": data.get('weather', [{}])[0].get('main', 'Unknown'),
-                    "description": data.get('weather', [{}])[0].get('description', ''),
-                    "quality_score": 0.95,  # OpenWeatherMap data is generally reliable
-                    "data_lineage": ["OpenWeatherMap", "Weather Stations", "Real-time"],
-                    "timestamp": datetime.utcnow().isoformat()
-                },
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [city["lon"], city["lat"]]
-                }
-            })
-            
-            # Rate limiting to avoid hitting API limits
-            time.sleep(0.1)
-            
-        except Exception as e:
-            print(f"⚠️  Error fetching weather for {city['name']}: {e}")
-            continue
+    use_async = WEATHER_FETCH_MODE == 'async' or (
+        WEATHER_FETCH_MODE == 'auto' and len(cities) > ASYNC_WEATHER_THRESHOLD
+    )
+    
+    if use_async:
+        # Large city grids: keep many requests in flight under the API rate limit
+        print(f"☁️  Fetching weather for {len(cities)} cities (async, {rate_limit} req/min)...")
+        results = fetch_json_batch_sync(
+            [(url, weather_params(city)) for city in cities],
+            concurrency=OPENWEATHER_CONCURRENCY,
+            requests_per_minute=rate_limit
+        )
+        features = [
+            weather_feature(city, data)
+            for city, data in zip(cities, results)
+            if data is not None
+        ]
+    else:
+        # One request per rate-limit interval, so the deadline below holds in both modes
+        interval = 60 / rate_limit
+        next_request = time.monotonic()
+        for city in cities:
+            time.sleep(max(0.0, next_request - time.monotonic()))
+            next_request = time.monotonic() + interval
+            try:
+                data = client().get_json(url, params=weather_params(city), timeout=OPENWEATHER_TIMEOUT)
+                
+                features.append(weather_feature(city, data))
+                
+            except Exception as e:
+                print(f"⚠️  Error fetching weather for {city['name']}: {e}")
+                continue
     
+    metrics.rows(len(cities), len(features), 'request_failed')
     print(f"☁️  Fetched weather data for {len(features)} cities")
     return {
         "type": "FeatureCollection",
@@ -231,6 +424,17 @@ def fetch_weather_data(cities: List[Dict[str, Any]] = None) -> Dict[str, Any]:
         }
     }
 
+def weather_deadline(cities: List[Dict[str, Any]] = WEATHER_CITIES) -> float:
+    """Seconds the weather layer needs: every city at the rate limit, plus one slow request"""
+    return max(FETCH_DEADLINE, len(cities) * 60 / openweather_rate_limit() + OPENWEATHER_TIMEOUT)
+
+def fetch_deadlines() -> Dict[str, float]:
+    """Per-layer deadlines for sources that need longer than FETCH_DEADLINE"""
+    return {
+        'nasa-firms.json': max(FETCH_DEADLINE, pull_deadline()),
+        'openweather.json': weather_deadline(),
+    }
+
 def fetch_carbon_emissions() -> Dict[str, Any]:
     """
     Fetch carbon emissions data
@@ -301,14 +505,15 @@ def save_data(data: Dict[str, Any], filename: str):
     """
     Save data to public/data directory
     """
-    os.makedirs('public/data', exist_ok=True)
     filepath = f"public/data/{filename}"
     
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
+    # Streamed, compact and committed atomically so readers never see a partial file
+    result = save_geojson(data, filepath, run_stamps=RUN_STAMP_PROPERTIES if filename in RUN_STAMPED_LAYERS else ())
     
-    if 'features' in data:
-        print(f"💾 Saved {filename}: {len(data['features'])} features")
+    if 'features' in data and not result['changed']:
+        print(f"♻️  {filename} unchanged ({result['count']} features), kept existing file")
+    elif 'features' in data:
+        print(f"💾 Saved {filename}: {result['count']} features")
     else:
         print(f"💾 Saved {filename}")
 
@@ -332,37 +537,50 @@ def main():
         print(f"  {status} {api}")
     
     print("\n🔄 Fetching data from all sources...")
+    if profiling.requested():
+        profiling.enable()
+    metrics.start_run('fetch-real-data')
     
-    # Fetch data from each source
-    data_sources = {
-        'nasa-firms.json': fetch_nasa_fires(1),
-        'usgs-earthquakes.json': fetch_usgs_earthquakes(7),
-        'openweather.json': fetch_weather_data(),
-        'carbon-monitor.json': fetch_carbon_emissions()
+    # Fetch all sources concurrently, falling back to demo data on failure or timeout
+    jobs = {
+        'nasa-firms.json': partial(fetch_nasa_fires, 1),
+        'usgs-earthquakes.json': partial(fetch_usgs_earthquakes, 7),
+        'openweather.json': fetch_weather_data,
+        'carbon-monitor.json': fetch_carbon_emissions
     }
+    data_sources = run_concurrently(jobs, deadlines=fetch_deadlines(), fallback=load_demo_data)
+    
+    # Feeds that answered 304 keep their current file untouched
+    unchanged = resolve_unchanged(jobs, data_sources, lambda name: os.path.exists(f"public/data/{name}"))
+    mark_unchanged(unchanged)
+    previous = previous_summary_sources('public/data/data-summary.json')
     
     # Save all data
     print("\n💾 Saving data files...")
-    total_features = 0
+    sources = {}
     for filename, data in data_sources.items():
+        layer = filename.replace('.json', '')
+        if filename in unchanged:
+            print(f"♻️  Kept {filename} (unchanged upstream)")
+            sources[layer] = previous.get(layer, {"feature_count": 0, "has_real_data": True})
+            continue
         save_data(data, filename)
-        if 'features' in data:
-            total_features += len(data['features'])
+        commit(filename)
+        sources[layer] = {
+            "feature_count": len(data.get('features', [])),
+            "has_real_data": not data.get('metadata', {}).get('source', '').startswith('Synthetic')
+        }
+    total_features = sum(source["feature_count"] for source in sources.values())
     
     # Create summary
     summary = {
         "generated_at": datetime.utcnow().isoformat(),
         "total_features": total_features,
-        "sources": {
-            name.replace('.json', ''): {
-                "feature_count": len(data.get('features', [])),
-                "has_real_data": not data.get('metadata', {}).get('source', '').startswith('Synthetic')
-            }
-            for name, data in data_sources.items()
-        }
+        "sources": sources
     }
     
     save_data(summary, 'data-summary.json')
+    metrics.print_summary(metrics.export())
     
     print("\n✅ Data fetch complete!")
     print(f"📊 Total features: {total_features}")
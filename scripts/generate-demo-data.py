@@ -1,185 +1,86 @@
 #!/usr/bin/env python3
 """
 Generate realistic demo data for Terra Atlas MVP
+Seeded and sharded across CPU cores, so it doubles as a load-test source:
+
+    python scripts/generate-demo-data.py --fires 20000000 --seed 7 --pipeline
+
+Add --profile for a per-layer CPU and allocation profile (see ingest.profiling).
 """
 
-import json
-import random
-from datetime import datetime, timedelta
+import argparse
+from datetime import datetime
 import os
 
-def generate_fire_data(count=100):
-    """Generate realistic fire detection data"""
-    features = []
-    
-    # Fire hotspots around the world
-    hotspots = [
-        {"name": "California", "lat": 36.7783, "lng": -119.4179, "radius": 5},
-        {"name": "Amazon", "lat": -3.4653, "lng": -62.2159, "radius": 8},
-        {"name": "Australia", "lat": -25.2744, "lng": 133.7751, "radius": 10},
-        {"name": "Siberia", "lat": 60.0, "lng": 100.0, "radius": 12},
-        {"name": "Central Africa", "lat": 0.0, "lng": 20.0, "radius": 7}
-    ]
-    
-    for _ in range(count):
-        hotspot = random.choice(hotspots)
-        
-        # Generate location near hotspot
-        lat = hotspot["lat"] + random.uniform(-hotspot["radius"], hotspot["radius"])
-        lng = hotspot["lng"] + random.uniform(-hotspot["radius"], hotspot["radius"])
-        
-        # Generate timestamp within last 48 hours
-        hours_ago = random.uniform(0, 48)
-        timestamp = datetime.now() - timedelta(hours=hours_ago)
-        
-        feature = {
-            "type": "Feature",
-            "geometry": {
-                "type": "Point",
-                "coordinates": [lng, lat]
-            },
-            "properties": {
-                "id": f"fire_{lat:.4f}_{lng:.4f}_{timestamp.isoformat()}",
-                "source": "NASA_FIRMS_DEMO",
-                "type": "active_fire",
-                "timestamp": timestamp.isoformat() + "Z",
-                "confidence": random.randint(30, 100),
-                "brightness": random.uniform(300, 500),
-                "frp": random.uniform(10, 1000),  # Fire Radiative Power
-                "satellite": random.choice(["Terra", "Aqua", "SNPP", "NOAA20"]),
-                "quality_score": random.randint(60, 100),
-                "area": hotspot["name"]
-            }
-        }
-        
-        features.append(feature)
-    
+from ingest import metrics, profiling
+from ingest.demogen import DEMO_SEED, iter_demo_features, write_demo_layer
+from ingest.geojson_writer import default_exports, save_geojson, write_feature_collection
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'public', 'data')
+
+def fire_metadata(count):
     return {
-        "type": "FeatureCollection",
-        "metadata": {
-            "source": "NASA FIRMS (Demo Data)",
-            "description": "Simulated active fire detections for demonstration",
-            "last_updated": datetime.now().isoformat(),
-            "update_frequency": "3 hours",
-            "license": "Demo Data - Not for Production Use",
-            "attribution": "Terra Atlas Demo",
-            "total_features": len(features),
-            "quality_score": 85
-        },
-        "features": features
+        "source": "NASA FIRMS (Demo Data)",
+        "description": "Simulated active fire detections for demonstration",
+        "last_updated": datetime.now().isoformat(),
+        "update_frequency": "3 hours",
+        "license": "Demo Data - Not for Production Use",
+        "attribution": "Terra Atlas Demo",
+        "total_features": count,
+        "quality_score": 85
     }
 
-def generate_earthquake_data(count=50):
-    """Generate realistic earthquake data"""
-    features = []
-    
-    # Seismic zones
-    zones = [
-        {"name": "Ring of Fire", "lat": 35.0, "lng": 140.0, "radius": 15},
-        {"name": "Mediterranean", "lat": 38.0, "lng": 15.0, "radius": 8},
-        {"name": "Himalayas", "lat": 28.0, "lng": 85.0, "radius": 10},
-        {"name": "California", "lat": 36.0, "lng": -120.0, "radius": 5},
-        {"name": "Indonesia", "lat": -2.0, "lng": 120.0, "radius": 12}
-    ]
-    
-    for _ in range(count):
-        zone = random.choice(zones)
-        
-        lat = zone["lat"] + random.uniform(-zone["radius"], zone["radius"])
-        lng = zone["lng"] + random.uniform(-zone["radius"], zone["radius"])
-        
-        # Generate timestamp within last 7 days
-        days_ago = random.uniform(0, 7)
-        timestamp = datetime.now() - timedelta(days=days_ago)
-        
-        # Magnitude distribution (more small quakes)
-        magnitude = random.triangular(2.0, 4.0, 7.5)
-        
-        feature = {
-            "type": "Feature",
-            "geometry": {
-                "type": "Point",
-                "coordinates": [lng, lat]
-            },
-            "properties": {
-                "id": f"eq_{timestamp.timestamp()}",
-                "source": "USGS_DEMO",
-                "type": "earthquake",
-                "timestamp": timestamp.isoformat() + "Z",
-                "magnitude": round(magnitude, 1),
-                "depth": random.uniform(0, 700),  # km
-                "confidence": 95,
-                "quality_score": random.randint(70, 100),
-                "area": zone["name"]
-            }
-        }
-        
-        features.append(feature)
-    
+def earthquake_metadata(count):
     return {
-        "type": "FeatureCollection",
-        "metadata": {
-            "source": "USGS (Demo Data)",
-            "description": "Simulated earthquake data for demonstration",
-            "last_updated": datetime.now().isoformat(),
-            "update_frequency": "Real-time",
-            "total_features": len(features),
-            "quality_score": 90
-        },
-        "features": features
+        "source": "USGS (Demo Data)",
+        "description": "Simulated earthquake data for demonstration",
+        "last_updated": datetime.now().isoformat(),
+        "update_frequency": "Real-time",
+        "total_features": count,
+        "quality_score": 90
     }
 
-def generate_weather_data(count=200):
-    """Generate weather event data"""
-    features = []
-    
-    # Generate grid of weather stations
-    for _ in range(count):
-        lat = random.uniform(-60, 70)
-        lng = random.uniform(-180, 180)
-        
-        feature = {
-            "type": "Feature",
-            "geometry": {
-                "type": "Point",
-                "coordinates": [lng, lat]
-            },
-            "properties": {
-                "id": f"weather_{lat:.2f}_{lng:.2f}",
-                "source": "OpenWeather_DEMO",
-                "type": "weather_station",
-                "timestamp": datetime.now().isoformat() + "Z",
-                "temperature": random.uniform(-30, 45),  # Celsius
-                "humidity": random.uniform(20, 100),  # Percentage
-                "wind_speed": random.uniform(0, 120),  # km/h
-                "precipitation": random.uniform(0, 50),  # mm
-                "confidence": 99,
-                "quality_score": 95
-            }
-        }
-        
-        features.append(feature)
-    
+def weather_metadata(count):
     return {
-        "type": "FeatureCollection",
-        "metadata": {
-            "source": "OpenWeatherMap (Demo Data)",
-            "description": "Simulated weather data for demonstration",
-            "last_updated": datetime.now().isoformat(),
-            "update_frequency": "Hourly",
-            "total_features": len(features),
-            "quality_score": 95
-        },
-        "features": features
+        "source": "OpenWeatherMap (Demo Data)",
+        "description": "Simulated weather data for demonstration",
+        "last_updated": datetime.now().isoformat(),
+        "update_frequency": "Hourly",
+        "total_features": count,
+        "quality_score": 95
     }
 
+# kind -> (layer file, metadata)
+LAYERS = {
+    'fires': ('nasa-firms.json', fire_metadata),
+    'earthquakes': ('usgs-earthquakes.json', earthquake_metadata),
+    'weather': ('openweather.json', weather_metadata),
+}
+
+def generate_layer(kind, count, seed=DEMO_SEED, workers=os.cpu_count() or 1, pipeline=False):
+    """
+    Generate one demo layer; returns the write result
+    pipeline=True streams through the regular layer writer and its exports
+    (tiles, columnar, database) instead of the fast fragment writer
+    """
+    filename, metadata = LAYERS[kind]
+    path = os.path.join(DATA_DIR, filename)
+    with metrics.span('generate', filename):
+        if pipeline:
+            stats = {}
+            result = write_feature_collection(path, iter_demo_features(kind, count, seed, workers, stats), metadata,
+                                              skip_unchanged=False, exports=default_exports(path))
+            result["stat"] = stats.get("stat", 0)
+        else:
+            result = write_demo_layer(path, kind, count, metadata, seed, workers)
+            metrics.count(rows_kept=result["count"], bytes_out=result["bytes"])
+    print(f"✅ Generated {filename}: {result['count']} features")
+    return result
+
 def save_to_file(data, filename):
     """Save data to JSON file"""
-    output_path = os.path.join(os.path.dirname(__file__), '..', 'public', 'data', filename)
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
-    with open(output_path, 'w') as f:
-        json.dump(data, f, indent=2)
+    output_path = os.path.join(DATA_DIR, filename)
+    save_geojson(data, output_path)
     
     # Only print feature count if data has features key
     if 'features' in data:
@@ -190,17 +91,27 @@ def save_to_file(data, filename):
 
 def main():
     """Generate all demo datasets"""
+    parser = argparse.ArgumentParser(description="Generate Terra Atlas demo data")
+    parser.add_argument('--fires', type=int, default=150, help="fire detections")
+    parser.add_argument('--earthquakes', type=int, default=75, help="earthquakes")
+    parser.add_argument('--weather', type=int, default=100, help="weather stations")
+    parser.add_argument('--seed', type=int, default=DEMO_SEED, help="same seed, same data")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="generator processes")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="write through the full layer pipeline (exports, database) for load tests")
+    parser.add_argument('--profile', action='store_true',
+                        help="CPU and allocation profile per layer, written next to the run report")
+    args = parser.parse_args()
+    if args.profile or profiling.requested([]):
+        profiling.enable()
+    metrics.start_run('generate-demo-data')
+
     print("🌍 Generating Terra Atlas demo data...")
     
-    # Generate datasets
-    fire_data = generate_fire_data(150)
-    earthquake_data = generate_earthquake_data(75)
-    weather_data = generate_weather_data(100)
-    
-    # Save to files
-    save_to_file(fire_data, 'nasa-firms.json')
-    save_to_file(earthquake_data, 'usgs-earthquakes.json')
-    save_to_file(weather_data, 'openweather.json')
+    # Generate datasets straight to their files
+    fire_data = generate_layer('fires', args.fires, args.seed, args.workers, args.pipeline)
+    earthquake_data = generate_layer('earthquakes', args.earthquakes, args.seed, args.workers, args.pipeline)
+    weather_data = generate_layer('weather', args.weather, args.seed, args.workers, args.pipeline)
     
     # Create empty carbon emissions placeholder
     carbon_data = {
@@ -221,19 +132,19 @@ def main():
         "last_updated": datetime.now().isoformat(),
         "datasets": {
             "fires": {
-                "count": len(fire_data["features"]),
-                "high_confidence": len([f for f in fire_data["features"] if f["properties"]["confidence"] >= 70])
+                "count": fire_data["count"],
+                "high_confidence": fire_data["stat"]
             },
             "earthquakes": {
-                "count": len(earthquake_data["features"]),
-                "significant": len([f for f in earthquake_data["features"] if f["properties"]["magnitude"] >= 4.5])
+                "count": earthquake_data["count"],
+                "significant": earthquake_data["stat"]
             },
             "weather": {
-                "count": len(weather_data["features"]),
-                "extreme": len([f for f in weather_data["features"] if f["properties"]["wind_speed"] >= 60])
+                "count": weather_data["count"],
+                "extreme": weather_data["stat"]
             }
         },
-        "total_features": len(fire_data["features"]) + len(earthquake_data["features"]) + len(weather_data["features"]),
+        "total_features": fire_data["count"] + earthquake_data["count"] + weather_data["count"],
         "demo_mode": True
     }
     
@@ -242,6 +153,7 @@ def main():
     print("\n✨ Demo data generation complete!")
     print(f"   Total features: {summary['total_features']}")
     print("   Ready for Terra Atlas MVP!")
+    metrics.print_summary(metrics.export())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Terra Atlas Ingest Scheduler
+Long-running replacement for cron-driven fetch scripts: every source is
+refreshed on its own cadence from a single process.
+
+Run from the repository root, like the fetch scripts:
+    python scripts/ingest-scheduler.py                  # run until stopped
+    python scripts/ingest-scheduler.py --once           # every source once
+    python scripts/ingest-scheduler.py usgs-earthquakes noaa-alerts
+"""
+
+import argparse
+import signal
+import sys
+
+from ingest.scheduler import Scheduler, build_jobs
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh Terra Atlas data sources on their own cadence")
+    parser.add_argument('sources', nargs='*', help="layer names to schedule (default: all)")
+    parser.add_argument('--once', action='store_true', help="run each source once and exit")
+    args = parser.parse_args()
+
+    print("\n🌍 Terra Atlas Ingest Scheduler")
+    print("=" * 50)
+
+    jobs = build_jobs(args.sources)
+    if not jobs:
+        print("❌ No matching sources")
+        return 1
+
+    scheduler = Scheduler(jobs)
+    if args.once:
+        scheduler.run_once()
+        return 1 if any(job.failures for job in jobs) else 0
+
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    scheduler.run_forever()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+"""
+Terra Atlas ingest helpers
+Shared building blocks for the data fetcher scripts in scripts/
+"""
@@ -0,0 +1,88 @@
+"""
+Batched asyncio JSON fetching
+Keeps a fixed number of requests in flight behind a token bucket and
+retries transient failures with jittered exponential backoff
+"""
+
+import asyncio
+import importlib.util
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from ingest import metrics
+from ingest.httpclient import USER_AGENT, TransientError, _is_transient, backoff_delay, client
+from ingest.ratelimit import TokenBucket
+
+# aiohttp is optional - without it requests run on worker threads through the shared pooled client.
+# It is imported when a batch runs, not at startup
+USE_AIOHTTP = importlib.util.find_spec('aiohttp') is not None
+
+Request = Tuple[str, Dict[str, Any]]
+
+def _pooled_get_json(url: str, params: Dict[str, Any], timeout: float) -> Any:
+    # Retries belong to fetch_json_batch, which also spaces them through the token bucket
+    return client().get_json(url, params=params, timeout=timeout, retries=0)
+
+async def _get_json(session, url: str, params: Dict[str, Any], timeout: float) -> Any:
+    if session is None:
+        return await asyncio.to_thread(_pooled_get_json, url, params, timeout)
+    import aiohttp
+    try:
+        async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if _is_transient(response.status):
+                raise TransientError(f"HTTP {response.status}")
+            response.raise_for_status()
+            body = await response.read()
+            metrics.count(bytes_in=len(body))
+            return json.loads(body)
+    except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+        raise TransientError(str(e)) from e
+
+async def fetch_json_batch(
+    requests: List[Request],
+    concurrency: int = 20,
+    requests_per_minute: int = 60,
+    retries: int = 3,
+    timeout: float = 10
+) -> List[Optional[Any]]:
+    """
+    Fetch many JSON documents concurrently
+
+    Args:
+        requests: (url, params) pairs to fetch
+        concurrency: Maximum requests in flight at once
+        requests_per_minute: Upstream rate limit fed into the token bucket
+        retries: Extra attempts for transient failures
+        timeout: Per-request timeout in seconds
+
+    Returns:
+        Parsed JSON for each request in input order, None where it failed
+    """
+    bucket = TokenBucket.per_minute(requests_per_minute, burst=min(concurrency, requests_per_minute))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(session, url: str, params: Dict[str, Any]) -> Optional[Any]:
+        async with semaphore:
+            for attempt in range(retries + 1):
+                await bucket.acquire()
+                try:
+                    return await _get_json(session, url, params, timeout)
+                except TransientError as e:
+                    if attempt == retries:
+                        print(f"⚠️  Giving up on {url} after {retries + 1} attempts: {e}")
+                        return None
+                    await asyncio.sleep(backoff_delay(attempt))
+                except Exception as e:
+                    print(f"⚠️  Error fetching {url}: {e}")
+                    return None
+
+    if USE_AIOHTTP:
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(connector=connector, headers={'User-Agent': USER_AGENT}) as session:
+            return await asyncio.gather(*(fetch_one(session, url, params) for url, params in requests))
+    return await asyncio.gather(*(fetch_one(None, url, params) for url, params in requests))
+
+def fetch_json_batch_sync(requests: List[Request], **kwargs) -> List[Optional[Any]]:
+    """Blocking wrapper around fetch_json_batch for the synchronous scripts"""
+    return asyncio.run(fetch_json_batch(requests, **kwargs))
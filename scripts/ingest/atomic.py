@@ -0,0 +1,40 @@
+"""
+Atomic file commits for everything written under public/data
+Output goes to a temp file in the target directory and is renamed into place
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Iterator
+
+WRITE_BUFFER = 1024 * 1024
+
+class DiscardWrite(Exception):
+    """Raise inside atomic_open to drop the temp file without an error"""
+
+@contextmanager
+def atomic_open(path: str, mode: str = 'w') -> Iterator[IO]:
+    """
+    Open a temp file next to `path` and rename it into place on success
+    On error the temp file is removed and the previous file is left untouched
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    encoding = None if 'b' in mode else 'utf-8'
+    try:
+        with os.fdopen(fd, mode, encoding=encoding, buffering=WRITE_BUFFER) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except DiscardWrite:
+        os.unlink(tmp_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,529 @@
+"""
+Ingest benchmark suite
+Runs the fetch_* transforms against large synthetic feeds served from a local
+stub HTTP server and records rows/sec, peak RSS and output bytes per case.
+
+Each case runs in a fresh interpreter so peak RSS belongs to that case alone;
+payloads are generated once per (feed, size) and reused from .cache/bench.
+Cases run the pipeline as it ships: every default export, FIRMS sharding and
+dedup, and NOAA zone lookups, all answered by the stub.
+
+Rows/sec depends on the machine, so every case also times a fixed CPU-bound
+workload right before it runs, in the same interpreter, and throughput is
+compared after scaling by that calibration time. Peak RSS and output bytes
+have no such calibration and are only compared against a baseline recorded
+in the same environment (Python version, architecture, CPU count).
+"""
+
+import csv
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from ingest.orchestrator import load_script
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..')
+REPO_ROOT = os.path.normpath(os.path.join(SCRIPTS_DIR, '..'))
+PAYLOAD_DIR = os.environ.get('BENCH_PAYLOAD_DIR', os.path.join(REPO_ROOT, '.cache', 'bench'))
+BASELINE_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'ingest-baseline.json')
+SEED = 1729
+
+FIRMS_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+FIRMS_FULL_SIZES = FIRMS_SIZES + [5_000_000]
+FIRMS_QUICK_SIZES = [1_000, 10_000]
+USGS_EVENTS = 20_000
+NOAA_ALERTS = 2_000
+NOAA_VERTICES = 400  # per polygon ring, NWS zone outlines are this detailed
+
+# Throughput and memory may move this much before a case counts as a regression
+TOLERANCE = float(os.environ.get('BENCH_TOLERANCE', '0.25'))
+
+FIRMS_COLUMNS = [
+    'latitude', 'longitude', 'brightness', 'scan', 'track', 'acq_date', 'acq_time',
+    'satellite', 'instrument', 'confidence', 'version', 'bright_t31', 'frp', 'daynight'
+]
+
+# Synthetic payloads
+
+def write_firms_csv(path: str, rows: int, seed: int = SEED):
+    """MODIS_NRT-shaped CSV with numeric confidence, as the area API returns it"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIRMS_COLUMNS)
+        for _ in range(rows):
+            acquired = start + timedelta(minutes=rng.randrange(2 * 24 * 60))
+            writer.writerow([
+                f"{rng.uniform(-60, 70):.4f}",
+                f"{rng.uniform(-180, 180):.4f}",
+                f"{rng.uniform(300, 500):.1f}",
+                f"{rng.uniform(1, 4.8):.1f}",
+                f"{rng.uniform(1, 2):.1f}",
+                acquired.strftime('%Y-%m-%d'),
+                acquired.strftime('%H%M'),
+                rng.choice(['Terra', 'Aqua']),
+                'MODIS',
+                rng.randrange(101),
+                '6.1NRT',
+                f"{rng.uniform(270, 320):.1f}",
+                f"{rng.expovariate(1 / 40):.1f}",
+                rng.choice(['D', 'N'])
+            ])
+
+def write_usgs_geojson(path: str, events: int, seed: int = SEED):
+    """all_week.geojson-shaped summary feed"""
+    rng = random.Random(seed)
+    now_ms = int(datetime(2024, 1, 8).timestamp() * 1000)
+    features = []
+    for i in range(events):
+        features.append({
+            "type": "Feature",
+            "properties": {
+                "mag": round(rng.uniform(-0.5, 7.5), 2) if rng.random() > 0.01 else None,
+                "place": f"{rng.randrange(200)} km SSW of Somewhere",
+                "time": now_ms - rng.randrange(7 * 24 * 3600 * 1000),
+                "updated": now_ms,
+                "alert": rng.choice([None, None, None, 'green', 'yellow']),
+                "tsunami": int(rng.random() < 0.02),
+                "type": "earthquake"
+            },
+            "geometry": {
+                "type": "Point",
+                "coordinates": [round(rng.uniform(-180, 180), 4), round(rng.uniform(-60, 70), 4), round(rng.uniform(0, 600), 2)]
+            },
+            "id": f"bench{i:08d}"
+        })
+    with open(path, 'w') as f:
+        json.dump({"type": "FeatureCollection", "metadata": {"count": events}, "features": features}, f)
+
+def _ring(rng: random.Random, vertices: int) -> List[List[float]]:
+    """Closed, jagged ring around a random centre"""
+    lon0, lat0 = rng.uniform(-125, -67), rng.uniform(25, 49)
+    radius = rng.uniform(0.1, 1.5)
+    ring = []
+    for k in range(vertices):
+        angle = 2 * math.pi * k / vertices
+        r = radius * rng.uniform(0.8, 1.2)
+        x = lon0 + r * math.cos(angle)
+        y = lat0 + r * math.sin(angle)
+        ring.append([round(x, 6), round(y, 6)])
+    ring.append(ring[0])
+    return ring
+
+def write_noaa_alerts(path: str, alerts: int, vertices: int = NOAA_VERTICES, seed: int = SEED):
+    """api.weather.gov/alerts/active-shaped payload with detailed polygons"""
+    rng = random.Random(seed)
+    features = []
+    for i in range(alerts):
+        geometry = None
+        if rng.random() > 0.3:  # the real feed has many zone-only alerts with null geometry
+            geometry = {"type": "Polygon", "coordinates": [_ring(rng, vertices)]}
+        features.append({
+            "id": f"urn:oid:bench.{i}",
+            "type": "Feature",
+            "geometry": geometry,
+            "properties": {
+                "event": rng.choice(['Flood Warning', 'Winter Storm Warning', 'Heat Advisory', 'Red Flag Warning']),
+                "severity": rng.choice(['Extreme', 'Severe', 'Moderate', 'Minor', 'Unknown']),
+                "urgency": rng.choice(['Immediate', 'Expected', 'Future']),
+                "certainty": rng.choice(['Observed', 'Likely', 'Possible']),
+                "headline": f"Benchmark alert {i}",
+                "description": "Synthetic alert text. " * 40,
+                "effective": "2024-01-01T00:00:00-05:00",
+                "expires": "2024-01-02T00:00:00-05:00",
+                "affectedZones": [f"https://api.weather.gov/zones/forecast/BNZ{i % 900:03d}"]
+            }
+        })
+    with open(path, 'w') as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+
+def split_firms_payload(path: str) -> str:
+    """
+    Cut a FIRMS payload into one CSV per shard of the default plan
+    Rows are dealt round-robin to the products and filed under the grid cell
+    they fall in, so the sharded pull returns every row exactly once
+    """
+    from ingest.firms_shards import plan_shards
+    shards = plan_shards()
+    products = sorted({shard.product for shard in shards})
+    directory = f"{os.path.splitext(path)[0]}-shards-{len(shards)}"
+    if os.path.isdir(directory):
+        return directory
+    partial_dir = directory + '.part'
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    os.makedirs(partial_dir)
+    files, writers = {}, {}
+    try:
+        for shard in shards:
+            f = files[shard] = open(os.path.join(partial_dir, f"{shard.product}-{shard.area}.csv"), 'w', newline='')
+            writers[shard] = csv.writer(f)
+            writers[shard].writerow(FIRMS_COLUMNS)
+        by_product = {product: [s for s in shards if s.product == product] for product in products}
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            next(reader)
+            for i, row in enumerate(reader):
+                lat, lon = float(row[0]), float(row[1])
+                for shard in by_product[products[i % len(products)]]:
+                    west, south, east, north = shard.bbox
+                    if west <= lon < east and south <= lat < north:
+                        writers[shard].writerow(row)
+                        break
+    finally:
+        for f in files.values():
+            f.close()
+    os.replace(partial_dir, directory)
+    return directory
+
+def firms_route(path: str) -> Callable[[str], Optional[str]]:
+    """/api/area/csv/<key>/<product>/<area>/<days> -> that shard's CSV"""
+    directory = split_firms_payload(path)
+
+    def route(request_path: str) -> Optional[str]:
+        parts = urlsplit(request_path).path.split('/')
+        if len(parts) < 8:
+            return None
+        shard_file = os.path.join(directory, f"{parts[5]}-{parts[6]}.csv")
+        return shard_file if os.path.exists(shard_file) else None
+    return route
+
+def zone_geometry(zone: str) -> Dict[str, Any]:
+    """A detailed, stable polygon per zone id"""
+    return {"type": "Polygon", "coordinates": [_ring(random.Random(f"{SEED}-{zone}"), NOAA_VERTICES)]}
+
+def zones_response(request_path: str) -> bytes:
+    """/zones?id=A,B&include_geometry=true, answered like api.weather.gov"""
+    query = parse_qs(urlsplit(request_path).query)
+    zones = [zone for ids in query.get('id', []) for zone in ids.split(',') if zone]
+    return json.dumps({"type": "FeatureCollection", "features": [
+        {"id": f"https://api.weather.gov/zones/forecast/{zone}", "type": "Feature",
+         "properties": {"id": zone}, "geometry": zone_geometry(zone)}
+        for zone in zones
+    ]}).encode('utf-8')
+
+PAYLOADS: Dict[str, Tuple[str, Callable[[str, int], None]]] = {
+    'firms': ('csv', write_firms_csv),
+    'usgs': ('geojson', write_usgs_geojson),
+    'noaa': ('json', write_noaa_alerts),
+}
+
+def payload_path(feed: str, size: int) -> str:
+    """Generate the payload on first use and return its path"""
+    extension, writer = PAYLOADS[feed]
+    path = os.path.join(PAYLOAD_DIR, f"{feed}-{size}-{SEED}.{extension}")
+    if not os.path.exists(path):
+        os.makedirs(PAYLOAD_DIR, exist_ok=True)
+        print(f"🧪 Generating {feed} payload ({size:,})...")
+        partial_path = path + '.part'
+        writer(partial_path, size)
+        os.replace(partial_path, path)
+    return path
+
+# Stub upstream
+
+# A payload file, a request path -> payload file lookup, or a request path -> body function
+Route = Union[str, Callable[[str], Any]]
+
+class StubServer:
+    """
+    Local HTTP server standing in for the upstream APIs
+    Routes map a path prefix to a payload, sent with a Content-Length
+    """
+
+    def __init__(self, routes: Dict[str, Route]):
+        self.routes = routes
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                payload = stub.route(self.path)
+                if payload is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                size = len(payload) if isinstance(payload, bytes) else os.path.getsize(payload)
+                self.send_header('Content-Length', str(size))
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.end_headers()
+                if isinstance(payload, bytes):
+                    self.wfile.write(payload)
+                    return
+                with open(payload, 'rb') as f:
+                    shutil.copyfileobj(f, self.wfile, 256 * 1024)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def route(self, request_path: str) -> Union[str, bytes, None]:
+        for prefix, target in self.routes.items():
+            if request_path.startswith(prefix):
+                return target(request_path) if callable(target) else target
+        return None
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+# Cases (run inside the child interpreter)
+
+# Each case loads its script up front and returns the timed part as a closure
+
+def _firms_stream(base_url: str, out_dir: str) -> Callable[[], int]:
+    """fetch-nasa-firms.py: sharded download, dedup, then the streaming layer writer"""
+    from ingest.dedup import merge_duplicate_fires
+    from ingest.geojson_writer import default_exports, write_feature_collection
+    firms = load_script('fetch-nasa-firms.py')
+    firms.FIRMS_API_BASE = base_url
+    output = os.path.join(out_dir, 'nasa-firms.json')
+
+    def run():
+        result = write_feature_collection(output, merge_duplicate_fires(firms.stream_active_fires(2)),
+                                          firms.fire_metadata, exports=default_exports(output))
+        return result['count']
+    return run
+
+def _firms_real(base_url: str, out_dir: str) -> Callable[[], int]:
+    """fetch-real-data.py: fetch_nasa_fires then save"""
+    from ingest.geojson_writer import save_geojson
+    real = load_script('fetch-real-data.py')
+    real.FIRMS_API_BASE = base_url
+    real.FIRMS_API_KEY = 'bench'
+
+    def run():
+        data = real.fetch_nasa_fires(1)
+        save_geojson(data, os.path.join(out_dir, 'nasa-firms.json'))
+        return len(data['features'])
+    return run
+
+def _usgs(base_url: str, out_dir: str) -> Callable[[], int]:
+    from ingest.geojson_writer import save_geojson
+    real = load_script('fetch-real-data.py')
+    real.USGS_API_BASE = base_url
+    real.USGS_FETCH_MODE = 'full'  # measure the transform, not the watermark state
+
+    def run():
+        data = real.fetch_usgs_earthquakes(7)
+        save_geojson(data, os.path.join(out_dir, 'usgs-earthquakes.json'))
+        return len(data['features'])
+    return run
+
+def _noaa(base_url: str, out_dir: str) -> Callable[[], int]:
+    from ingest.geojson_writer import save_geojson
+    extended = load_script('fetch-extended-data.py')
+    extended.NOAA_ALERTS_URL = f"{base_url}/alerts/active"
+
+    def run():
+        data = extended.fetch_noaa_alerts()
+        save_geojson(data, os.path.join(out_dir, 'noaa-alerts.json'))
+        return len(data['features'])
+    return run
+
+# name -> (feed, route prefix, runner)
+CASES: Dict[str, Tuple[str, str, Callable[[str, str], Callable[[], int]]]] = {
+    'firms-stream': ('firms', '/api/area/csv/', _firms_stream),
+    'firms-real': ('firms', '/api/area/csv/', _firms_real),
+    'usgs': ('usgs', '/summary/', _usgs),
+    'noaa': ('noaa', '/alerts/', _noaa),
+}
+
+def _peak_rss_bytes() -> int:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _tree_bytes(directory: str) -> int:
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def run_case_here(case: str, base_url: str, out_dir: str) -> Dict[str, Any]:
+    """Execute one case in this process and measure it"""
+    _, _, prepare = CASES[case]
+    run = prepare(base_url, out_dir)
+    calibration = calibrate()
+    started = time.perf_counter()
+    kept = run()
+    seconds = time.perf_counter() - started
+    return {
+        "seconds": round(seconds, 4),
+        "features": kept,
+        "peak_rss_bytes": _peak_rss_bytes(),
+        "output_bytes": _tree_bytes(out_dir),
+        "calibration_seconds": calibration,
+    }
+
+# Orchestration (parent process)
+
+def run_case(case: str, size: int) -> Dict[str, Any]:
+    """Serve the payload and run the case in a fresh interpreter"""
+    feed, prefix, _ = CASES[case]
+    payload = payload_path(feed, size)
+    routes: Dict[str, Route] = {prefix: firms_route(payload) if feed == 'firms' else payload}
+    if feed == 'noaa':
+        routes['/zones'] = zones_response
+    with StubServer(routes) as stub, tempfile.TemporaryDirectory(prefix='terra-bench-') as scratch:
+        out_dir = os.path.join(scratch, 'data')
+        os.makedirs(out_dir)
+        # Default settings throughout; only caches and upstream URLs point into the sandbox
+        env = dict(os.environ, HTTP_CACHE_DIR=os.path.join(scratch, 'http'), PYTHONPATH=SCRIPTS_DIR,
+                   NOAA_ZONE_CACHE_DIR=os.path.join(scratch, 'zones'), NOAA_ZONES_URL=f"{stub.url}/zones")
+        # cwd is the scratch dir so a failing fetch cannot fall back to real public/data
+        child = subprocess.run(
+            [sys.executable, '-c',
+             'import json, sys; from ingest.bench import run_case_here; '
+             'print(json.dumps(run_case_here(*sys.argv[1:])))',
+             case, stub.url, out_dir],
+            cwd=scratch, env=env, capture_output=True, text=True
+        )
+    if child.returncode != 0:
+        raise RuntimeError(f"{case} ({size}) failed:\n{child.stderr.strip()}")
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    if result['features'] == 0:
+        raise RuntimeError(f"{case} ({size}) produced no features:\n{child.stdout.strip()}")
+    result.update({
+        "case": case,
+        "rows": size,
+        "rows_per_sec": round(size / result['seconds'], 1) if result['seconds'] else None,
+        "payload_bytes": os.path.getsize(payload),
+    })
+    return result
+
+def plan(sizes: List[int], cases: Optional[List[str]] = None) -> List[Tuple[str, int]]:
+    """(case, size) pairs: FIRMS cases across sizes, USGS/NOAA at fixed size"""
+    selected = cases or list(CASES)
+    runs = []
+    for case in selected:
+        feed = CASES[case][0]
+        if feed == 'firms':
+            runs.extend((case, size) for size in sizes)
+        elif feed == 'usgs':
+            runs.append((case, USGS_EVENTS))
+        else:
+            runs.append((case, NOAA_ALERTS))
+    return runs
+
+def calibrate(repeats: int = 5) -> float:
+    """
+    Seconds for a fixed, CPU-bound mix of the work ingest does (JSON, float
+    parsing and formatting, dict building); the best of several runs
+    """
+    rng = random.Random(SEED)
+    rows = [[f"{rng.uniform(-90, 90):.4f}", f"{rng.uniform(-180, 180):.4f}", str(rng.randrange(101))]
+            for _ in range(20_000)]
+    best = math.inf
+    for _ in range(repeats):
+        started = time.perf_counter()
+        features = [{"geometry": [float(lon), float(lat)], "confidence": int(c)} for lat, lon, c in rows]
+        json.loads(json.dumps(features))
+        best = min(best, time.perf_counter() - started)
+    return round(best, 6)
+
+def host_info() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+def same_environment(first: Dict[str, Any], second: Dict[str, Any]) -> bool:
+    """Hosts whose absolute memory and output numbers are comparable"""
+    return all(first.get(key) == second.get(key) for key in ('python', 'machine', 'cpus'))
+
+def run_suite(sizes: List[int], cases: Optional[List[str]] = None) -> Dict[str, Any]:
+    results = []
+    for case, size in plan(sizes, cases):
+        result = run_case(case, size)
+        print(f"  {case:<13} {size:>10,} rows  {result['rows_per_sec']:>12,.0f} rows/s  "
+              f"{result['peak_rss_bytes'] / 2**20:>8.1f} MB peak  {result['output_bytes'] / 2**20:>8.1f} MB out  "
+              f"{result['calibration_seconds'] * 1000:>6.1f} ms cal")
+        results.append(result)
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "host": host_info(),
+        "results": results,
+    }
+
+def load_baseline(path: str = BASELINE_PATH) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_baseline(report: Dict[str, Any], path: str = BASELINE_PATH):
+    """
+    Record the report as the baseline; cases it did not run keep their
+    previous entries, so a change can refresh just the cases it moved
+    """
+    from ingest.geojson_writer import write_json
+    previous = load_baseline(path) or {}
+    ran = {(r['case'], r['rows']): r for r in report['results']}
+    results = [ran.pop((r['case'], r['rows']), r) for r in previous.get('results', [])]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_json(path, {**report, "results": results + list(ran.values())}, indent=2)
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = TOLERANCE) -> List[str]:
+    """
+    Regressions against the baseline, as readable lines
+    Rows/sec is scaled by the calibration times of the two runs of a case, so
+    a slower or busier machine is not reported as a regression; results
+    without a calibration, and peak RSS and output bytes, are only compared
+    in the environment that recorded them
+    """
+    same_host = same_environment(baseline.get('host', {}), report.get('host', {}))
+    previous = {(r['case'], r['rows']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        key = (result['case'], result['rows'])
+        before = previous.get(key)
+        if before is None:
+            continue
+        label = f"{result['case']} ({result['rows']:,} rows)"
+        speed = 1.0 if same_host else None
+        if before.get('calibration_seconds') and result.get('calibration_seconds'):
+            speed = before['calibration_seconds'] / result['calibration_seconds']
+        if speed and before.get('rows_per_sec'):
+            expected = before['rows_per_sec'] * speed
+            if result['rows_per_sec'] < expected * (1 - tolerance):
+                regressions.append(f"{label}: {result['rows_per_sec']:,.0f} rows/s vs {expected:,.0f} expected "
+                                   f"({before['rows_per_sec']:,.0f} baseline at {speed:.2f}x machine speed)")
+        if not same_host:
+            continue
+        if result['peak_rss_bytes'] > before['peak_rss_bytes'] * (1 + tolerance):
+            regressions.append(f"{label}: peak RSS {result['peak_rss_bytes'] / 2**20:.1f} MB vs "
+                               f"{before['peak_rss_bytes'] / 2**20:.1f} MB baseline")
+        if result['output_bytes'] > before['output_bytes'] * (1 + tolerance):
+            regressions.append(f"{label}: output {result['output_bytes']:,} bytes vs {before['output_bytes']:,} baseline")
+    return regressions
@@ -0,0 +1,119 @@
+"""
+terra-atlas command line
+One entry point for every ingest job. Nothing heavy is imported until a
+subcommand runs: the scripts, NumPy, psycopg, aiohttp and PIL load only
+for the subcommands that use them, and .env.local is read once up front
+for all of them.
+"""
+
+import argparse
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Layer names used by the web app (/api/data/<layer>) -> layer files
+LAYER_ALIASES = {
+    'fires': 'nasa-firms',
+    'earthquakes': 'usgs-earthquakes',
+    'weather': 'openweather',
+    'emissions': 'carbon-monitor',
+}
+
+# Subcommands that hand their arguments to a script's own argument parser
+SCRIPTS: Dict[str, Tuple[str, str]] = {
+    'demo': ('generate-demo-data.py', "generate demo layers (--fires N, --pipeline, ...)"),
+    'schedule': ('ingest-scheduler.py', "run the resident scheduler (--once, sources...)"),
+    'history': ('layer-history.py', "list, compact, prune or query the layer history"),
+    'bench': ('benchmark-ingest.py', "run the ingest benchmarks (--quick, --compare, ...)"),
+}
+
+# fetch <name> runs one of the full fetch scripts, summaries included.
+# None of them has a parser, so their options are declared here.
+FETCH_SCRIPTS = {
+    'real': 'fetch-real-data.py',
+    'extended': 'fetch-extended-data.py',
+    'firms': 'fetch-nasa-firms.py',
+    'simple': 'fetch-real-data-simple.py',
+}
+PROFILED_FETCH_SCRIPTS = ('real', 'extended', 'firms')  # read --profile through ingest.profiling
+
+def run_script(filename: str, args: List[str]) -> int:
+    """Import a script and call its main() as if it had been run with args"""
+    from ingest.orchestrator import load_script
+    module = load_script(filename)
+    argv = sys.argv
+    sys.argv = [filename] + list(args)
+    try:
+        result = module.main()
+    finally:
+        sys.argv = argv
+    return result if isinstance(result, int) else 0
+
+def _ingest(args: argparse.Namespace) -> int:
+    """Refresh the given layers once through the scheduler's jobs (all when none are given)"""
+    if args.profile:
+        from ingest import profiling
+        profiling.enable()
+    from ingest import metrics
+    from ingest.scheduler import SOURCES, Scheduler, build_jobs
+
+    layers = [LAYER_ALIASES.get(name, name).replace('.json', '') for name in args.layers]
+    unknown = [name for name in layers if f"{name}.json" not in SOURCES]
+    if unknown:
+        print(f"❌ Unknown layer(s): {', '.join(unknown)}")
+        print(f"   Known: {', '.join(sorted(name.replace('.json', '') for name in SOURCES))}")
+        return 2
+    jobs = build_jobs(layers)
+    Scheduler(jobs).run_once()
+    metrics.print_summary(metrics.export())
+    return 1 if any(job.failures for job in jobs) else 0
+
+def _fetch(args: argparse.Namespace) -> int:
+    if args.profile and args.script not in PROFILED_FETCH_SCRIPTS:
+        print(f"❌ fetch {args.script} does not support --profile (only {', '.join(PROFILED_FETCH_SCRIPTS)})")
+        return 2
+    return run_script(FETCH_SCRIPTS[args.script], ['--profile'] if args.profile else [])
+
+def _load(args: argparse.Namespace) -> int:
+    return run_script('load-data-points.py', args.layers)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='terra-atlas', description="Terra Atlas data ingest")
+    parser.add_argument('--env-file', help="read this file instead of .env.local")
+    commands = parser.add_subparsers(dest='command', metavar='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="refresh layers once (default: every layer)")
+    ingest.add_argument('layers', nargs='*', help="e.g. usgs-earthquakes noaa-alerts fires")
+    ingest.add_argument('--profile', action='store_true', help="CPU and allocation profile per stage")
+    ingest.set_defaults(handler=_ingest)
+
+    fetch = commands.add_parser('fetch', help="run a full fetch script with its summary file")
+    fetch.add_argument('script', choices=sorted(FETCH_SCRIPTS))
+    fetch.add_argument('--profile', action='store_true',
+                       help=f"CPU and allocation profile per stage ({', '.join(PROFILED_FETCH_SCRIPTS)})")
+    fetch.set_defaults(handler=_fetch)
+
+    load = commands.add_parser('load', help="bulk-load layer files into the database")
+    load.add_argument('layers', nargs='*', help="layer files to load (default: every database layer)")
+    load.set_defaults(handler=_load)
+
+    icons = commands.add_parser('icons', help="draw the PWA icons (needs Pillow)")
+    icons.set_defaults(handler=lambda args: run_script('create-icons.py', []))
+
+    for name, (filename, help_text) in SCRIPTS.items():
+        # Options are the script's own (--help included), collected by parse_known_args
+        command = commands.add_parser(name, help=help_text, add_help=False)
+        command.set_defaults(handler=lambda args, filename=filename: run_script(filename, args.args),
+                             passthrough=True)
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if getattr(args, 'passthrough', False):
+        args.args = extra
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    from ingest.config import load_env
+    load_env(args.env_file)
+    handler: Callable[[argparse.Namespace], int] = args.handler
+    return handler(args)
@@ -0,0 +1,224 @@
+"""
+Columnar binary export for point layers
+Packs lon/lat into float32 arrays and each property into a typed column,
+with repeated strings stored once in a dictionary. Written next to the
+GeoJSON file as public/data/columnar/<layer>.bin; decoded by lib/columnar.ts.
+
+Integers outside int32 go to a float64 column, which holds them exactly up
+to 2**53 (JavaScript's safe-integer range); larger ones are stored as strings.
+
+File layout (little-endian):
+    b'TAC1' | uint32 header length | header JSON | padding to 8 bytes | column buffers
+Each buffer starts on an 8-byte boundary, so every column, float64 included,
+can be viewed in place; the header lists offset, type and null sentinel for
+every column.
+"""
+
+import json
+import math
+import os
+import sys
+from array import array
+from typing import Any, Dict, List, Optional
+
+from ingest.atomic import atomic_open
+
+MAGIC = b'TAC1'
+COLUMNAR_DIR = 'columnar'
+COLUMNAR_EXPORT = os.environ.get('COLUMNAR_EXPORT', '1') != '0'
+
+INT_NULL = -2 ** 31
+MAX_EXACT_INT = 2 ** 53  # float64 holds every integer up to here
+STR_NULL = 2 ** 32 - 1
+BOOL_NULL = 255
+
+# array typecode, header type name, null sentinel
+COLUMN_TYPES = {
+    'bool': ('B', 'uint8', BOOL_NULL),
+    'int': ('i', 'int32', INT_NULL),
+    'float': ('f', 'float32', math.nan),
+    'wide': ('d', 'float64', math.nan),  # integers past int32, and anything mixed with them
+    'str': ('I', 'uint32', STR_NULL),
+}
+
+def columnar_path(path: str) -> str:
+    """public/data/nasa-firms.json -> public/data/columnar/nasa-firms.bin"""
+    name = os.path.splitext(os.path.basename(path))[0] + '.bin'
+    return os.path.join(os.path.dirname(path), COLUMNAR_DIR, name)
+
+class Column:
+    """One property column; the type widens as new values are seen"""
+
+    def __init__(self, kind: str, rows: int):
+        self.kind = kind
+        code, _, null = COLUMN_TYPES[kind]
+        self.values = array(code, [null]) * rows
+
+    def widen(self, kind: str, strings: 'StringTable'):
+        if kind == self.kind:
+            return
+        old_kind, old_values = self.kind, self.values
+        _, _, old_null = COLUMN_TYPES[old_kind]
+        self.kind = kind
+        code, _, null = COLUMN_TYPES[kind]
+        self.values = array(code)
+        for value in old_values:
+            is_null = value != value if old_kind in ('float', 'wide') else value == old_null
+            if is_null:
+                self.values.append(null)
+            elif kind == 'str':
+                if old_kind == 'bool':
+                    text = json.dumps(bool(value))
+                elif old_kind == 'wide' and value.is_integer():
+                    text = repr(int(value))
+                else:
+                    text = repr(value)
+                self.values.append(strings.index(text))
+            else:
+                self.values.append(value)
+
+class StringTable:
+    """Dictionary encoding: every distinct string is stored once"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.lookup: Dict[str, int] = {}
+
+    def index(self, value: str) -> int:
+        position = self.lookup.get(value)
+        if position is None:
+            position = self.lookup[value] = len(self.strings)
+            self.strings.append(value)
+        return position
+
+def _kind_of(value: Any) -> str:
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        if -2 ** 31 < value < 2 ** 31:
+            return 'int'
+        return 'wide' if abs(value) <= MAX_EXACT_INT else 'str'
+    if isinstance(value, float):
+        return 'float'
+    return 'str'
+
+# Widening order; anything mixed with a string becomes a string column
+_WIDER = {('bool', 'int'): 'int', ('bool', 'float'): 'float', ('float', 'int'): 'float',
+          ('bool', 'wide'): 'wide', ('int', 'wide'): 'wide', ('float', 'wide'): 'wide'}
+
+class ColumnarBuilder:
+    """
+    Accumulates point features into typed columns
+    Non-point geometries make the layer ineligible (points_only becomes False)
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.lon = array('f')
+        self.lat = array('f')
+        self.columns: Dict[str, Column] = {}
+        self.strings = StringTable()
+        self.points_only = True
+
+    def add(self, feature: Dict[str, Any]):
+        if not self.points_only:
+            return
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') != 'Point':
+            self.points_only = False
+            return
+        coordinates = geometry.get('coordinates') or [math.nan, math.nan]
+        self.lon.append(coordinates[0])
+        self.lat.append(coordinates[1])
+
+        properties = feature.get('properties') or {}
+        for name, value in properties.items():
+            if value is None:
+                continue
+            kind = _kind_of(value)
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = Column(kind, self.rows)
+            elif column.kind != kind:
+                column.widen(_WIDER.get(tuple(sorted((column.kind, kind))), 'str'), self.strings)
+            if column.kind == 'str':
+                text = value if isinstance(value, str) else json.dumps(value)
+                column.values.append(self.strings.index(text))
+            else:
+                column.values.append(value)
+
+        self.rows += 1
+        # Columns missing from this feature get a null
+        for column in self.columns.values():
+            if len(column.values) < self.rows:
+                column.values.append(COLUMN_TYPES[column.kind][2])
+
+    def write(self, path: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+        """Write the columnar file atomically; returns bytes written"""
+        buffers = [('lon', 'float32', None, self.lon), ('lat', 'float32', None, self.lat)]
+        for name, column in self.columns.items():
+            _, type_name, null = COLUMN_TYPES[column.kind]
+            encoding = 'dictionary' if column.kind == 'str' else None
+            nan_null = column.kind in ('float', 'wide')
+            buffers.append((name, type_name, (None if nan_null else null, encoding), column.values))
+
+        header = {
+            "version": 2,
+            "count": self.rows,
+            "columns": [],
+            "strings": self.strings.strings,
+            "metadata": metadata or {}
+        }
+        offset = 0
+        for name, type_name, extra, values in buffers:
+            entry = {"name": name, "type": type_name, "offset": offset, "length": len(values)}
+            if extra is not None:
+                null, encoding = extra
+                if null is not None:
+                    entry["null"] = null
+                if encoding:
+                    entry["encoding"] = encoding
+            header["columns"].append(entry)
+            offset += _padded(len(values) * values.itemsize)
+
+        header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        preamble = len(MAGIC) + 4 + len(header_bytes)
+        header_bytes += b' ' * (_padded(preamble) - preamble)
+
+        with atomic_open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(len(header_bytes).to_bytes(4, 'little'))
+            f.write(header_bytes)
+            for _, _, _, values in buffers:
+                if sys.byteorder == 'big':
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                data = values.tobytes()
+                f.write(data)
+                f.write(b'\0' * (_padded(len(data)) - len(data)))
+            return f.tell()
+
+def _padded(size: int) -> int:
+    return (size + 7) & ~7
+
+class ColumnarExport:
+    """Layer export sink: fed every feature, writes the .bin once the layer commits"""
+
+    def __init__(self, layer_path: str):
+        self.path = columnar_path(layer_path)
+        self.builder = ColumnarBuilder()
+
+    def add(self, feature: Dict[str, Any]):
+        self.builder.add(feature)
+
+    def finish(self, result: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None):
+        if not self.builder.points_only:
+            # No longer a point layer; a .bin from an earlier run would be stale
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            return
+        if not result['changed'] and os.path.exists(self.path):
+            return
+        self.builder.write(self.path, {**(metadata or {}), "feature_hash": result['hash']})
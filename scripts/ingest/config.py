@@ -0,0 +1,51 @@
+"""
+Shared configuration loading
+API keys and DATABASE_URL live in .env.local at the repository root. The
+file is read once per process, by whichever entry point gets there first
+(the terra-atlas CLI or a script run directly); variables already set in
+the environment win, so cron and containers can override any of them.
+"""
+
+import os
+from typing import Optional
+
+REPO_ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..'))
+ENV_FILE = os.environ.get('TERRA_ENV_FILE', '.env.local')
+
+_loaded = False
+
+def _parse_env(path: str):
+    """KEY=VALUE lines (optionally 'export'ed and quoted), for installs without python-dotenv"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, _, value = line.removeprefix('export ').partition('=')
+            value = value.strip()
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+                value = value[1:-1]
+            yield key.strip(), value
+
+def load_env(path: Optional[str] = None) -> Optional[str]:
+    """
+    Load .env.local from the working directory, or else the repository root
+    Returns the file that was loaded; later calls are no-ops
+    """
+    global _loaded
+    if _loaded and path is None:
+        return None
+    _loaded = True
+    candidates = [path] if path else [ENV_FILE, os.path.join(REPO_ROOT, ENV_FILE)]
+    for candidate in candidates:
+        if not os.path.isfile(candidate):
+            continue
+        try:
+            from dotenv import load_dotenv
+        except ImportError:
+            for key, value in _parse_env(candidate):
+                os.environ.setdefault(key, value)
+        else:
+            load_dotenv(candidate)
+        return candidate
+    return None
@@ -0,0 +1,47 @@
+"""
+Streaming CSV reader for large upstream feeds (NASA FIRMS)
+Decodes an HTTP body chunk by chunk so memory stays flat regardless of file size
+"""
+
+import codecs
+import csv
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+CHUNK_SIZE = 64 * 1024
+
+def iter_text_lines(chunks: Iterable[bytes], encoding: str = 'utf-8') -> Iterator[str]:
+    """Turn a stream of byte chunks into text lines, keeping line endings"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pending = ''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        # The last piece may be a partial line; hold it until the next chunk
+        pending = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        yield from lines
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+def iter_csv_rows(chunks: Iterable[bytes], encoding: str = 'utf-8') -> Iterator[List[str]]:
+    """Parse CSV rows (quoted fields included) from a stream of byte chunks"""
+    for row in csv.reader(iter_text_lines(chunks, encoding)):
+        if row:
+            yield row
+
+def read_csv_stream(chunks: Iterable[bytes], encoding: str = 'utf-8') -> Tuple[Dict[str, int], Iterator[List[str]]]:
+    """
+    Read the header row and hand back the remaining rows lazily
+
+    Returns:
+        Mapping of column name to position, and an iterator over data rows.
+        Both are empty when the body is empty.
+    """
+    rows = iter_csv_rows(chunks, encoding)
+    header = next(rows, None)
+    if header is None:
+        return {}, iter(())
+    columns = {name.strip(): i for i, name in enumerate(header)}
+    return columns, rows
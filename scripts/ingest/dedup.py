@@ -0,0 +1,229 @@
+"""
+Spatio-temporal deduplication of fire detections
+The same fire seen by MODIS and both VIIRS satellites arrives as separate
+points. Each cluster is centred on its first detection and only takes
+detections within the radius and time window of that centre, so a cluster
+is never wider than twice the radius however dense the fire front is
+(chained single linkage would merge a whole front into one point). A
+cluster also holds at most one detection per sensor and overpass: two
+pixels of the same scan are two fires. Cluster centres are bucketed into
+a grid of radius-sized cells and window-sized time slots; only
+neighbouring buckets are compared, so the cost stays near-linear.
+
+Deduplication streams: features are spooled (to disk past FIRE_DEDUP_SPOOL
+bytes) while only their coordinates, time, sensor and ranking numbers stay
+in memory, about 60 bytes per detection, and they are read back one batch
+at a time once clusters are known.
+"""
+
+import math
+import os
+import pickle
+import tempfile
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+FIRE_DEDUP = os.environ.get('FIRE_DEDUP', '1') != '0'
+FIRE_DEDUP_RADIUS_KM = float(os.environ.get('FIRE_DEDUP_RADIUS_KM', '1.0'))
+FIRE_DEDUP_WINDOW_MINUTES = float(os.environ.get('FIRE_DEDUP_WINDOW_MINUTES', '60'))
+FIRE_DEDUP_SPOOL = int(os.environ.get('FIRE_DEDUP_SPOOL', str(32 * 2**20)))  # bytes of spooled features kept in memory
+SPOOL_BATCH = 10_000
+
+# Properties a merged fire takes the cluster maximum of
+MERGED_MAXIMA = ('frp', 'confidence', 'quality_score')
+
+EARTH_RADIUS_KM = 6371.0
+_KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+def _epoch_minutes(text: Any) -> Optional[float]:
+    """'2024-01-08T13:45:00Z' or '2024-01-08' -> minutes since the epoch"""
+    if not isinstance(text, str) or not text:
+        return None
+    try:
+        stamp = datetime.fromisoformat(text[:-1] if text.endswith('Z') else text)
+    except ValueError:
+        return None
+    return (stamp - datetime(1970, 1, 1, tzinfo=stamp.tzinfo)).total_seconds() / 60
+
+def cluster_labels(
+    lon: Sequence[float],
+    lat: Sequence[float],
+    minutes: Sequence[Optional[float]],
+    radius_km: float = FIRE_DEDUP_RADIUS_KM,
+    window_minutes: float = FIRE_DEDUP_WINDOW_MINUTES,
+    sensors: Optional[Sequence[Any]] = None
+) -> Sequence[int]:
+    """
+    Cluster points within radius_km and window_minutes of a cluster's first point
+
+    A point joins the nearest open cluster whose first point is close enough
+    in space and time and which has no point yet from the same sensor and
+    overpass (sensors[i] and minutes[i]); otherwise it starts a new one.
+    Without sensors every point counts as its own sensor.
+
+    Returns:
+        For every point, the index of its cluster's first point
+
+    A chain of points 0.8 km apart stays in clusters of at most 2 km across,
+    and two detections of the same scan are never merged:
+
+    >>> km = 1 / 111.195  # degrees of latitude per kilometre
+    >>> list(cluster_labels([0.0] * 4, [0.0, 0.8 * km, 1.6 * km, 2.4 * km], [0.0] * 4))
+    [0, 0, 2, 2]
+    >>> list(cluster_labels([0.0] * 3, [0.0, 0.5 * km, 0.1 * km], [0.0, 0.0, 30.0], sensors=['A', 'A', 'B']))
+    [0, 1, 0]
+    >>> list(cluster_labels([0.0, 0.0], [0.0, 0.5 * km], [0.0, 90.0]))
+    [0, 1]
+    """
+    labels = array('l', range(len(lon)))
+    # Equirectangular projection; accurate enough at kilometre scale
+    x = array('d', (lo * _KM_PER_DEGREE * math.cos(math.radians(la)) for lo, la in zip(lon, lat)))
+    y = array('d', (la * _KM_PER_DEGREE for la in lat))
+    radius2 = radius_km * radius_km
+    sensor = sensors if sensors is not None else range(len(lon))
+    cells: Dict[tuple, List[int]] = {}  # bucket of a cluster's first point -> first points
+    # (sensor, minutes) of the members after the first, for the few clusters that have any
+    joined: Dict[int, set] = {}
+    offsets = [(dx, dy, dt) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dt in (-1, 0, 1)]
+
+    for i, t in enumerate(minutes):
+        if t is None:
+            continue  # cannot be placed in time, never merged
+        scan = (sensor[i], t)
+        cx, cy, ct = int(x[i] // radius_km), int(y[i] // radius_km), int(t // window_minutes)
+        nearest = None
+        for dx, dy, dt in offsets:
+            for j in cells.get((cx + dx, cy + dy, ct + dt), ()):
+                if abs(minutes[j] - t) > window_minutes:
+                    continue
+                if scan == (sensor[j], minutes[j]) or (j in joined and scan in joined[j]):
+                    continue
+                distance2 = (x[j] - x[i]) ** 2 + (y[j] - y[i]) ** 2
+                # Ties go to the earlier cluster so labels follow input order
+                if distance2 <= radius2 and (nearest is None or (distance2, j) < nearest):
+                    nearest = (distance2, j)
+        if nearest is None:
+            cells.setdefault((cx, cy, ct), []).append(i)
+        else:
+            labels[i] = nearest[1]
+            joined.setdefault(nearest[1], set()).add(scan)
+
+    return labels
+
+def _strength(props: Dict[str, Any]) -> tuple:
+    """Representative ranking: highest FRP (brightness without FRP), then confidence"""
+    return (props.get('frp', props.get('brightness', 0)) or 0, props.get('confidence', 0) or 0)
+
+def _sensor(props: Dict[str, Any]) -> str:
+    satellite = props.get('satellite')
+    return f"{props.get('source')}/{satellite}" if satellite else str(props.get('source'))
+
+def _spooled(spool, features: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Yield features while pickling them to the spool in batches"""
+    batch = []
+    for feature in features:
+        batch.append(feature)
+        yield feature
+        if len(batch) == SPOOL_BATCH:
+            pickle.dump(batch, spool, pickle.HIGHEST_PROTOCOL)
+            batch = []
+    if batch:
+        pickle.dump(batch, spool, pickle.HIGHEST_PROTOCOL)
+
+def _unspooled(spool) -> Iterator[Dict[str, Any]]:
+    spool.seek(0)
+    while True:
+        try:
+            yield from pickle.load(spool)
+        except EOFError:
+            return
+
+def dedupe_fires(
+    features: Iterable[Dict[str, Any]],
+    radius_km: float = FIRE_DEDUP_RADIUS_KM,
+    window_minutes: float = FIRE_DEDUP_WINDOW_MINUTES,
+    time_keys: tuple = ('timestamp', 'detection_time')
+) -> Iterator[Dict[str, Any]]:
+    """
+    Collapse fire detections of the same event into one feature each
+
+    The strongest detection of a cluster is kept and given the cluster's
+    max FRP, confidence and quality score. Merged features also record
+    how many detections they stand for and which sensors saw them.
+    Unmerged detections keep their input order; a merged fire comes out
+    where its strongest detection was.
+    """
+    lon, lat = array('d'), array('d')
+    minutes: List[Optional[float]] = []
+    sensors = array('l')
+    rank, ties = array('d'), array('d')
+    maxima = {key: array('d') for key in MERGED_MAXIMA}  # NaN where a detection lacks the key
+    sensor_codes: Dict[str, int] = {}
+    parsed: Dict[Any, Optional[float]] = {}  # timestamps repeat per overpass; parse each once
+
+    with tempfile.SpooledTemporaryFile(max_size=FIRE_DEDUP_SPOOL) as spool:
+        for feature in _spooled(spool, features):
+            coordinates = feature['geometry']['coordinates']
+            lon.append(coordinates[0])
+            lat.append(coordinates[1])
+            props = feature['properties']
+            sensors.append(sensor_codes.setdefault(_sensor(props), len(sensor_codes)))
+            stamp = next((props[key] for key in time_keys if key in props), None)
+            if stamp not in parsed:
+                parsed[stamp] = _epoch_minutes(stamp)
+            minutes.append(parsed[stamp])
+            strength = _strength(props)
+            rank.append(strength[0])
+            ties.append(strength[1])
+            for key, values in maxima.items():
+                value = props.get(key)
+                values.append(value if isinstance(value, (int, float)) else math.nan)
+
+        labels = cluster_labels(lon, lat, minutes, radius_km, window_minutes, sensors)
+        del lon, lat, minutes
+
+        # Members of the clusters that merged anything; a cluster's first point precedes the rest
+        members: Dict[int, List[int]] = {}
+        for i, label in enumerate(labels):
+            if label != i:
+                members.setdefault(label, [label]).append(i)
+        best_of = {max(group, key=lambda j: (rank[j], ties[j])): label for label, group in members.items()}
+        sensor_names = {code: name for name, code in sensor_codes.items()}
+
+        for i, feature in enumerate(_unspooled(spool)):
+            label = labels[i]
+            if label not in members:
+                yield feature
+                continue
+            if i not in best_of:
+                continue
+            group = members[label]
+            props = dict(feature['properties'])
+            for key in MERGED_MAXIMA:
+                found = [v for v in (maxima[key][j] for j in group) if not math.isnan(v)]
+                if key in props and found:
+                    props[key] = int(max(found)) if isinstance(props[key], int) else max(found)
+            props['detections'] = len(group)
+            props['sensors'] = sorted({sensor_names[sensors[j]] for j in group})
+            yield {**feature, 'properties': props}
+
+def merge_duplicate_fires(features: Iterable[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    """dedupe_fires unless FIRE_DEDUP=0, which passes every detection through untouched"""
+    if not FIRE_DEDUP:
+        return features
+    return _reporting_merge(features)
+
+def _reporting_merge(features: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    seen = 0
+    def counted():
+        nonlocal seen
+        for feature in features:
+            seen += 1
+            yield feature
+    kept = 0
+    for feature in dedupe_fires(counted()):
+        kept += 1
+        yield feature
+    if kept < seen:
+        print(f"🔗 Merged {seen} fire detections into {kept} fires")
@@ -0,0 +1,281 @@
+"""
+Vectorized demo data for load testing
+Points are drawn as NumPy columns around the same fire hotspots and seismic
+zones as the original demo generators. Work is split into fixed-size shards
+seeded from (seed, shard index), so a given seed produces the same points
+whatever the number of worker processes. Each worker encodes its shard to a
+fragment file and the fragments are concatenated into the layer in order,
+so memory stays flat at tens of millions of features.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ingest.atomic import atomic_open
+
+DEMO_SEED = int(os.environ.get('DEMO_SEED', '42'))
+SHARD_ROWS = int(os.environ.get('DEMO_SHARD_ROWS', '100000'))
+PREFETCH = 2  # shards in flight per worker
+
+# Fire hotspots around the world
+FIRE_HOTSPOTS = [
+    {"name": "California", "lat": 36.7783, "lng": -119.4179, "radius": 5},
+    {"name": "Amazon", "lat": -3.4653, "lng": -62.2159, "radius": 8},
+    {"name": "Australia", "lat": -25.2744, "lng": 133.7751, "radius": 10},
+    {"name": "Siberia", "lat": 60.0, "lng": 100.0, "radius": 12},
+    {"name": "Central Africa", "lat": 0.0, "lng": 20.0, "radius": 7}
+]
+
+# Seismic zones
+SEISMIC_ZONES = [
+    {"name": "Ring of Fire", "lat": 35.0, "lng": 140.0, "radius": 15},
+    {"name": "Mediterranean", "lat": 38.0, "lng": 15.0, "radius": 8},
+    {"name": "Himalayas", "lat": 28.0, "lng": 85.0, "radius": 10},
+    {"name": "California", "lat": 36.0, "lng": -120.0, "radius": 5},
+    {"name": "Indonesia", "lat": -2.0, "lng": 120.0, "radius": 12}
+]
+
+SATELLITES = ["Terra", "Aqua", "SNPP", "NOAA20"]
+
+def shard_rng(seed: int, shard: int) -> np.random.Generator:
+    return np.random.default_rng([seed, shard])
+
+def sample_regions(rng: np.random.Generator, regions: List[Dict[str, Any]],
+                   n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(lng, lat, region index): a uniformly chosen region per point, offset uniformly within its radius"""
+    chosen = rng.integers(len(regions), size=n)
+    radii = np.array([region["radius"] for region in regions], dtype=np.float64)[chosen]
+    lat = np.array([region["lat"] for region in regions])[chosen] + rng.uniform(-1, 1, n) * radii
+    lng = np.array([region["lng"] for region in regions])[chosen] + rng.uniform(-1, 1, n) * radii
+    return lng, lat, chosen
+
+def iso_times(now: np.datetime64, seconds_ago: np.ndarray) -> np.ndarray:
+    """ISO timestamps (microseconds) seconds_ago before now"""
+    stamps = now - (seconds_ago * 1e6).astype('timedelta64[us]')
+    return np.datetime_as_string(stamps, unit='us')
+
+def fire_columns(rng: np.random.Generator, n: int, now: np.datetime64) -> Dict[str, np.ndarray]:
+    lng, lat, hotspot = sample_regions(rng, FIRE_HOTSPOTS, n)
+    return {
+        "lng": lng, "lat": lat, "area": hotspot,
+        "timestamp": iso_times(now, rng.uniform(0, 48 * 3600, n)),  # within last 48 hours
+        "confidence": rng.integers(30, 101, n),
+        "brightness": rng.uniform(300, 500, n),
+        "frp": rng.uniform(10, 1000, n),  # Fire Radiative Power
+        "satellite": rng.integers(len(SATELLITES), size=n),
+        "quality_score": rng.integers(60, 101, n),
+    }
+
+def earthquake_columns(rng: np.random.Generator, n: int, now: np.datetime64) -> Dict[str, np.ndarray]:
+    lng, lat, zone = sample_regions(rng, SEISMIC_ZONES, n)
+    return {
+        "lng": lng, "lat": lat, "area": zone,
+        "timestamp": iso_times(now, rng.uniform(0, 7 * 86400, n)),  # within last 7 days
+        "magnitude": np.round(rng.triangular(2.0, 4.0, 7.5, n), 1),  # more small quakes
+        "depth": rng.uniform(0, 700, n),  # km
+        "quality_score": rng.integers(70, 101, n),
+    }
+
+def weather_columns(rng: np.random.Generator, n: int, now: np.datetime64) -> Dict[str, np.ndarray]:
+    return {
+        "lng": rng.uniform(-180, 180, n), "lat": rng.uniform(-60, 70, n),
+        "timestamp": np.full(n, str(now)),
+        "temperature": rng.uniform(-30, 45, n),  # Celsius
+        "humidity": rng.uniform(20, 100, n),  # Percentage
+        "wind_speed": rng.uniform(0, 120, n),  # km/h
+        "precipitation": rng.uniform(0, 50, n),  # mm
+    }
+
+def _point(lng: float, lat: float, properties: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lng, lat]}, "properties": properties}
+
+def iter_fire_features(columns: Dict[str, np.ndarray]) -> Iterator[Dict[str, Any]]:
+    for lng, lat, area, stamp, confidence, brightness, frp, satellite, quality in zip(
+        columns["lng"].tolist(), columns["lat"].tolist(), columns["area"].tolist(), columns["timestamp"].tolist(),
+        columns["confidence"].tolist(), columns["brightness"].tolist(), columns["frp"].tolist(),
+        columns["satellite"].tolist(), columns["quality_score"].tolist()
+    ):
+        yield _point(lng, lat, {
+            "id": f"fire_{lat:.4f}_{lng:.4f}_{stamp}",
+            "source": "NASA_FIRMS_DEMO",
+            "type": "active_fire",
+            "timestamp": stamp + "Z",
+            "confidence": confidence,
+            "brightness": brightness,
+            "frp": frp,
+            "satellite": SATELLITES[satellite],
+            "quality_score": quality,
+            "area": FIRE_HOTSPOTS[area]["name"]
+        })
+
+def iter_earthquake_features(columns: Dict[str, np.ndarray]) -> Iterator[Dict[str, Any]]:
+    for lng, lat, area, stamp, magnitude, depth, quality in zip(
+        columns["lng"].tolist(), columns["lat"].tolist(), columns["area"].tolist(), columns["timestamp"].tolist(),
+        columns["magnitude"].tolist(), columns["depth"].tolist(), columns["quality_score"].tolist()
+    ):
+        yield _point(lng, lat, {
+            "id": f"eq_{lat:.4f}_{lng:.4f}_{stamp}",
+            "source": "USGS_DEMO",
+            "type": "earthquake",
+            "timestamp": stamp + "Z",
+            "magnitude": magnitude,
+            "depth": depth,
+            "confidence": 95,
+            "quality_score": quality,
+            "area": SEISMIC_ZONES[area]["name"]
+        })
+
+def iter_weather_features(columns: Dict[str, np.ndarray]) -> Iterator[Dict[str, Any]]:
+    for lng, lat, stamp, temperature, humidity, wind_speed, precipitation in zip(
+        columns["lng"].tolist(), columns["lat"].tolist(), columns["timestamp"].tolist(),
+        columns["temperature"].tolist(), columns["humidity"].tolist(), columns["wind_speed"].tolist(),
+        columns["precipitation"].tolist()
+    ):
+        yield _point(lng, lat, {
+            "id": f"weather_{lat:.2f}_{lng:.2f}",
+            "source": "OpenWeather_DEMO",
+            "type": "weather_station",
+            "timestamp": stamp + "Z",
+            "temperature": temperature,
+            "humidity": humidity,
+            "wind_speed": wind_speed,
+            "precipitation": precipitation,
+            "confidence": 99,
+            "quality_score": 95
+        })
+
+# kind -> (column generator, feature builder, summary stat over the columns)
+KINDS: Dict[str, Tuple[Callable, Callable, Callable[[Dict[str, np.ndarray]], int]]] = {
+    'fires': (fire_columns, iter_fire_features, lambda c: int((c["confidence"] >= 70).sum())),
+    'earthquakes': (earthquake_columns, iter_earthquake_features, lambda c: int((c["magnitude"] >= 4.5).sum())),
+    'weather': (weather_columns, iter_weather_features, lambda c: int((c["wind_speed"] >= 60).sum())),
+}
+
+def plan(count: int, shard_rows: int = SHARD_ROWS) -> List[Tuple[int, int]]:
+    """(shard index, rows) pairs covering count rows"""
+    return [(i, min(shard_rows, count - start)) for i, start in enumerate(range(0, count, shard_rows))]
+
+def shard_columns(kind: str, seed: int, shard: int, rows: int, now: str) -> Dict[str, np.ndarray]:
+    columns, _, _ = KINDS[kind]
+    return columns(shard_rng(seed, shard), rows, np.datetime64(now, 'us'))
+
+def _write_fragment(kind: str, seed: int, shard: int, rows: int, now: str, path: str) -> Tuple[str, int]:
+    """Worker: encode one shard as comma-separated features; returns (path, summary stat)"""
+    columns = shard_columns(kind, seed, shard, rows, now)
+    _, features, stat = KINDS[kind]
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(','.join(map(encode, features(columns))))
+    return path, stat(columns)
+
+def _executor(workers: int, shards: int) -> Optional[ProcessPoolExecutor]:
+    workers = max(1, min(workers, shards))
+    return ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+def ordered_results(executor: Optional[ProcessPoolExecutor], function: Callable, jobs: List[Tuple],
+                    workers: int) -> Iterator[Any]:
+    """
+    function(*job) for every job, in order, on the executor when there is one
+    At most PREFETCH shards per worker are submitted ahead of the consumer, so
+    finished shards never pile up in memory while the writer catches up
+    """
+    if executor is None:
+        yield from (function(*job) for job in jobs)
+        return
+    pending = deque()
+    try:
+        for job in jobs:
+            pending.append(executor.submit(function, *job))
+            if len(pending) >= PREFETCH * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+def write_demo_layer(path: str, kind: str, count: int, metadata: Callable[[int], Dict[str, Any]],
+                     seed: int = DEMO_SEED, workers: int = os.cpu_count() or 1) -> Dict[str, Any]:
+    """
+    Generate a demo layer across worker processes and stream it to path
+
+    Writes the layer manifest with the same content hash the layer writer
+    would compute, so the data route's ETag stays correct.
+
+    Returns:
+        Write result (count, hash, bytes, changed) plus the summary stat
+    """
+    from ingest.geojson_writer import manifest_path, write_json
+
+    now = str(np.datetime64(datetime.utcnow(), 'us'))
+    shards = plan(count)
+    digest = hashlib.sha256()
+    stat = 0
+    scratch = tempfile.mkdtemp(prefix='.demo-', dir=os.path.dirname(os.path.abspath(path)))
+    executor = _executor(workers, len(shards))
+    try:
+        jobs = [(kind, seed, shard, rows, now, os.path.join(scratch, f"{shard}.part")) for shard, rows in shards]
+        results = ordered_results(executor, _write_fragment, jobs, workers)
+        with atomic_open(path) as out:
+            out.write('{"type":"FeatureCollection","features":[')
+            for i, (fragment, shard_stat) in enumerate(results):
+                if i:
+                    out.write(',')
+                    digest.update(b',')
+                with open(fragment, 'r', encoding='utf-8') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), ''):
+                        out.write(chunk)
+                        digest.update(chunk.encode('utf-8'))
+                os.unlink(fragment)
+                stat += shard_stat
+            out.write('],"metadata":')
+            out.write(json.dumps(metadata(count), separators=(',', ':')))
+            out.write('}')
+            out.flush()
+            size = os.fstat(out.fileno()).st_size
+    finally:
+        if executor:
+            executor.shutdown()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    result = {"count": count, "hash": digest.hexdigest(), "bytes": size, "changed": True, "stat": stat}
+    write_json(manifest_path(path), {
+        "layer": os.path.basename(path),
+        "hash": result["hash"],
+        "etag": f'"{result["hash"][:32]}"',
+        "count": count,
+        "bytes": size,
+        "updated_at": datetime.utcnow().isoformat() + "Z"
+    }, indent=2)
+    return result
+
+def iter_demo_features(kind: str, count: int, seed: int = DEMO_SEED, workers: int = os.cpu_count() or 1,
+                       stats: Optional[Dict[str, int]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Demo features in shard order, with columns generated on worker processes
+    For feeding the regular layer writer (exports, tiles, database) at scale;
+    the summary stat is accumulated into stats["stat"] when given
+    """
+    now = str(np.datetime64(datetime.utcnow(), 'us'))
+    shards = plan(count)
+    _, features, stat = KINDS[kind]
+    executor = _executor(workers, len(shards))
+    try:
+        args = [(kind, seed, shard, rows, now) for shard, rows in shards]
+        results = ordered_results(executor, shard_columns, args, workers)
+        for columns in results:
+            if stats is not None:
+                stats["stat"] = stats.get("stat", 0) + stat(columns)
+            yield from features(columns)
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
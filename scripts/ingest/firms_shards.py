@@ -0,0 +1,183 @@
+"""
+Region-sharded NASA FIRMS downloads
+Splits a global pull into bounding-box shards per sensor product, downloads
+them in parallel with per-shard retries, and hands the rows back in a fixed
+order with duplicates from shard edges removed. A failed shard costs only
+its own region. Downloaded bodies are spooled (to disk past
+FIRMS_SHARD_SPOOL bytes) and parsed one shard at a time, so memory holds
+one shard's rows rather than the whole pull.
+"""
+
+import contextvars
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from ingest.httpclient import _NETWORK_ERRORS, TransientError, backoff_delay, client
+from ingest.csvstream import CHUNK_SIZE, read_csv_stream
+
+FIRMS_PRODUCTS = tuple(p.strip() for p in os.environ.get(
+    'FIRMS_PRODUCTS', 'MODIS_NRT,VIIRS_SNPP_NRT,VIIRS_NOAA20_NRT').split(',') if p.strip())
+FIRMS_SHARD_GRID = os.environ.get('FIRMS_SHARD_GRID', '4x3')  # columns x rows over the globe; 1x1 is one world request
+FIRMS_SHARD_WORKERS = int(os.environ.get('FIRMS_SHARD_WORKERS', '8'))
+FIRMS_SHARD_TIMEOUT = float(os.environ.get('FIRMS_SHARD_TIMEOUT', '30'))
+FIRMS_SHARD_RETRIES = int(os.environ.get('FIRMS_SHARD_RETRIES', '3'))
+FIRMS_SHARD_SPOOL = int(os.environ.get('FIRMS_SHARD_SPOOL', str(4 * 2**20)))  # bytes of a body kept in memory
+# Only rows this close (degrees) to an edge their shard shares can come back from two shards
+FIRMS_EDGE_EPSILON = float(os.environ.get('FIRMS_EDGE_EPSILON', '0.01'))
+
+# VIIRS reports I-band temperatures; map them onto the MODIS column names the normalizers read
+COLUMN_ALIASES = {'bright_ti4': 'brightness', 'bright_ti5': 'bright_t31'}
+# ...and its low/nominal/high confidence onto the MODIS 0-100 scale (same values parse_confidence uses)
+CONFIDENCE_LEVELS = {'l': '30', 'low': '30', 'n': '60', 'nominal': '60', 'h': '90', 'high': '90'}
+
+WORLD = (-180.0, -90.0, 180.0, 90.0)
+
+class Shard(NamedTuple):
+    product: str
+    bbox: Tuple[float, float, float, float]  # west, south, east, north
+
+    @property
+    def area(self) -> str:
+        if self.bbox == WORLD:
+            return 'world'
+        return ','.join(f"{value:g}" for value in self.bbox)
+
+    def near_edge(self, lon: float, lat: float, epsilon: float = FIRMS_EDGE_EPSILON) -> bool:
+        """Whether a point lies within epsilon of an edge this shard can share with another"""
+        west, south, east, north = self.bbox
+        return ((west > -180 and lon - west <= epsilon) or (east < 180 and east - lon <= epsilon)
+                or (south > -90 and lat - south <= epsilon) or (north < 90 and north - lat <= epsilon))
+
+class ShardsFailed(Exception):
+    """Every shard of a FIRMS pull failed"""
+
+def world_grid(grid: str = FIRMS_SHARD_GRID) -> List[Tuple[float, float, float, float]]:
+    """'4x3' -> 12 bounding boxes covering the globe, west to east, south to north"""
+    columns, rows = (max(1, int(n)) for n in grid.lower().split('x'))
+    width, height = 360.0 / columns, 180.0 / rows
+    return [
+        (-180 + x * width, -90 + y * height, -180 + (x + 1) * width, -90 + (y + 1) * height)
+        for y in range(rows) for x in range(columns)
+    ]
+
+def plan_shards(products: Sequence[str] = FIRMS_PRODUCTS, grid: str = FIRMS_SHARD_GRID) -> List[Shard]:
+    return [Shard(product, bbox) for product in products for bbox in world_grid(grid)]
+
+def pull_deadline(products: Sequence[str] = FIRMS_PRODUCTS, grid: str = FIRMS_SHARD_GRID) -> float:
+    """Seconds a sharded pull needs when every wave of parallel shards takes its full timeout"""
+    waves = -(-len(plan_shards(products, grid)) // FIRMS_SHARD_WORKERS)
+    return waves * FIRMS_SHARD_TIMEOUT
+
+def shard_url(base_url: str, map_key: str, shard: Shard, days_back: int) -> str:
+    # Format: area/csv/map_key/source/area/days
+    return f"{base_url}/api/area/csv/{map_key}/{shard.product}/{shard.area}/{days_back}"
+
+def _download(url: str, timeout: float) -> IO[bytes]:
+    # Retries happen per shard in download_shard, so the body read is retried too
+    spool = tempfile.SpooledTemporaryFile(max_size=FIRMS_SHARD_SPOOL)
+    try:
+        with client().stream(url, timeout=timeout, retries=0) as chunks:
+            for chunk in chunks:
+                spool.write(chunk)
+    except _NETWORK_ERRORS as e:
+        spool.close()
+        raise TransientError(str(e) or type(e).__name__) from e
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+def download_shard(url: str, timeout: float = FIRMS_SHARD_TIMEOUT,
+                   retries: int = FIRMS_SHARD_RETRIES) -> IO[bytes]:
+    """Fetch one shard's CSV into a spooled file, retrying transient failures with backoff"""
+    for attempt in range(retries + 1):
+        try:
+            return _download(url, timeout)
+        except TransientError:
+            if attempt == retries:
+                raise
+            time.sleep(backoff_delay(attempt))
+
+def _coordinate(row: List[str], i: Optional[int]) -> Optional[float]:
+    try:
+        return float(row[i])
+    except (TypeError, IndexError, ValueError):
+        return None
+
+def _normalize_shard(shard: Shard, columns: Dict[str, int], rows: Iterator[List[str]],
+                     edge_seen: set) -> Tuple[Dict[str, int], List[List[str]]]:
+    """VIIRS columns and confidence onto the MODIS names and scale, minus rows another shard already gave"""
+    columns = {
+        COLUMN_ALIASES[name] if name in COLUMN_ALIASES and COLUMN_ALIASES[name] not in columns else name: i
+        for name, i in columns.items()
+    }
+    confidence_i = columns.get('confidence') if shard.product.startswith('VIIRS') else None
+    lat_i, lon_i = columns.get('latitude'), columns.get('longitude')
+    unique = []
+    for row in rows:
+        if confidence_i is not None and len(row) > confidence_i:
+            row[confidence_i] = CONFIDENCE_LEVELS.get(row[confidence_i].lower(), row[confidence_i])
+        lat, lon = _coordinate(row, lat_i), _coordinate(row, lon_i)
+        if lat is None or lon is None or shard.near_edge(lon, lat):
+            key = (shard.product, tuple(row))
+            if key in edge_seen:
+                continue
+            edge_seen.add(key)
+        unique.append(row)
+    return columns, unique
+
+def iter_sharded_rows(
+    base_url: str,
+    map_key: str,
+    days_back: int,
+    shards: Sequence[Shard] = (),
+    max_workers: int = FIRMS_SHARD_WORKERS
+) -> Iterator[Tuple[Shard, Dict[str, int], List[List[str]]]]:
+    """
+    Download shards in parallel and yield (shard, columns, rows) in plan order
+
+    Shards are yielded as soon as they and all earlier shards are in, so
+    normalization overlaps the remaining downloads while output order stays
+    stable. Rows near an edge two shards share are remembered, and a row
+    already seen from the same product there is dropped; rows anywhere else
+    can only come from one shard and are not tracked.
+
+    Raises:
+        ShardsFailed: no shard could be downloaded
+    """
+    shards = list(shards) or plan_shards()
+    edge_seen = set()
+    failed = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(shards)))) as executor:
+        # Each download runs in a copy of the caller's context so its bytes count towards the caller's metrics span
+        futures = [
+            executor.submit(contextvars.copy_context().run, download_shard, shard_url(base_url, map_key, shard, days_back))
+            for shard in shards
+        ]
+        try:
+            for shard, future in zip(shards, futures):
+                try:
+                    body = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"⚠️  FIRMS shard {shard.product} {shard.area} failed: {e}")
+                    continue
+                with body:
+                    columns, rows = read_csv_stream(iter(lambda: body.read(CHUNK_SIZE), b''))
+                    columns, rows = _normalize_shard(shard, columns, rows, edge_seen)
+                yield shard, columns, rows
+        finally:
+            # Bodies of shards never reached (the consumer stopped early) are dropped
+            for future in futures:
+                if not future.cancel() and not future.exception():
+                    future.result().close()
+
+    if failed == len(shards):
+        raise ShardsFailed(f"all {failed} FIRMS shards failed")
+    if failed:
+        print(f"⚠️  {failed}/{len(shards)} FIRMS shards failed; their regions are missing from this refresh")
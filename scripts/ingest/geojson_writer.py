@@ -0,0 +1,190 @@
+"""
+Streaming GeoJSON writer
+Writes features as a generator produces them and commits the file with an
+atomic rename, so the Next.js data route never reads a half-written layer.
+Layers whose features hash the same as last time are not rewritten at all.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from ingest import metrics
+from ingest.atomic import DiscardWrite, atomic_open
+
+# Compact output by default; set GEOJSON_INDENT=2 for human-readable files
+DEFAULT_INDENT = int(os.environ['GEOJSON_INDENT']) if os.environ.get('GEOJSON_INDENT') else None
+
+MANIFEST_DIR = 'manifests'
+
+# Feature properties stamped at fetch time rather than by upstream. Writers of
+# layers that stamp them (weather readings, synthetic and demo layers) pass
+# these as run_stamps, leaving them out of the content hash so a refresh that
+# changed nothing else keeps the existing file and ETag. Other layers hash
+# every property: in FIRMS, for one, 'timestamp' is the acquisition time.
+RUN_STAMP_PROPERTIES = frozenset(
+    name.strip() for name in os.environ.get('GEOJSON_RUN_STAMPS', 'timestamp').split(',') if name.strip()
+)
+
+Metadata = Union[Dict[str, Any], Callable[[int], Dict[str, Any]], None]
+
+def _encoder(indent: Optional[int]) -> json.JSONEncoder:
+    if indent is None:
+        return json.JSONEncoder(separators=(',', ':'))
+    return json.JSONEncoder(indent=indent)
+
+def write_json(path: str, data: Any, indent: Optional[int] = DEFAULT_INDENT):
+    """Atomically write a small JSON document (summaries, manifests)"""
+    with atomic_open(path) as f:
+        f.write(_encoder(indent).encode(data))
+
+def default_exports(path: str) -> List[Any]:
+    """
+    Extra outputs built from the same feature stream as the GeoJSON file
+    Each export gets add(feature) per feature and finish(result, metadata) after the commit
+    (imported here so writing a small JSON file does not load NumPy and friends)
+    """
+    from ingest.columnar import COLUMNAR_EXPORT, ColumnarExport
+    from ingest.geometry import HAVE_NUMPY, LOD_EXPORT, GeometryLodExport
+    from ingest.history import HISTORY_EXPORT, HistoryExport
+    from ingest.pgload import DB_INGEST, HAVE_PSYCOPG, PostgresExport, layer_source
+    from ingest.spatialindex import SPATIAL_INDEX, SpatialIndexExport
+    from ingest.tiles import TILE_EXPORT, TileExport
+
+    exports = []
+    if COLUMNAR_EXPORT:
+        exports.append(ColumnarExport(path))
+    if TILE_EXPORT:
+        exports.append(TileExport(path))
+    if LOD_EXPORT and HAVE_NUMPY:
+        exports.append(GeometryLodExport(path))
+    if SPATIAL_INDEX:
+        exports.append(SpatialIndexExport(path))
+    if HISTORY_EXPORT:
+        exports.append(HistoryExport(path))
+    if DB_INGEST and HAVE_PSYCOPG and layer_source(path):
+        exports.append(PostgresExport(path))
+    return exports
+
+def manifest_path(path: str) -> str:
+    """Per-layer manifest location: public/data/manifests/<layer>.json"""
+    return os.path.join(os.path.dirname(path), MANIFEST_DIR, os.path.basename(path))
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    try:
+        with open(manifest_path(path), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _without_run_stamps(chunk: str, feature: Dict[str, Any], run_stamps: frozenset,
+                        encoder: json.JSONEncoder) -> str:
+    """
+    The encoded feature with its run-stamp properties cut out, for hashing
+    Works on the text: "key":value pairs cannot occur inside an encoded string,
+    so this costs a substring search instead of encoding the feature twice
+    """
+    properties = feature.get('properties')
+    if not run_stamps or not isinstance(properties, dict) or run_stamps.isdisjoint(properties):
+        return chunk
+    for name in run_stamps.intersection(properties):
+        chunk = chunk.replace(encoder.encode(name) + encoder.key_separator + encoder.encode(properties[name]), '', 1)
+    return chunk
+
+def write_feature_collection(
+    path: str,
+    features: Iterable[Dict[str, Any]],
+    metadata: Metadata = None,
+    indent: Optional[int] = DEFAULT_INDENT,
+    skip_unchanged: bool = True,
+    exports: Optional[List[Any]] = None,
+    run_stamps: Iterable[str] = ()
+) -> Dict[str, Any]:
+    """
+    Stream a FeatureCollection to disk one feature at a time
+
+    The features (not the metadata, which carries fetch timestamps, nor the
+    run_stamps properties) are hashed as they are written. When the hash matches the layer manifest
+    the new file is discarded, so the layer keeps its bytes and ETag.
+
+    Args:
+        path: Destination file
+        features: Any iterable of features; generators are consumed lazily
+        metadata: Metadata dict, or a callable receiving the feature count
+            (written after the features so streamed counts are available)
+        indent: None for compact output, or an indent width
+        skip_unchanged: Keep the existing file when the content hash matches
+        exports: Sinks fed the same features (see default_exports)
+        run_stamps: Property names excluded from the content hash
+            (RUN_STAMP_PROPERTIES for layers stamped at fetch time)
+
+    Returns:
+        Dict with the feature count, content hash, byte size and whether
+        the file was rewritten
+    """
+    with metrics.span('save', os.path.basename(path)):
+        encoder = _encoder(indent)
+        encode = encoder.encode
+        exports = exports or []
+        digest = hashlib.sha256()
+        run_stamps = frozenset(run_stamps)
+        previous = read_manifest(path) if skip_unchanged and os.path.exists(path) else {}
+        result = {"count": 0, "hash": None, "bytes": 0, "changed": True}
+
+        with atomic_open(path) as f:
+            f.write('{"type":"FeatureCollection","features":[')
+            for feature in features:
+                chunk = encode(feature)
+                if result["count"]:
+                    f.write(',')
+                    digest.update(b',')
+                f.write(chunk)
+                digest.update(_without_run_stamps(chunk, feature, run_stamps, encoder).encode('utf-8'))
+                for export in exports:
+                    export.add(feature)
+                result["count"] += 1
+            f.write(']')
+            result["hash"] = digest.hexdigest()
+
+            if previous.get('hash') == result["hash"]:
+                result["changed"] = False
+                result["bytes"] = previous.get('bytes', 0)
+                raise DiscardWrite()
+
+            if callable(metadata):
+                metadata = metadata(result["count"])
+            if metadata is not None:
+                f.write(',"metadata":')
+                f.write(encode(metadata))
+            f.write('}')
+            f.flush()
+            result["bytes"] = os.fstat(f.fileno()).st_size
+
+        if result["changed"]:
+            write_json(manifest_path(path), {
+                "layer": os.path.basename(path),
+                "hash": result["hash"],
+                "etag": f'"{result["hash"][:32]}"',
+                "count": result["count"],
+                "bytes": result["bytes"],
+                "updated_at": datetime.utcnow().isoformat() + "Z"
+            }, indent=2)
+        for export in exports:
+            export.finish(result, metadata if isinstance(metadata, dict) else None)
+        metrics.count(rows_kept=result["count"], bytes_out=result["bytes"] if result["changed"] else 0)
+        return result
+
+def save_geojson(data: Dict[str, Any], path: str, indent: Optional[int] = DEFAULT_INDENT,
+                 run_stamps: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Write a script's output dict: FeatureCollections are streamed (and
+    skipped when unchanged), anything else is written as plain JSON.
+    Returns the write result from write_feature_collection.
+    """
+    if data.get('type') == 'FeatureCollection' and 'features' in data:
+        return write_feature_collection(path, data['features'], data.get('metadata'), indent,
+                                        exports=default_exports(path), run_stamps=run_stamps)
+    write_json(path, data, indent)
+    return {"count": 0, "hash": None, "bytes": os.path.getsize(path), "changed": True}
@@ -0,0 +1,274 @@
+"""
+Geometry post-processing for polygon layers (NOAA alerts)
+Rings are simplified with Douglas-Peucker over one NumPy coordinate array
+per batch of features (about GEOMETRY_BATCH_POINTS vertices, so memory
+does not grow with the layer), then quantized. The layer file itself carries the
+finest tolerance, so the map never draws distorted outlines; every feature
+gets bbox and centroid properties so the globe can cull without touching
+geometry. Coarser copies of the layer, simplified further from the layer's
+geometry, are written for clients that want lighter files at low zooms:
+
+    public/data/lod/<layer>/index.json      tolerances and the zooms they suit
+    public/data/lod/<layer>/<level>.json    FeatureCollection at that tolerance
+"""
+
+import json
+import os
+from contextlib import ExitStack
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ingest.atomic import DiscardWrite, atomic_open
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+LOD_DIR = 'lod'
+# Tolerances in degrees: the finest is applied to the layer itself, the rest become LOD files
+GEOMETRY_TOLERANCES = [float(t) for t in os.environ.get('GEOMETRY_TOLERANCES', '0.001,0.01,0.05').split(',')]
+LAYER_TOLERANCE = min(GEOMETRY_TOLERANCES)
+LOD_TOLERANCES = sorted((t for t in GEOMETRY_TOLERANCES if t != LAYER_TOLERANCE), reverse=True)
+GEOMETRY_DIGITS = int(os.environ.get('GEOMETRY_DIGITS', '5'))  # ~1 m at the equator
+LOD_EXPORT = os.environ.get('LOD_EXPORT', '1') != '0'
+GEOMETRY_BATCH_POINTS = int(os.environ.get('GEOMETRY_BATCH_POINTS', '65536'))  # vertices simplified per NumPy pass
+
+def lod_max_zoom(tolerance: float) -> int:
+    """Highest zoom at which a tolerance stays under about one screen pixel (256 px tiles)"""
+    zoom = 0
+    while zoom < 22 and 360.0 / (256 << (zoom + 1)) >= tolerance:
+        zoom += 1
+    return zoom
+
+def simplify_rings(rings: List["np.ndarray"], tolerance: float, digits: int = GEOMETRY_DIGITS) -> List["np.ndarray"]:
+    """
+    Douglas-Peucker over many (n, 2) rings at once, then quantize
+
+    All rings are concatenated; each pass measures the points of every
+    unfinished segment against its chord and keeps the farthest point of
+    each segment still over tolerance, so the number of NumPy calls grows
+    with the split depth, not with the number of rings or vertices.
+    Closed rings have a degenerate chord and split at the point farthest
+    from their start. Rings that would collapse below a triangle are kept
+    whole; quantizing drops consecutive points that became identical.
+    """
+    if not rings:
+        return []
+    counts = np.array([len(ring) for ring in rings])
+    points = np.concatenate(rings)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ring_of = np.repeat(np.arange(len(rings)), counts)
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[starts] = True
+    keep[starts + counts - 1] = True
+    if tolerance <= 0:
+        keep[:] = True
+    keep |= (counts <= 4)[ring_of]
+
+    # Unkept points of segments that may still split; finished segments drop out
+    active = np.flatnonzero(~keep)
+    while len(active):
+        kept = np.flatnonzero(keep)
+        segment = np.searchsorted(kept, active) - 1
+        start, end = points[kept[segment]], points[kept[segment + 1]]
+        chord, offset = end - start, points[active] - start
+        length = np.hypot(chord[:, 0], chord[:, 1])
+        cross = np.abs(chord[:, 0] * offset[:, 1] - chord[:, 1] * offset[:, 0])
+        distance = np.where(length > 0, cross / np.where(length > 0, length, 1), np.hypot(offset[:, 0], offset[:, 1]))
+
+        bounds = np.flatnonzero(np.concatenate(([True], segment[1:] != segment[:-1])))
+        group = np.repeat(np.arange(len(bounds)), np.diff(np.append(bounds, len(active))))
+        farthest = np.maximum.reduceat(distance, bounds)
+        splits = (farthest > tolerance)[group]
+        candidates = np.flatnonzero(splits & (distance == farthest[group]))
+        _, first = np.unique(group[candidates], return_index=True)
+        keep[active[candidates[first]]] = True
+        active = active[splits & ~keep[active]]
+
+    collapsed = np.bincount(ring_of[keep], minlength=len(rings)) < 4
+    keep |= collapsed[ring_of]
+
+    points, ring_of = np.round(points[keep], digits), ring_of[keep]
+    moved = np.ones(len(points), dtype=bool)
+    moved[1:] = np.any(points[1:] != points[:-1], axis=1) | (ring_of[1:] != ring_of[:-1])
+    points, ring_of = points[moved], ring_of[moved]
+    return np.split(points, np.cumsum(np.bincount(ring_of, minlength=len(rings)))[:-1])
+
+def _polygons(geometry: Dict[str, Any]) -> List[List["np.ndarray"]]:
+    if geometry['type'] == 'Polygon':
+        polygons = [geometry['coordinates']]
+    else:
+        polygons = geometry['coordinates']
+    return [[np.asarray(ring, dtype=np.float64)[:, :2] for ring in polygon if len(ring)] for polygon in polygons]
+
+def _ring_area_centroid(ring: "np.ndarray") -> Tuple[float, float, float]:
+    """Signed shoelace area and area centroid of a ring"""
+    x, y = ring[:, 0], ring[:, 1]
+    x1, y1 = np.roll(x, -1), np.roll(y, -1)
+    cross = x * y1 - x1 * y
+    area = cross.sum() / 2
+    if area == 0:
+        return 0.0, float(x.mean()), float(y.mean())
+    return float(area), float(((x + x1) * cross).sum() / (6 * area)), float(((y + y1) * cross).sum() / (6 * area))
+
+def bbox_and_centroid(polygons: List[List["np.ndarray"]]) -> Tuple[List[float], List[float]]:
+    """[west, south, east, north] and the area-weighted centroid of the outer rings"""
+    points = np.concatenate([ring for polygon in polygons for ring in polygon])
+    low, high = points.min(axis=0), points.max(axis=0)
+    weighted = [_ring_area_centroid(polygon[0]) for polygon in polygons if len(polygon)]
+    total = sum(abs(area) for area, _, _ in weighted)
+    if total:
+        cx = sum(abs(area) * x for area, x, _ in weighted) / total
+        cy = sum(abs(area) * y for area, _, y in weighted) / total
+    else:
+        cx, cy = float(points[:, 0].mean()), float(points[:, 1].mean())
+    digits = GEOMETRY_DIGITS
+    return ([round(float(v), digits) for v in (low[0], low[1], high[0], high[1])],
+            [round(cx, digits), round(cy, digits)])
+
+def simplify_geometries(geometries: List[List[List["np.ndarray"]]], tolerance: float) -> List[Dict[str, Any]]:
+    """
+    GeoJSON Polygon/MultiPolygon dicts for many geometries (lists of polygons
+    of rings), simplified together in one simplify_rings call; holes that
+    collapse are dropped
+    """
+    rings = [ring for polygons in geometries for polygon in polygons for ring in polygon]
+    simplified = iter(simplify_rings(rings, tolerance))
+    output = []
+    for polygons in geometries:
+        coordinates = []
+        for polygon in polygons:
+            kept = []
+            for i, _ in enumerate(polygon):
+                ring = next(simplified)
+                if len(ring) >= 4 or i == 0:
+                    kept.append(ring.tolist())
+            coordinates.append(kept)
+        if len(coordinates) == 1:
+            output.append({"type": "Polygon", "coordinates": coordinates[0]})
+        else:
+            output.append({"type": "MultiPolygon", "coordinates": coordinates})
+    return output
+
+def _is_polygonal(geometry: Optional[Dict[str, Any]]) -> bool:
+    return bool(geometry) and geometry.get('type') in ('Polygon', 'MultiPolygon') and bool(geometry.get('coordinates'))
+
+def _vertex_count(polygons: Optional[List[List["np.ndarray"]]]) -> int:
+    return sum(len(ring) for polygon in polygons for ring in polygon) if polygons else 0
+
+def _batches(items: Iterable[Tuple[Any, Optional[List[List["np.ndarray"]]]]]) -> Iterator[List[Tuple[Any, Any]]]:
+    """(item, polygons) pairs grouped into runs of about GEOMETRY_BATCH_POINTS vertices"""
+    batch, points = [], 0
+    for item in items:
+        batch.append(item)
+        points += _vertex_count(item[1])
+        if points >= GEOMETRY_BATCH_POINTS:
+            yield batch
+            batch, points = [], 0
+    if batch:
+        yield batch
+
+def prepare_polygon_features(
+    features: Iterable[Dict[str, Any]],
+    tolerance: float = LAYER_TOLERANCE
+) -> List[Dict[str, Any]]:
+    """
+    Simplify and quantize polygon geometries in batches of features and add
+    bbox/centroid properties. Features without polygon geometry pass
+    through unchanged, as does everything when NumPy is not installed
+    """
+    features = list(features)
+    if not HAVE_NUMPY:
+        return features
+    polygonal = ((i, _polygons(feature['geometry'])) for i, feature in enumerate(features)
+                 if _is_polygonal(feature.get('geometry')))
+    for batch in _batches(polygonal):
+        simplified = simplify_geometries([polygons for _, polygons in batch], tolerance)
+        for (i, polygons), geometry in zip(batch, simplified):
+            source = features[i]
+            bbox, centroid = bbox_and_centroid(polygons)
+            features[i] = {**source, "geometry": geometry,
+                           "properties": {**source.get('properties', {}), "bbox": bbox, "centroid": centroid}}
+    return features
+
+class GeometryLodExport:
+    """
+    Layer export sink: coarser copies of a polygon layer for low zooms
+    Every level is streamed to its own file, GEOMETRY_BATCH_POINTS vertices
+    of features at a time, simplified further from the layer's geometry
+    (already at LAYER_TOLERANCE, which is finer than every level)
+    """
+
+    def __init__(self, layer_path: str, tolerances: List[float] = LOD_TOLERANCES):
+        name = os.path.splitext(os.path.basename(layer_path))[0]
+        self.root = os.path.join(os.path.dirname(layer_path), LOD_DIR, name)
+        self.layer = os.path.basename(layer_path)
+        self.tolerances = tolerances
+        self.encode = json.JSONEncoder(separators=(',', ':')).encode
+        self.files: List[IO] = []
+        self.stack = ExitStack()
+        self.pending: List[Tuple[Dict[str, Any], Optional[List[List["np.ndarray"]]]]] = []
+        self.pending_points = 0
+        self.written = 0
+        self.polygonal = False
+        self.disabled = not tolerances
+
+    def _open(self):
+        for level in range(len(self.tolerances)):
+            f = self.stack.enter_context(atomic_open(os.path.join(self.root, f"{level}.json")))
+            f.write('{"type":"FeatureCollection","features":[')
+            self.files.append(f)
+
+    def _discard(self):
+        self.files, self.pending = [], []
+        self.stack.__exit__(DiscardWrite, DiscardWrite(), None)
+
+    def _flush(self):
+        if not self.pending:
+            return
+        if not self.files:
+            self._open()
+        polygonal = [polygons for _, polygons in self.pending if polygons is not None]
+        for f, tolerance in zip(self.files, self.tolerances):
+            simplified = iter(simplify_geometries(polygonal, tolerance))
+            chunks = [self.encode(feature if polygons is None else {**feature, "geometry": next(simplified)})
+                      for feature, polygons in self.pending]
+            if self.written:
+                f.write(',')
+            f.write(','.join(chunks))
+        self.written += len(self.pending)
+        self.pending, self.pending_points = [], 0
+
+    def add(self, feature: Dict[str, Any]):
+        if self.disabled:
+            return
+        geometry = feature.get('geometry')
+        if geometry and not _is_polygonal(geometry):
+            # Point and line layers have nothing to simplify
+            self.disabled = True
+            self._discard()
+            return
+        polygons = _polygons(geometry) if geometry else None
+        self.pending.append((feature, polygons))
+        self.pending_points += _vertex_count(polygons)
+        self.polygonal = self.polygonal or bool(geometry)
+        if self.pending_points >= GEOMETRY_BATCH_POINTS:
+            self._flush()
+
+    def finish(self, result: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None):
+        if self.disabled:
+            return
+        if not self.polygonal or (not result['changed'] and os.path.exists(os.path.join(self.root, 'index.json'))):
+            self._discard()
+            return
+        self._flush()
+        for f in self.files:
+            f.write(']}')
+        self.stack.close()
+        levels = [{"url": f"{level}.json", "tolerance": tolerance, "max_zoom": lod_max_zoom(tolerance)}
+                  for level, tolerance in enumerate(self.tolerances)]
+        with atomic_open(os.path.join(self.root, 'index.json')) as f:
+            json.dump({"layer": self.layer, "version": result['hash'][:12], "layer_tolerance": LAYER_TOLERANCE,
+                       "levels": levels}, f, separators=(',', ':'))
@@ -0,0 +1,327 @@
+"""
+Append-only layer history for the TimeSlider
+Every layer write overwrites public/data/<layer>.json; the history keeps what
+each run saw, as segment files partitioned by event day:
+
+    public/data/history/<layer>/<YYYY-MM-DD>/<run>.ndjson     one segment per ingest run
+    public/data/history/<layer>/<YYYY-MM-DD>/compacted.ndjson segments merged, deduplicated
+
+Each line is "<epoch seconds>\\t<feature key>\\t<feature JSON>", so a window
+query only parses the features inside the window, and only opens the day
+partitions it overlaps. A feature seen by several runs (FIRMS and USGS feeds
+overlap from run to run) is returned once, as the latest run saw it.
+
+Closed days, and open days with many segments, are compacted after each
+append; partitions older than HISTORY_RETENTION_DAYS are dropped, and then
+the oldest partitions until the layer fits HISTORY_MAX_BYTES. Disk use grows
+by one compacted day per day per layer (a global FIRMS day is the largest,
+at a few hundred bytes per detection), so the byte budget is what bounds a
+busy layer within the retention window; the newest day is always kept.
+
+    from ingest.history import query
+    for feature in query('public/data/nasa-firms.json', '2024-01-01', '2024-01-15'):
+        ...
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from ingest.atomic import atomic_open
+from ingest.pgload import TIME_PROPERTIES
+from ingest.spatialindex import Time, epoch_seconds, feature_bbox
+
+HISTORY_DIR = 'history'
+HISTORY_EXPORT = os.environ.get('HISTORY_EXPORT', '1') != '0'
+HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', '90'))
+HISTORY_MAX_BYTES = int(os.environ.get('HISTORY_MAX_BYTES', str(2 * 1024 ** 3)))  # per layer, 0 = no budget
+COMPACT_SEGMENTS = int(os.environ.get('HISTORY_COMPACT_SEGMENTS', '8'))  # compact an open day past this many
+MAX_OPEN_SEGMENTS = 64  # feeds spanning months (EONET) write to many days at once
+
+COMPACTED = 'compacted.ndjson'
+SEGMENT_SUFFIX = '.ndjson'
+
+Partition = Tuple[str, str]  # (YYYY-MM-DD, directory)
+
+def history_dir(path: str) -> str:
+    """public/data/nasa-firms.json -> public/data/history/nasa-firms"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(path), HISTORY_DIR, name)
+
+def feature_time(feature: Dict[str, Any]) -> Optional[float]:
+    props = feature.get('properties') or {}
+    for name in TIME_PROPERTIES:
+        value = props.get(name)
+        seconds = epoch_seconds(value) if isinstance(value, str) else None
+        if seconds is not None:
+            return seconds
+    return None
+
+def feature_key(feature: Dict[str, Any], encoded: str) -> str:
+    """Upstream id when the feed has one, otherwise a hash of the feature itself"""
+    props = feature.get('properties') or {}
+    key = props.get('id') or props.get('event_id') or feature.get('id')
+    if key:
+        key = str(key)
+        if '\t' not in key and '\n' not in key:
+            return key
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+def day_of(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%d')
+
+class HistoryWriter:
+    """
+    Appends one run's features as new day segments
+    Lines go to temp files in an incoming directory and are renamed into the
+    partitions on commit, so a failed run leaves no partial segment behind
+    """
+
+    def __init__(self, path: str, ingested_at: Optional[float] = None):
+        self.root = history_dir(path)
+        self.ingested_at = ingested_at if ingested_at is not None else datetime.now(timezone.utc).timestamp()
+        stamp = datetime.fromtimestamp(self.ingested_at, timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+        self.segment = f"{stamp}-{os.getpid()}{SEGMENT_SUFFIX}"
+        self.incoming = os.path.join(self.root, f".incoming-{stamp}-{os.getpid()}")
+        os.makedirs(self.incoming, exist_ok=True)
+        self.encode = json.JSONEncoder(separators=(',', ':')).encode
+        self.files: 'OrderedDict[str, IO]' = OrderedDict()
+        self.days: Dict[str, int] = {}
+        self.count = 0
+
+    def _file(self, day: str) -> IO:
+        handle = self.files.get(day)
+        if handle is not None:
+            self.files.move_to_end(day)
+            return handle
+        if len(self.files) >= MAX_OPEN_SEGMENTS:
+            self.files.popitem(last=False)[1].close()
+        handle = open(os.path.join(self.incoming, day + SEGMENT_SUFFIX), 'a', encoding='utf-8')
+        self.files[day] = handle
+        return handle
+
+    def add(self, feature: Dict[str, Any]):
+        encoded = self.encode(feature)
+        seconds = feature_time(feature)
+        # Features without an event time are filed under the day they were ingested
+        day = day_of(seconds if seconds is not None else self.ingested_at)
+        self._file(day).write(f"{'' if seconds is None else repr(seconds)}\t{feature_key(feature, encoded)}\t{encoded}\n")
+        self.days[day] = self.days.get(day, 0) + 1
+        self.count += 1
+
+    def commit(self) -> List[str]:
+        """Move the segments into their partitions; returns the days written"""
+        try:
+            for handle in self.files.values():
+                handle.flush()
+                os.fsync(handle.fileno())
+                handle.close()
+            self.files.clear()
+            for day in sorted(self.days):
+                partition = os.path.join(self.root, day)
+                os.makedirs(partition, exist_ok=True)
+                os.replace(os.path.join(self.incoming, day + SEGMENT_SUFFIX), os.path.join(partition, self.segment))
+            os.rmdir(self.incoming)
+        except BaseException:
+            self.discard()
+            raise
+        return sorted(self.days)
+
+    def discard(self):
+        for handle in self.files.values():
+            handle.close()
+        self.files.clear()
+        shutil.rmtree(self.incoming, ignore_errors=True)
+
+class HistoryExport:
+    """Layer export sink: appends the run to the layer history once the layer commits"""
+
+    def __init__(self, layer_path: str):
+        self.layer_path = layer_path
+        self.layer = os.path.basename(layer_path)
+        self.writer: Optional[HistoryWriter] = None
+        self.failed = None
+
+    def add(self, feature: Dict[str, Any]):
+        if self.failed:
+            return
+        try:
+            if self.writer is None:
+                self.writer = HistoryWriter(self.layer_path)
+            self.writer.add(feature)
+        except Exception as e:
+            self.failed = str(e)
+
+    def finish(self, result: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None):
+        if self.writer is None:
+            return
+        # An unchanged layer holds exactly the features the last run appended
+        if self.failed or (not result['changed'] and partitions(self.layer_path)):
+            self.writer.discard()
+            if self.failed:
+                print(f"⚠️  History for {self.layer} not appended: {self.failed}")
+            return
+        try:
+            self.writer.commit()
+            prune(self.layer_path)
+            compact(self.layer_path)
+        except Exception as e:
+            print(f"⚠️  History for {self.layer} not appended: {e}")
+
+def partitions(layer_path: str, start: Time = None, end: Time = None) -> List[Partition]:
+    """Day partitions of a layer overlapping [start, end), oldest first"""
+    root = history_dir(layer_path)
+    try:
+        names = sorted(name for name in os.listdir(root) if not name.startswith('.'))
+    except FileNotFoundError:
+        return []
+    first = day_of(epoch_seconds(start)) if start is not None else None
+    last = day_of(epoch_seconds(end) - 1e-6) if end is not None else None
+    return [(name, os.path.join(root, name)) for name in names
+            if (first is None or name >= first) and (last is None or name <= last)]
+
+def _segments(directory: str) -> List[str]:
+    """Partition files in merge order: the compacted file, then segments oldest run first"""
+    names = [name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX) and not name.startswith('.')]
+    segments = sorted(name for name in names if name != COMPACTED)
+    return ([COMPACTED] if COMPACTED in names else []) + segments
+
+def _needs_compaction(day: str, directory: str) -> bool:
+    files = _segments(directory)
+    closed = day < datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    return len(files) > 1 and (closed or len(files) > COMPACT_SEGMENTS)
+
+def _read_lines(directory: str, start: Optional[float] = None, end: Optional[float] = None,
+                undated: bool = True) -> List[Tuple[float, str, str]]:
+    """(time, key, feature JSON) per feature key in the window, latest run wins, oldest first"""
+    for _ in range(3):
+        latest: Dict[str, Tuple[float, str, str]] = {}
+        try:
+            for name in _segments(directory):
+                with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                    for line in f:
+                        stamp, key, encoded = line.rstrip('\n').split('\t', 2)
+                        if not stamp:
+                            if undated:
+                                latest[key] = (float('-inf'), key, encoded)
+                            continue
+                        seconds = float(stamp)
+                        if (start is None or seconds >= start) and (end is None or seconds < end):
+                            latest[key] = (seconds, key, encoded)
+                        else:
+                            latest.pop(key, None)
+        except FileNotFoundError:
+            continue  # compacted underneath us; its output now holds the segment
+        return sorted(latest.values(), key=lambda row: row[:2])
+    raise RuntimeError(f"history partition {directory} kept changing while being read")
+
+def compact_partition(directory: str) -> int:
+    """Merge a day's segments into compacted.ndjson, one line per feature; returns the line count"""
+    merged = _segments(directory)
+    rows = _read_lines(directory)
+    with atomic_open(os.path.join(directory, COMPACTED)) as f:
+        for seconds, key, encoded in rows:
+            f.write(f"{'' if seconds == float('-inf') else repr(seconds)}\t{key}\t{encoded}\n")
+    for name in merged:
+        if name != COMPACTED:
+            os.unlink(os.path.join(directory, name))
+    return len(rows)
+
+def compact(layer_path: str, force: bool = False) -> Dict[str, int]:
+    """Compact every partition that needs it (force: every partition with more than one file)"""
+    done = {}
+    for day, directory in partitions(layer_path):
+        if _needs_compaction(day, directory) or (force and len(_segments(directory)) > 1):
+            done[day] = compact_partition(directory)
+    return done
+
+def _partition_bytes(directory: str) -> int:
+    total = 0
+    for name in os.listdir(directory):
+        try:
+            total += os.path.getsize(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass  # compacted away while we looked
+    return total
+
+def prune(layer_path: str, retention_days: int = HISTORY_RETENTION_DAYS,
+          now: Optional[datetime] = None, max_bytes: int = HISTORY_MAX_BYTES) -> List[str]:
+    """
+    Drop partitions older than the retention window, then the oldest ones
+    until the layer fits max_bytes; returns the days removed
+    """
+    now = now or datetime.now(timezone.utc)
+    root = history_dir(layer_path)
+    # Incoming directories of runs that died before committing
+    for name in os.listdir(root) if os.path.isdir(root) else []:
+        stale = os.path.join(root, name)
+        if name.startswith('.incoming-') and os.path.getmtime(stale) < now.timestamp() - 86400:
+            shutil.rmtree(stale, ignore_errors=True)
+    removed = []
+    kept = partitions(layer_path)
+    if retention_days > 0:
+        cutoff = (now - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+        for day, directory in kept:
+            if day < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+                removed.append(day)
+        kept = [(day, directory) for day, directory in kept if day >= cutoff]
+    if max_bytes > 0:
+        sizes = [_partition_bytes(directory) for _, directory in kept]
+        total = sum(sizes)
+        for (day, directory), size in zip(kept[:-1], sizes):
+            if total <= max_bytes:
+                break
+            shutil.rmtree(directory, ignore_errors=True)
+            removed.append(day)
+            total -= size
+    return removed
+
+def _in_bbox(feature: Dict[str, Any], bbox: Tuple[float, float, float, float]) -> bool:
+    box = feature_bbox(feature)
+    if box is None:
+        return False
+    west, south, east, north = bbox
+    if box[3] < south or box[1] > north:
+        return False
+    if west <= east:
+        return box[2] >= west and box[0] <= east
+    return box[2] >= west or box[0] <= east  # window across the antimeridian
+
+def query(layer_path: str, start: Time = None, end: Time = None, kind: Optional[str] = None,
+          bbox: Optional[Tuple[float, float, float, float]] = None,
+          limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Features with an event time in [start, end), oldest first
+    Only the day partitions overlapping the window are read, and only lines
+    whose time falls inside it are parsed. Features without an event time
+    are included when their ingest day is in the window.
+    """
+    low = epoch_seconds(start) if start is not None else None
+    high = epoch_seconds(end) if end is not None else None
+    returned = 0
+    for _, directory in partitions(layer_path, start, end):
+        for _, _, encoded in _read_lines(directory, low, high):
+            feature = json.loads(encoded)
+            if kind is not None and (feature.get('properties') or {}).get('type') != kind:
+                continue
+            if bbox is not None and not _in_bbox(feature, bbox):
+                continue
+            yield feature
+            returned += 1
+            if limit is not None and returned >= limit:
+                return
+
+def summary(layer_path: str) -> Dict[str, Any]:
+    """Days on disk with their file counts and sizes, for the CLI and playback range"""
+    days = {}
+    for day, directory in partitions(layer_path):
+        files = _segments(directory)
+        days[day] = {"files": len(files),
+                     "bytes": sum(os.path.getsize(os.path.join(directory, name)) for name in files)}
+    return {"layer": os.path.basename(layer_path), "first_day": min(days, default=None),
+            "last_day": max(days, default=None), "days": days}
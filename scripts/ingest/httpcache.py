@@ -0,0 +1,253 @@
+"""
+Conditional HTTP requests with an on-disk response cache
+Remembers ETag/Last-Modified per URL so unchanged upstream feeds cost a
+304 round-trip instead of a full download, parse and rewrite
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from ingest.httpclient import client
+
+CACHE_DIR = os.environ.get('HTTP_CACHE_DIR', os.path.join(os.path.dirname(__file__), '..', '..', '.cache', 'http'))
+CACHE_TTL = float(os.environ.get('HTTP_CACHE_TTL', '60'))  # seconds a response is served without revalidating
+CACHE_MAX_AGE = float(os.environ.get('HTTP_CACHE_MAX_AGE', str(7 * 24 * 3600)))  # unused entries expire after this
+CACHE_MAX_BYTES = int(os.environ.get('HTTP_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# When False, a 304 hands back the cached body instead of raising NotModified
+_skip_unchanged: ContextVar[bool] = ContextVar('skip_unchanged', default=True)
+
+# Layer whose refresh is fetching, and which refresh of it; its responses'
+# validators wait for commit(layer)
+_layer: ContextVar[Optional[Tuple[str, object]]] = ContextVar('cache_layer', default=None)
+_uncommitted: Dict[str, List[Tuple['ResponseCache', str, Dict[str, Any]]]] = {}
+# The refresh of each layer whose responses may still be held back; discard()
+# ends it, so a fetch abandoned past its deadline cannot register any more
+_refreshes: Dict[str, object] = {}
+_uncommitted_lock = threading.Lock()
+
+class NotModified(Exception):
+    """Upstream content is unchanged since the last successful fetch"""
+
+    def __init__(self, url: str):
+        super().__init__(f"{url} not modified")
+        self.url = url
+
+@contextmanager
+def unconditional():
+    """Return cached bodies on 304 instead of raising, e.g. when the layer file is missing"""
+    token = _skip_unchanged.set(False)
+    try:
+        yield
+    finally:
+        _skip_unchanged.reset(token)
+
+@contextmanager
+def deferred(layer: str):
+    """
+    Hold back the validators of responses fetched for a layer until commit(layer)
+    Until the layer is saved its cache entries are never answered with 304 or
+    NotModified, so a refresh that fell back or failed to save downloads in
+    full next time instead of keeping the stale layer. An exception discards them.
+    """
+    refresh = object()
+    with _uncommitted_lock:
+        _uncommitted.pop(layer, None)
+        _refreshes[layer] = refresh
+    token = _layer.set((layer, refresh))
+    try:
+        yield refresh
+    except BaseException:
+        discard(layer, refresh)
+        raise
+    finally:
+        _layer.reset(token)
+
+def commit(layer: str):
+    """The layer was written: its responses may now revalidate as unchanged"""
+    with _uncommitted_lock:
+        entries = _uncommitted.pop(layer, [])
+        _refreshes.pop(layer, None)
+    for cache, url, validators in entries:
+        cache.validate(url, validators)
+
+def discard(layer: str, refresh: Optional[object] = None):
+    """
+    The layer fell back to other data: keep its responses unvalidated
+    Responses its refresh fetches from now on are not held for commit either.
+    Given the refresh deferred() yielded, only that refresh is discarded, so
+    one that finishes late cannot drop a newer refresh's responses.
+    """
+    with _uncommitted_lock:
+        if refresh is not None and _refreshes.get(layer) is not refresh:
+            return
+        _uncommitted.pop(layer, None)
+        _refreshes.pop(layer, None)
+
+def active(layer: str, refresh: object) -> bool:
+    """Whether a refresh deferred() yielded has not been committed or discarded"""
+    with _uncommitted_lock:
+        return _refreshes.get(layer) is refresh
+
+def _hold(cache: 'ResponseCache', url: str, validators: Dict[str, Any], layer: str, refresh: object):
+    with _uncommitted_lock:
+        if _refreshes.get(layer) is refresh:
+            _uncommitted.setdefault(layer, []).append((cache, url, validators))
+
+class ResponseCache:
+    """
+    Disk cache keyed by URL: <key>.json holds validators, <key>.body the payload
+    Entries are evicted after max_age without use, or oldest-first past max_bytes
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_age: float = CACHE_MAX_AGE, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + '.json', base + '.body'
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(body_path):
+            return None
+        meta['body_path'] = body_path
+        return meta
+
+    def read_body(self, entry: Dict[str, Any]) -> bytes:
+        os.utime(entry['body_path'])  # mark as recently used for eviction
+        with open(entry['body_path'], 'rb') as f:
+            return f.read()
+
+    def touch(self, url: str, entry: Dict[str, Any]):
+        """Record a successful revalidation"""
+        entry = {k: v for k, v in entry.items() if k != 'body_path'}
+        entry['checked_at'] = time.time()
+        self._write_meta(url, entry)
+
+    def put(self, url: str, body: bytes, headers, validated: bool = True) -> Dict[str, Any]:
+        """
+        Store a response; returns its validators
+        With validated=False they are left out until validate() is called
+        """
+        meta_path, body_path = self._paths(url)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = body_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, body_path)
+        validators = {
+            "etag": headers.get('ETag'),
+            "last_modified": headers.get('Last-Modified'),
+            "checked_at": time.time(),
+        }
+        self._write_meta(url, {
+            "url": url,
+            **(validators if validated else {"etag": None, "last_modified": None, "checked_at": 0}),
+            "fetched_at": time.time(),
+            "size": len(body)
+        })
+        self.evict()
+        return validators
+
+    def validate(self, url: str, validators: Dict[str, Any]):
+        """Add validators held back by put(validated=False)"""
+        entry = self.get(url)
+        if entry is not None:
+            self.touch(url, {**entry, **validators})
+
+    def _write_meta(self, url: str, meta: Dict[str, Any]):
+        meta_path, _ = self._paths(url)
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones until under budget"""
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith('.body')]
+        except FileNotFoundError:
+            return
+        now = time.time()
+        entries = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            for victim in (path, path[:-len('.body')] + '.json'):
+                try:
+                    os.unlink(victim)
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+_cache = ResponseCache()
+
+def fetch_bytes(url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 30,
+                ttl: float = CACHE_TTL, cache: Optional[ResponseCache] = None) -> bytes:
+    """
+    GET a URL through the response cache
+
+    Fresh entries (younger than ttl) are not revalidated at all; stale ones
+    are revalidated with If-None-Match / If-Modified-Since.
+
+    Raises:
+        NotModified: the content is unchanged since it was last fetched
+    """
+    cache = cache or _cache
+    entry = cache.get(url)
+
+    if entry and time.time() - entry.get('checked_at', 0) < ttl:
+        if _skip_unchanged.get():
+            raise NotModified(url)
+        return cache.read_body(entry)
+
+    request_headers = dict(headers or {})
+    if entry:
+        if entry.get('etag'):
+            request_headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            request_headers['If-Modified-Since'] = entry['last_modified']
+
+    response = client().get(url, headers=request_headers, timeout=timeout)
+    if response.status == 304 and entry:
+        cache.touch(url, entry)
+        if _skip_unchanged.get():
+            raise NotModified(url)
+        return cache.read_body(entry)
+
+    refresh = _layer.get()
+    validators = cache.put(url, response.body, response.headers, validated=refresh is None)
+    if refresh is not None:
+        _hold(cache, url, validators, *refresh)
+    return response.body
+
+def fetch_text(url: str, **kwargs) -> str:
+    return fetch_bytes(url, **kwargs).decode('utf-8')
+
+def fetch_json(url: str, **kwargs) -> Any:
+    return json.loads(fetch_bytes(url, **kwargs))
@@ -0,0 +1,297 @@
+"""
+Shared HTTP client for every fetcher
+One requests Session with a keep-alive connection pool per host, so a
+refresh pays one TCP and TLS handshake per upstream instead of one per
+request. Proxies (HTTPS_PROXY, NO_PROXY, ...), the CA bundle (certifi or
+REQUESTS_CA_BUNDLE) and gzip/deflate/brotli decoding come from requests;
+timeouts and retries are configured here once for all sources. Connect
+and read failures, 429 and 5xx are retried with exponential backoff by the
+adapter; TLS and certificate failures are not.
+HTTP_HTTP2=1 switches to HTTP/2 through httpx when it is installed
+(pip install 'httpx[http2]').
+"""
+
+import http.client
+import json
+import os
+import random
+import ssl
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ingest import metrics
+
+# Optional extra: HTTP/2
+try:
+    import httpx
+    import h2  # noqa: F401 - httpx needs it for http2=True
+    HAVE_HTTP2 = True
+except ImportError:
+    HAVE_HTTP2 = False
+
+USER_AGENT = 'Terra Atlas/1.0'
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', '30'))
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', '2'))  # extra attempts for transient failures
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', '8'))  # idle connections kept per host
+HTTP_HTTP2 = os.environ.get('HTTP_HTTP2', '0') == '1'
+MAX_REDIRECTS = 5
+READ_CHUNK = 64 * 1024
+TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+
+class TransientError(Exception):
+    """A failure worth retrying (rate limited, server error, network trouble)"""
+
+class HTTPError(Exception):
+    """Non-transient HTTP error status (4xx other than 429)"""
+
+    def __init__(self, url: str, status: int, reason: str = ''):
+        super().__init__(f"HTTP {status} {reason} for {url}".replace('  ', ' '))
+        self.url = url
+        self.status = status
+
+def _is_transient(status: int) -> bool:
+    return status == 429 or status >= 500
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+# Errors while reading a body, e.g. a connection the server dropped mid-stream
+_NETWORK_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                   http.client.HTTPException, OSError)
+
+def _tls_failure(error: BaseException) -> bool:
+    """Whether a TLS handshake or certificate check is behind a failure; retrying will not fix it"""
+    while error is not None:
+        if isinstance(error, (requests.exceptions.SSLError, ssl.SSLError, ssl.CertificateError)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+class Response:
+    """Status, headers (case-insensitive .get) and the decoded body of a finished request"""
+
+    def __init__(self, url: str, status: int, headers: Mapping[str, str], body: bytes):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def text(self) -> str:
+        return self.body.decode('utf-8')
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+def _counted(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Pass chunks through, adding their size to the current metrics span"""
+    for chunk in chunks:
+        metrics.count(bytes_in=len(chunk))
+        yield chunk
+
+def _wire_chunks(response: requests.Response) -> Iterator[bytes]:
+    """Decoded body chunks; the bytes read off the wire count towards the current metrics span"""
+    raw, read = response.raw, 0
+    for chunk in response.iter_content(READ_CHUNK):
+        metrics.count(bytes_in=raw.tell() - read)
+        read = raw.tell()
+        yield chunk
+
+def build_url(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    if not params:
+        return url
+    return f"{url}{'&' if urllib.parse.urlsplit(url).query else '?'}{urllib.parse.urlencode(params)}"
+
+def retry_policy(retries: int) -> Retry:
+    """
+    Connect and read failures, 429 and 5xx are retried with exponential
+    backoff (Retry-After is honoured); anything else, TLS and
+    certificate errors included, fails on the first attempt
+    """
+    return Retry(total=retries, connect=retries, read=retries, status=retries, other=0,
+                 status_forcelist=TRANSIENT_STATUSES, allowed_methods=None, raise_on_status=False,
+                 backoff_factor=0.5)
+
+class HTTPClient:
+    """
+    Pooled HTTP/1.1 client over requests; redirects are followed and
+    transient failures retried by the adapter's Retry policy
+    """
+
+    def __init__(self, timeout: float = HTTP_TIMEOUT, retries: int = HTTP_RETRIES, pool_size: int = HTTP_POOL_SIZE):
+        self.timeout = timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self.sessions: Dict[int, requests.Session] = {}
+        self.lock = threading.Lock()
+
+    def session(self, retries: Optional[int] = None) -> requests.Session:
+        """The shared Session for a retry budget (callers that retry themselves pass retries=0)"""
+        retries = self.retries if retries is None else retries
+        with self.lock:
+            session = self.sessions.get(retries)
+            if session is None:
+                session = self.sessions[retries] = requests.Session()
+                session.headers['User-Agent'] = USER_AGENT
+                session.max_redirects = MAX_REDIRECTS
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size,
+                                      max_retries=retry_policy(retries))
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+        return session
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+
+    def _send(self, method: str, url: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, str]],
+              timeout: Optional[float], retries: Optional[int], stream: bool) -> requests.Response:
+        try:
+            response = self.session(retries).request(method, build_url(url, params), headers=headers, stream=stream,
+                                                     timeout=self.timeout if timeout is None else timeout)
+        except requests.TooManyRedirects as e:
+            raise HTTPError(url, 310, 'too many redirects') from e
+        except requests.RequestException as e:
+            if _tls_failure(e):
+                raise
+            raise TransientError(str(e) or type(e).__name__) from e
+        if response.status_code >= 400:
+            response.close()
+            if _is_transient(response.status_code):
+                raise TransientError(f"HTTP {response.status_code}")
+            raise HTTPError(response.url, response.status_code, response.reason)
+        return response
+
+    def request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+                retries: Optional[int] = None) -> Response:
+        """
+        Send a request and read the whole (decoded) body
+
+        Returns:
+            The response for any status below 400 (including 304)
+
+        Raises:
+            HTTPError: 4xx other than 429
+            TransientError: 429, 5xx or network failure after all retries
+            requests.exceptions.SSLError: TLS or certificate failure (never retried)
+        """
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            # The adapter retries up to the status line; a body cut off mid-read is retried here
+            with self._send(method, url, params, headers, timeout, retries, stream=True) as response:
+                try:
+                    body = b''.join(_wire_chunks(response))
+                except _NETWORK_ERRORS as e:
+                    if _tls_failure(e):
+                        raise
+                    if attempt == retries:
+                        raise TransientError(str(e) or type(e).__name__) from e
+                    time.sleep(backoff_delay(attempt))
+                    continue
+            return Response(response.url, response.status_code, response.headers, body)
+
+    def get(self, url: str, **kwargs) -> Response:
+        return self.request('GET', url, **kwargs)
+
+    def get_json(self, url: str, **kwargs) -> Any:
+        return self.get(url, **kwargs).json()
+
+    @contextmanager
+    def stream(self, url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+               timeout: Optional[float] = None, retries: Optional[int] = None) -> Iterator[Iterator[bytes]]:
+        """
+        GET a URL and yield an iterator over its decoded body chunks
+        Only connecting and the status line are retried; the body is read by the caller
+        """
+        with self._send('GET', url, params, headers, timeout, retries, stream=True) as response:
+            yield _wire_chunks(response)
+
+class HTTP2Client(HTTPClient):
+    """The same interface over httpx with HTTP/2 multiplexing (one connection per host)"""
+
+    def __init__(self, timeout: float = HTTP_TIMEOUT, retries: int = HTTP_RETRIES, pool_size: int = HTTP_POOL_SIZE):
+        super().__init__(timeout, retries, pool_size)
+        self.client = httpx.Client(http2=True, follow_redirects=True, max_redirects=MAX_REDIRECTS,
+                                   headers={'User-Agent': USER_AGENT},
+                                   limits=httpx.Limits(max_keepalive_connections=pool_size))
+
+    def close(self):
+        self.client.close()
+
+    def _attempts(self, retries: Optional[int]) -> Iterator[int]:
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            yield attempt
+            if attempt < retries:
+                time.sleep(backoff_delay(attempt))
+
+    def _send_http2(self, method: str, url: str, headers: Optional[Dict[str, str]], timeout: float, stream: bool):
+        try:
+            response = self.client.send(self.client.build_request(method, url, headers=headers, timeout=timeout),
+                                        stream=stream)
+        except httpx.TransportError as e:
+            if _tls_failure(e):
+                raise
+            raise TransientError(str(e) or type(e).__name__) from e
+        if response.status_code >= 400:
+            response.close()
+            if _is_transient(response.status_code):
+                raise TransientError(f"HTTP {response.status_code}")
+            raise HTTPError(str(response.url), response.status_code, response.reason_phrase)
+        return response
+
+    def request(self, method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+                retries: Optional[int] = None) -> Response:
+        url = build_url(url, params)
+        timeout = self.timeout if timeout is None else timeout
+        error: Optional[Exception] = None
+        for _ in self._attempts(retries):
+            try:
+                response = self._send_http2(method, url, headers, timeout, stream=False)
+                metrics.count(bytes_in=response.num_bytes_downloaded)
+                return Response(str(response.url), response.status_code, response.headers, response.content)
+            except TransientError as e:
+                error = e
+        raise error
+
+    @contextmanager
+    def stream(self, url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+               timeout: Optional[float] = None, retries: Optional[int] = None) -> Iterator[Iterator[bytes]]:
+        url = build_url(url, params)
+        timeout = self.timeout if timeout is None else timeout
+        error: Optional[Exception] = None
+        for _ in self._attempts(retries):
+            try:
+                response = self._send_http2('GET', url, headers, timeout, stream=True)
+            except TransientError as e:
+                error = e
+                continue
+            try:
+                yield _counted(response.iter_bytes(READ_CHUNK))
+            finally:
+                response.close()
+            return
+        raise error
+
+_client: Optional[HTTPClient] = None
+_client_lock = threading.Lock()
+
+def client() -> HTTPClient:
+    """The process-wide client every fetcher shares"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HTTP2Client() if HTTP_HTTP2 and HAVE_HTTP2 else HTTPClient()
+    return _client
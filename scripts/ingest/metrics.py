@@ -0,0 +1,262 @@
+"""
+Per-stage ingest metrics
+Every fetch and layer write runs inside a timing span. Code deeper down
+(the HTTP client, normalizers, filters) adds counters to whatever span is
+current, found through a context variable, so nothing has to pass a span
+around. At the end of a run the spans are exported as
+
+    .cache/metrics/<script>.prom          Prometheus textfile (node_exporter collector)
+    .cache/metrics/<script>-report.json   run report with every span
+    data_sources.last_fetch_*             per source, when database ingest is on
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from ingest.atomic import atomic_open
+
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(os.path.dirname(__file__), '..', '..', '.cache', 'metrics'))
+METRICS_EXPORT = os.environ.get('METRICS_EXPORT', '1') != '0'
+PROMETHEUS_PREFIX = 'terra_ingest'
+MAX_SPANS = 1000  # a resident scheduler keeps only the most recent spans
+
+# Counters every span reports, with their Prometheus help text
+COUNTERS = {
+    'bytes_in': 'Response bytes downloaded',
+    'rows_parsed': 'Rows or records parsed from upstream',
+    'rows_kept': 'Rows that became features',
+    'bytes_out': 'Bytes written to the layer file',
+}
+
+class Span:
+    """One timed stage (fetch or save) of one source"""
+
+    def __init__(self, stage: str, source: str):
+        self.stage = stage
+        self.source = source
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.seconds: Optional[float] = None
+        self.status = 'running'
+        self.error: Optional[str] = None
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self.dropped: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, **counts: int):
+        with self._lock:
+            for name, value in counts.items():
+                self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def drop(self, reason: str, count: int):
+        if count <= 0:
+            return
+        with self._lock:
+            self.dropped[reason] = self.dropped.get(reason, 0) + int(count)
+
+    def finish(self, status: str, error: Optional[str] = None):
+        self.seconds = time.perf_counter() - self._start
+        if self.status in ('running', 'ok'):
+            self.status = status
+        self.error = self.error or error
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.stage,
+            "source": self.source,
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "seconds": round(self.seconds if self.seconds is not None else time.perf_counter() - self._start, 6),
+            "status": self.status,
+            "error": self.error,
+            **self.counters,
+            "rows_dropped": dict(self.dropped),
+        }
+
+class RunMetrics:
+    """The spans of one script run"""
+
+    def __init__(self, script: str = 'ingest'):
+        self.script = script
+        self.started_at = time.time()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+            if len(self.spans) > MAX_SPANS:
+                del self.spans[:len(self.spans) - MAX_SPANS]
+
+    def latest(self) -> List[Span]:
+        """Last span per (stage, source); a long-running scheduler keeps only the newest"""
+        latest: Dict[tuple, Span] = {}
+        with self._lock:
+            for span in self.spans:
+                latest[(span.stage, span.source)] = span
+        return list(latest.values())
+
+_run = RunMetrics()
+_current: ContextVar[Optional[Span]] = ContextVar('ingest_span', default=None)
+
+# Extensions (see ingest.profiling): span hooks get each span as it starts and may
+# return a callable run once it has finished; export hooks get (run, report, directory)
+_span_hooks: List[Callable[[Span], Optional[Callable[[], None]]]] = []
+_export_hooks: List[Callable[[RunMetrics, Dict[str, Any], str], None]] = []
+
+def add_span_hook(hook: Callable[[Span], Optional[Callable[[], None]]]):
+    _span_hooks.append(hook)
+
+def add_export_hook(hook: Callable[[RunMetrics, Dict[str, Any], str], None]):
+    _export_hooks.append(hook)
+
+def start_run(script: str) -> RunMetrics:
+    """Begin collecting spans for a script run (a fresh collector replaces the old one)"""
+    global _run
+    _run = RunMetrics(script)
+    return _run
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+@contextmanager
+def span(stage: str, source: str) -> Iterator[Span]:
+    """
+    Time a stage and make it the current span for counters
+    NotModified leaves the span 'unchanged'; any other exception marks it 'error'
+    """
+    from ingest.httpcache import NotModified
+    item = Span(stage, source)
+    _run.record(item)
+    token = _current.set(item)
+    stops = [hook(item) for hook in _span_hooks]
+    try:
+        yield item
+    except NotModified:
+        item.finish('unchanged')
+        raise
+    except BaseException as e:
+        item.finish('error', str(e) or type(e).__name__)
+        raise
+    else:
+        item.finish('ok')
+    finally:
+        _current.reset(token)
+        for stop in reversed(stops):
+            if stop is not None:
+                stop()
+
+def count(**counts: int):
+    """Add to the current span's counters (no-op outside a span)"""
+    item = _current.get()
+    if item is not None:
+        item.add(**counts)
+
+def dropped(reason: str, rows: int):
+    """Record rows a filter removed, e.g. dropped('magnitude<=2.5', 120)"""
+    item = _current.get()
+    if item is not None:
+        item.drop(reason, rows)
+
+def rows(parsed: int, kept: int, reason: Optional[str] = None):
+    """Parsed and kept rows of a fetch; the difference is recorded as dropped for reason"""
+    count(rows_parsed=parsed, rows_kept=kept)
+    if reason:
+        dropped(reason, parsed - kept)
+
+def record_error(error: Any):
+    """Mark the current span failed without raising, for fetchers that fall back to demo data"""
+    item = _current.get()
+    if item is not None:
+        item.status = 'error'
+        item.error = str(error) or type(error).__name__
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus_text(run: RunMetrics) -> str:
+    """Gauges for the latest span of every source and stage, in the text exposition format"""
+    spans = run.latest()
+    lines = []
+
+    def metric(name: str, help_text: str, samples: List[tuple]):
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} gauge")
+        for labels, value in samples:
+            text = ','.join(f'{key}="{_label(str(v))}"' for key, v in labels.items())
+            lines.append(f"{PROMETHEUS_PREFIX}_{name}{{{text}}} {value}")
+
+    def labels(item: Span, **extra: str) -> Dict[str, str]:
+        return {"script": run.script, "source": item.source, "stage": item.stage, **extra}
+
+    metric('duration_seconds', 'Wall time of the stage',
+           [(labels(s), f"{s.seconds or 0:.6f}") for s in spans])
+    metric('success', '1 when the stage finished without error (unchanged counts as success)',
+           [(labels(s), int(s.status in ('ok', 'unchanged'))) for s in spans])
+    for name, help_text in COUNTERS.items():
+        metric(name, help_text, [(labels(s), s.counters.get(name, 0)) for s in spans])
+    metric('rows_dropped', 'Rows removed by a filter',
+           [(labels(s, reason=reason), n) for s in spans for reason, n in sorted(s.dropped.items())])
+    metric('last_run_timestamp_seconds', 'When the run started',
+           [({"script": run.script}, f"{run.started_at:.3f}")])
+    return '\n'.join(lines) + '\n'
+
+def run_report(run: RunMetrics) -> Dict[str, Any]:
+    spans = [span.to_dict() for span in run.spans]
+    return {
+        "script": run.script,
+        "started_at": datetime.fromtimestamp(run.started_at, timezone.utc).isoformat(),
+        "seconds": round(time.time() - run.started_at, 3),
+        "totals": {name: sum(span[name] for span in spans) for name in COUNTERS},
+        "spans": spans,
+    }
+
+def _source_metrics(spans: List[Span]) -> Dict[str, Dict[str, Any]]:
+    """Fetch status plus fetch+save counters per layer, for data_sources"""
+    by_source: Dict[str, Dict[str, Any]] = {}
+    for item in spans:
+        entry = by_source.setdefault(item.source, {"status": None, "error": None, "stages": {}})
+        entry["stages"][item.stage] = item.to_dict()
+        if item.stage == 'fetch' or entry["status"] is None:
+            entry["status"], entry["error"] = item.status, item.error
+    return by_source
+
+def export(run: Optional[RunMetrics] = None, directory: str = METRICS_DIR) -> Optional[Dict[str, Any]]:
+    """
+    Write the Prometheus textfile and the run report, and record the fetch
+    status of database-backed sources; returns the report
+    """
+    run = run or _run
+    report = run_report(run)
+    for hook in _export_hooks:
+        hook(run, report, directory)
+    if not METRICS_EXPORT:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    with atomic_open(os.path.join(directory, f"{run.script}.prom")) as f:
+        f.write(prometheus_text(run))
+    with atomic_open(os.path.join(directory, f"{run.script}-report.json")) as f:
+        json.dump(report, f, indent=2)
+
+    from ingest.pgload import DB_INGEST, HAVE_PSYCOPG, record_fetch_metrics
+    if DB_INGEST and HAVE_PSYCOPG:
+        try:
+            record_fetch_metrics(_source_metrics(run.latest()))
+        except Exception as e:
+            print(f"⚠️  Could not record fetch metrics in data_sources: {e}")
+    return report
+
+def print_summary(report: Optional[Dict[str, Any]]):
+    if not report:
+        return
+    print(f"\n⏱️  Stage timings ({report['seconds']:.1f}s total):")
+    for item in report['spans']:
+        drops = ', '.join(f"{n} {reason}" for reason, n in item['rows_dropped'].items())
+        print(f"   {item['stage']:<5} {item['source']:<28} {item['seconds']:>8.2f}s  {item['status']:<9}"
+              f" in {item['bytes_in']:>10,} B  rows {item['rows_parsed']:,}->{item['rows_kept']:,}"
+              f"  out {item['bytes_out']:>10,} B" + (f"  dropped: {drops}" if drops else ''))
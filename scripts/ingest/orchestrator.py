@@ -0,0 +1,221 @@
+"""
+Concurrent fetch orchestrator
+Runs every fetch_* function of a script at the same time so a refresh
+takes about as long as the slowest source instead of the sum of all of them
+"""
+
+import importlib.util
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from ingest import metrics
+from ingest.httpcache import NotModified, active, deferred, discard, unconditional
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+# Defaults can be tuned per deployment without touching the scripts
+FETCH_MAX_WORKERS = int(os.environ.get('FETCH_MAX_WORKERS', '6'))
+FETCH_DEADLINE = float(os.environ.get('FETCH_DEADLINE', '45'))
+
+def empty_feature_collection(name: str = '') -> Dict[str, Any]:
+    """Fallback used when a source has nothing better to offer"""
+    return {"type": "FeatureCollection", "features": []}
+
+class FetchFailed(Exception):
+    """A fetch fell back to demo or empty data instead of raising (strict fetch_layer)"""
+
+def fetch_layer(name: str, fetch: Callable[[], Dict[str, Any]], strict: bool = False) -> Dict[str, Any]:
+    """
+    fetch() in the layer's fetch span, with its response cache validators held
+    until the caller saves the layer and calls httpcache.commit(name); a fetch
+    that fell back to demo or empty data (metrics.record_error) never commits,
+    and with strict=True it raises FetchFailed instead of returning the fallback.
+    A fetch abandoned past its deadline (run_concurrently discards the layer)
+    holds no validators, and its late result is only reported, never committed.
+    """
+    with deferred(name) as refresh, metrics.span('fetch', name) as span:
+        data = fetch()
+    if not active(name, refresh):
+        print(f"⏱️  {name} finished after it was abandoned; result ignored")
+        return data
+    if span.status == 'error':
+        discard(name, refresh)
+        if strict:
+            raise FetchFailed(span.error or 'fetch failed')
+    return data
+
+def run_concurrently(
+    jobs: Dict[str, Callable[[], Dict[str, Any]]],
+    max_workers: int = FETCH_MAX_WORKERS,
+    deadline: float = FETCH_DEADLINE,
+    deadlines: Optional[Dict[str, float]] = None,
+    fallback: Callable[[str], Dict[str, Any]] = empty_feature_collection
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run fetch jobs on daemon threads and collect their results
+
+    Args:
+        jobs: Mapping of output filename to a zero-argument fetch callable
+        max_workers: Maximum number of sources fetched at once
+        deadline: Seconds a source may run once it has started
+        deadlines: Optional per-filename overrides of the deadline
+        fallback: Called with the filename when a source fails or overruns
+
+    Returns:
+        Results keyed by filename, in the same order as jobs. Sources whose
+        upstream feed answered 304 Not Modified map to None.
+
+    An overdue source falls back at once, but its thread cannot be stopped and
+    keeps its worker slot until it exits, so at most max_workers fetches ever
+    run. Queued sources that find every slot held by abandoned threads for a
+    whole deadline fall back too rather than waiting on them indefinitely.
+    """
+    deadlines = deadlines or {}
+    started: Dict[str, float] = {}
+    results: Dict[str, Dict[str, Any]] = {}
+    threads: Dict[Future, threading.Thread] = {}
+
+    def run(name: str, fetch: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        started[name] = time.monotonic()
+        return fetch_layer(name, fetch)
+
+    def start(name: str, fetch: Callable[[], Dict[str, Any]]) -> Future:
+        # Daemon threads rather than a ThreadPoolExecutor: an overdue fetch
+        # cannot be interrupted, but it must not keep the interpreter alive
+        future: Future = Future()
+
+        def target():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(run(name, fetch))
+            except BaseException as e:
+                future.set_exception(e)
+
+        thread = threading.Thread(target=target, name=f"fetch-{name}", daemon=True)
+        threads[future] = thread
+        thread.start()
+        return future
+
+    workers = max(1, min(max_workers, len(jobs) or 1))
+    queued = list(jobs.items())
+    pending: Dict[Future, str] = {}
+    abandoned: List[threading.Thread] = []
+    stalled_since: Optional[float] = None
+
+    while queued or pending:
+        abandoned = [thread for thread in abandoned if thread.is_alive()]
+        while queued and len(pending) + len(abandoned) < workers:
+            name, fetch = queued.pop(0)
+            pending[start(name, fetch)] = name
+
+        if queued and not pending:
+            # Every slot is held by an abandoned fetch that has not exited yet
+            stalled_since = stalled_since or time.monotonic()
+            if time.monotonic() - stalled_since > deadline:
+                for name, _ in queued:
+                    print(f"⏱️  {name} never got a free fetch slot")
+                    results[name] = fallback(name)
+                queued = []
+                continue
+        else:
+            stalled_since = None
+
+        # Only sources that have actually started are on the clock;
+        # queued ones get their full deadline once a slot frees up
+        now = time.monotonic()
+        remaining = [
+            deadlines.get(name, deadline) - (now - started[name])
+            for name in pending.values() if name in started
+        ]
+        timeout = max(0.0, min(remaining)) if remaining else 0.05
+
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = pending.pop(future)
+            threads.pop(future)
+            try:
+                results[name] = future.result()
+            except NotModified:
+                print(f"♻️  {name} unchanged upstream")
+                results[name] = None
+            except Exception as e:
+                print(f"❌ {name} failed: {e}")
+                results[name] = fallback(name)
+
+        now = time.monotonic()
+        for future, name in list(pending.items()):
+            if name in started and now - started[name] > deadlines.get(name, deadline):
+                # The thread runs on in the background, but nothing waits for it any more;
+                # discarding the layer keeps whatever it fetches from being committed
+                print(f"⏱️  {name} exceeded its {deadlines.get(name, deadline):.0f}s deadline")
+                discard(name)
+                del pending[future]
+                abandoned.append(threads.pop(future))
+                results[name] = fallback(name)
+
+    return {name: results[name] for name in jobs}
+
+def resolve_unchanged(
+    jobs: Dict[str, Callable[[], Dict[str, Any]]],
+    results: Dict[str, Optional[Dict[str, Any]]],
+    layer_exists: Callable[[str], bool]
+) -> List[str]:
+    """
+    Decide what to do with sources that came back Not Modified
+
+    Layers that already exist on disk are left alone (no parse, no rewrite).
+    Missing layers are rebuilt from the cached response body.
+
+    Returns:
+        Filenames whose existing file should be kept as is
+    """
+    unchanged = []
+    for name, data in results.items():
+        if data is not None:
+            continue
+        if layer_exists(name):
+            unchanged.append(name)
+            continue
+        with unconditional():
+            try:
+                results[name] = fetch_layer(name, jobs[name])
+            except Exception as e:
+                print(f"❌ {name} failed: {e}")
+                results[name] = empty_feature_collection(name)
+    return unchanged
+
+def previous_summary_sources(path: str) -> Dict[str, Dict[str, Any]]:
+    """Per-source entries of the last summary, reused for layers that were kept"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get('sources', {})
+    except (OSError, ValueError):
+        return {}
+
+def update_summary_source(path: str, layer: str, entry: Dict[str, Any]):
+    """Replace one source's entry in a summary file and recompute the total"""
+    from ingest.geojson_writer import write_json
+    try:
+        with open(path, 'r') as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        summary = {"sources": {}}
+    sources = summary.setdefault('sources', {})
+    sources[layer] = {**sources.get(layer, {}), **entry}
+    summary['generated_at'] = datetime.utcnow().isoformat()
+    summary['total_features'] = sum(source.get('feature_count', 0) for source in sources.values())
+    write_json(path, summary)
+
+def load_script(filename: str):
+    """Import a hyphenated script from scripts/ (e.g. fetch-real-data.py) as a module"""
+    name = os.path.splitext(filename)[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPTS_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,402 @@
+"""
+Bulk PostgreSQL ingest into data_points
+Features are streamed with COPY into a temporary staging table while the layer
+file is written, then merged with a single INSERT ... ON CONFLICT on
+(source_id, external_id). Rows whose content did not change are not rewritten.
+
+Enabled when DATABASE_URL is set (DB_INGEST=0 turns it off); needs psycopg 3.
+Targets database/schema.sql (PostGIS point geometry).
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# psycopg is imported on first connect; most runs never touch the database
+HAVE_PSYCOPG = importlib.util.find_spec('psycopg') is not None
+
+DATABASE_URL = os.getenv('DATABASE_URL', '')
+DB_INGEST = bool(DATABASE_URL) and os.getenv('DB_INGEST', '1') != '0'
+
+# Layer file -> data_sources.source_id (data_points.source_id is a foreign key)
+LAYER_SOURCES = {
+    'nasa-firms': 'nasa-firms',
+    'usgs-earthquakes': 'usgs-earthquakes',
+    'noaa-alerts': 'noaa-alerts',
+    'nasa-eonet': 'nasa-eonet',
+    'air-quality': 'openaq',
+}
+
+# Property names that carry the event time, in order of preference
+TIME_PROPERTIES = ('timestamp', 'time', 'detection_time', 'date', 'effective', 'last_updated')
+
+STAGING_COLUMNS = (
+    'external_id', 'lon', 'lat', 'properties', 'data_type', 'severity', 'magnitude',
+    'event_time', 'expires_at', 'quality_score', 'verification_status'
+)
+
+CREATE_STAGING = """
+CREATE TEMP TABLE data_points_staging (
+    external_id TEXT,
+    lon DOUBLE PRECISION,
+    lat DOUBLE PRECISION,
+    properties JSONB,
+    data_type TEXT,
+    severity TEXT,
+    magnitude NUMERIC,
+    event_time TIMESTAMPTZ,
+    expires_at TIMESTAMPTZ,
+    quality_score NUMERIC,
+    verification_status TEXT
+) ON COMMIT DROP
+"""
+
+COPY_STAGING = f"COPY data_points_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN"
+
+# DISTINCT ON keeps one row per external_id: ON CONFLICT cannot touch a row twice.
+# trust_score starts at the source's base score and is left to validations afterwards.
+MERGE_STAGING = """
+INSERT INTO data_points (
+    source_id, external_id, geometry, properties, data_type, severity, magnitude,
+    event_time, detected_at, expires_at, quality_score, trust_score, verification_status
+)
+SELECT DISTINCT ON (s.external_id)
+    %(source_id)s, s.external_id, ST_SetSRID(ST_MakePoint(s.lon, s.lat), 4326), s.properties,
+    s.data_type, s.severity, s.magnitude, s.event_time, %(detected_at)s, s.expires_at,
+    s.quality_score, COALESCE(src.base_trust_score, 50.00), COALESCE(s.verification_status, 'unverified')
+FROM data_points_staging s
+LEFT JOIN data_sources src ON src.source_id = %(source_id)s
+ORDER BY s.external_id, s.event_time DESC NULLS LAST
+ON CONFLICT (source_id, external_id) DO UPDATE SET
+    geometry = EXCLUDED.geometry,
+    properties = EXCLUDED.properties,
+    data_type = EXCLUDED.data_type,
+    severity = EXCLUDED.severity,
+    magnitude = EXCLUDED.magnitude,
+    event_time = EXCLUDED.event_time,
+    detected_at = EXCLUDED.detected_at,
+    expires_at = EXCLUDED.expires_at,
+    quality_score = EXCLUDED.quality_score,
+    verification_status = EXCLUDED.verification_status,
+    updated_at = CURRENT_TIMESTAMP
+WHERE data_points.properties IS DISTINCT FROM EXCLUDED.properties
+   OR NOT ST_Equals(data_points.geometry, EXCLUDED.geometry)
+"""
+
+# The manifest hash of the layer last merged, so an unchanged layer is not merged again
+LAST_LOADED_HASH = """
+SELECT metadata->>'last_loaded_hash' FROM data_sources WHERE source_id = %(source_id)s
+"""
+
+RECORD_LOADED_HASH = """
+UPDATE data_sources
+SET metadata = COALESCE(metadata, '{}'::jsonb) || jsonb_build_object('last_loaded_hash', %(hash)s::text)
+WHERE source_id = %(source_id)s
+"""
+
+UPDATE_STATUS = """
+UPDATE data_sources
+SET last_fetch_at = CURRENT_TIMESTAMP,
+    last_fetch_status = %(status)s,
+    last_error_message = %(error)s,
+    updated_at = CURRENT_TIMESTAMP
+WHERE source_id = %(source_id)s
+"""
+
+def layer_source(path: str) -> Optional[str]:
+    """public/data/nasa-firms.json -> 'nasa-firms' (None for layers not in data_sources)"""
+    return LAYER_SOURCES.get(os.path.splitext(os.path.basename(path))[0])
+
+def point_of(geometry: Optional[Dict[str, Any]]) -> Optional[Tuple[float, float]]:
+    """
+    Representative (lon, lat) for a geometry
+    data_points stores points, so areas use the mean of their outer ring
+    """
+    if not geometry:
+        return None
+    coordinates = geometry.get('coordinates')
+    kind = geometry.get('type')
+    try:
+        if kind == 'Point':
+            return float(coordinates[0]), float(coordinates[1])
+        if kind == 'Polygon':
+            ring = coordinates[0]
+        elif kind == 'MultiPolygon':
+            ring = coordinates[0][0]
+        elif kind in ('LineString', 'MultiPoint'):
+            ring = coordinates
+        else:
+            return None
+        return (sum(float(p[0]) for p in ring) / len(ring),
+                sum(float(p[1]) for p in ring) / len(ring))
+    except (TypeError, ValueError, IndexError, ZeroDivisionError):
+        return None
+
+def _timestamp(value: Any) -> Optional[datetime]:
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+def _number(value: Any, limit: float) -> Optional[float]:
+    """
+    Numeric value that fits DECIMAL(5,2), else None (it stays in properties)
+    Rounded to the column's scale first: 999.996 would round to 1000.00 in
+    the COPY and fail the load, so it is clamped to 999.99
+
+    >>> _number(12.345, 1000), _number(999.996, 1000), _number(-999.999, 1000), _number(1000, 1000)
+    (12.35, 999.99, -999.99, None)
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        return None
+    if abs(value) >= limit:
+        return None
+    largest = limit - 0.01
+    return min(max(round(float(value), 2), -largest), largest)
+
+def feature_row(feature: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """Staging row for one GeoJSON feature, or None when it has no usable location"""
+    point = point_of(feature.get('geometry'))
+    if point is None:
+        return None
+    props = feature.get('properties') or {}
+
+    event_time = None
+    for name in TIME_PROPERTIES:
+        event_time = _timestamp(props.get(name))
+        if event_time is not None:
+            break
+
+    # Layers use 0-1 or 0-100 quality scores; data_points uses 0-100
+    quality = _number(props.get('quality_score'), 1000)
+    if quality is not None:
+        quality = min(max(quality * 100 if quality <= 1 else quality, 0), 100)
+
+    external_id = props.get('id') or props.get('event_id') or feature.get('id')
+    if not external_id:
+        # Feeds without ids are keyed by what identifies a detection: place, time and type
+        key = f"{point[0]:.5f},{point[1]:.5f},{event_time.isoformat() if event_time else ''},{props.get('type', '')}"
+        external_id = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    return (
+        str(external_id)[:255],
+        point[0],
+        point[1],
+        json.dumps(props, separators=(',', ':'), default=str),
+        props.get('type'),
+        props.get('severity'),
+        _number(props.get('magnitude'), 1000),
+        event_time,
+        _timestamp(props.get('expires')),
+        quality,
+        props.get('verification_status'),
+    )
+
+# Metrics go into data_sources.metadata under last_fetch_metrics, next to the status columns
+UPDATE_FETCH_METRICS = """
+UPDATE data_sources
+SET last_fetch_at = CURRENT_TIMESTAMP,
+    last_fetch_status = %(status)s,
+    last_error_message = %(error)s,
+    metadata = COALESCE(metadata, '{}'::jsonb) || jsonb_build_object('last_fetch_metrics', %(metrics)s::jsonb),
+    updated_at = CURRENT_TIMESTAMP
+WHERE source_id = %(source_id)s
+"""
+
+SOURCE_RATE_LIMIT = "SELECT rate_limit FROM data_sources WHERE source_id = %(source_id)s"
+
+# Span status -> data_sources.last_fetch_status
+FETCH_STATUSES = {'ok': 'success', 'unchanged': 'unchanged', 'error': 'error', 'running': 'timeout'}
+
+def connect(dsn: str = DATABASE_URL, **kwargs):
+    if not HAVE_PSYCOPG:
+        raise RuntimeError("psycopg is not installed (pip install -r requirements.txt)")
+    import psycopg
+    return psycopg.connect(dsn, **kwargs)
+
+def source_rate_limit(source_id: str, default: int, dsn: Optional[str] = None) -> int:
+    """data_sources.rate_limit (requests per minute) for a source; default without a database or a limit"""
+    # Read at call time: scripts load .env.local after importing this module
+    dsn = dsn or os.getenv('DATABASE_URL', DATABASE_URL)
+    if not (dsn and HAVE_PSYCOPG):
+        return default
+    try:
+        with connect(dsn, connect_timeout=5) as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(SOURCE_RATE_LIMIT, {"source_id": source_id})
+                row = cursor.fetchone()
+    except Exception as e:
+        print(f"⚠️  Could not read the {source_id} rate limit from data_sources: {e}")
+        return default
+    return row[0] if row and row[0] and row[0] > 0 else default
+
+def record_fetch_status(source_id: str, status: str, error: Optional[str] = None, connection=None):
+    """Set data_sources.last_fetch_at / last_fetch_status for one source"""
+    own = connection is None
+    connection = connection or connect()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(UPDATE_STATUS, {"source_id": source_id, "status": status, "error": error})
+        connection.commit()
+    finally:
+        if own:
+            connection.close()
+
+def record_fetch_metrics(by_layer: Dict[str, Dict[str, Any]], dsn: str = DATABASE_URL):
+    """
+    Store each layer's latest fetch status and stage metrics on its data source
+    by_layer maps layer filenames to {"status", "error", "stages"} (see ingest.metrics)
+    """
+    rows = [
+        {
+            "source_id": layer_source(layer),
+            "status": FETCH_STATUSES.get(entry["status"], entry["status"]),
+            "error": (entry.get("error") or None) and entry["error"][:1000],
+            "metrics": json.dumps(entry["stages"], separators=(',', ':')),
+        }
+        for layer, entry in by_layer.items() if layer_source(layer)
+    ]
+    if not rows:
+        return
+    with connect(dsn) as connection:
+        with connection.cursor() as cursor:
+            cursor.executemany(UPDATE_FETCH_METRICS, rows)
+        connection.commit()
+
+class DataPointLoader:
+    """
+    One source's load: start() opens COPY into staging, add() streams rows,
+    finish() merges into data_points and records the fetch status atomically
+    """
+
+    def __init__(self, source_id: str, dsn: str = DATABASE_URL):
+        self.source_id = source_id
+        self.dsn = dsn
+        self.connection = None
+        self.stack = ExitStack()
+        self.copy = None
+        self.staged = 0
+        self.skipped = 0
+
+    def start(self):
+        self.connection = connect(self.dsn)
+        cursor = self.stack.enter_context(self.connection.cursor())
+        cursor.execute(CREATE_STAGING)
+        self.copy = self.stack.enter_context(cursor.copy(COPY_STAGING))
+
+    def add(self, feature: Dict[str, Any]):
+        if self.copy is None:
+            self.start()
+        row = feature_row(feature)
+        if row is None:
+            self.skipped += 1
+            return
+        self.copy.write_row(row)
+        self.staged += 1
+
+    def finish(self, layer_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Merge staged rows; returns staged/skipped/merged counts
+        With the layer's manifest hash, a layer already merged under that hash
+        is not merged again: the staged rows are dropped and the fetch is
+        recorded as unchanged
+        """
+        if self.copy is None:
+            self.start()
+        try:
+            self.stack.close()  # ends COPY
+            with self.connection.cursor() as cursor:
+                if layer_hash is not None:
+                    cursor.execute(LAST_LOADED_HASH, {"source_id": self.source_id})
+                    row = cursor.fetchone()
+                    if row is not None and row[0] == layer_hash:
+                        self.connection.rollback()  # drops the staging table
+                        cursor.execute(UPDATE_STATUS, {"source_id": self.source_id, "status": "unchanged", "error": None})
+                        self.connection.commit()
+                        return {"staged": self.staged, "skipped": self.skipped, "merged": 0, "unchanged": True}
+                cursor.execute(MERGE_STAGING, {
+                    "source_id": self.source_id,
+                    "detected_at": datetime.now(timezone.utc),
+                })
+                merged = cursor.rowcount
+                cursor.execute(UPDATE_STATUS, {"source_id": self.source_id, "status": "success", "error": None})
+                if layer_hash is not None:
+                    cursor.execute(RECORD_LOADED_HASH, {"source_id": self.source_id, "hash": layer_hash})
+            self.connection.commit()
+            return {"staged": self.staged, "skipped": self.skipped, "merged": merged, "unchanged": False}
+        finally:
+            self.connection.close()
+
+    def abort(self, error: str):
+        """Drop the staged rows and record the failure on the source"""
+        if self.connection is not None and not self.connection.closed:
+            self.connection.close()
+        record_fetch_status(self.source_id, "error", error[:1000])
+
+class PostgresExport:
+    """
+    geojson_writer export: streams the layer's features into data_points
+    A database failure is reported and recorded, never fails the file write
+    """
+
+    def __init__(self, path: str, source_id: Optional[str] = None, dsn: str = DATABASE_URL):
+        self.name = os.path.basename(path)
+        self.loader = DataPointLoader(source_id or layer_source(path), dsn)
+        self.failed = None
+
+    def add(self, feature: Dict[str, Any]):
+        if self.failed:
+            return
+        try:
+            self.loader.add(feature)
+        except Exception as e:
+            self.failed = str(e)
+
+    def finish(self, result: Dict[str, Any], metadata: Optional[Dict[str, Any]]):
+        # A layer whose hash was already merged is skipped; after emptying
+        # data_points, reload with load-data-points.py (it merges unconditionally)
+        try:
+            if self.failed:
+                raise RuntimeError(self.failed)
+            counts = self.loader.finish(result.get('hash'))
+            if counts['unchanged']:
+                print(f"🗄️  {self.name}: unchanged since the last load, merge skipped")
+                return
+            print(f"🗄️  {self.name}: {counts['staged']} rows staged, {counts['merged']} inserted/updated in data_points")
+        except Exception as e:
+            print(f"❌ Database ingest failed for {self.name}: {e}")
+            try:
+                self.loader.abort(str(e))
+            except Exception:
+                pass
+
+def load_features(source_id: str, features: Iterable[Dict[str, Any]], dsn: str = DATABASE_URL) -> Dict[str, Any]:
+    """Load an iterable of features for one source outside the layer writer"""
+    loader = DataPointLoader(source_id, dsn)
+    try:
+        for feature in features:
+            loader.add(feature)
+        return loader.finish()
+    except Exception as e:
+        loader.abort(str(e))
+        raise
+
+def mark_unchanged(filenames: Iterable[str]):
+    """Record a fetch for layers whose upstream answered 304 (nothing to load)"""
+    if not (DB_INGEST and HAVE_PSYCOPG):
+        return
+    sources = [source for source in map(layer_source, filenames) if source]
+    if not sources:
+        return
+    try:
+        with connect() as connection:
+            for source_id in sources:
+                record_fetch_status(source_id, "unchanged", connection=connection)
+    except Exception as e:
+        print(f"⚠️  Could not update data_sources fetch status: {e}")
@@ -0,0 +1,208 @@
+"""
+Built-in profiling mode
+With --profile (or INGEST_PROFILE=1) every metrics span gets a CPU profile
+(cProfile) and a tracemalloc snapshot diff, written next to the run report:
+
+    .cache/metrics/<script>-profile/<stage>-<source>.prof   pstats dump (snakeviz, pstats)
+    .cache/metrics/<script>-profile.json                     ranked top-N per stage and overall
+    .cache/metrics/<script>-profile.txt                      the same as a readable summary
+
+cProfile only sees the thread that starts it, so each thread profiles its
+outermost span; nested spans (the save inside a fetch) are covered by it.
+From Python 3.12 only one cProfile can run per process, so spans that start
+while another thread's span is profiled are skipped; they are logged and
+listed under "skipped" in the report. FETCH_MAX_WORKERS=1 profiles them all.
+tracemalloc is process-wide: with FETCH_MAX_WORKERS>1 allocations of sources
+fetched at the same time land in each other's snapshots, so profile with
+FETCH_MAX_WORKERS=1 for clean per-source memory numbers.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from ingest import metrics
+from ingest.atomic import atomic_open
+
+PROFILE = os.environ.get('INGEST_PROFILE', '0') == '1'
+PROFILE_TOP = int(os.environ.get('PROFILE_TOP', '25'))
+TRACEMALLOC_FRAMES = int(os.environ.get('PROFILE_FRAMES', '1'))
+
+# The profilers' own bookkeeping is not what we are looking for
+_OWN_FILES = [tracemalloc.Filter(False, module.__file__) for module in (cProfile, pstats, tracemalloc)] + [
+    tracemalloc.Filter(False, __file__)]
+
+class StageProfile:
+    """CPU profile and allocation diff of one span"""
+
+    def __init__(self, span: metrics.Span):
+        self.stage = span.stage
+        self.source = span.source
+        self.stats: Optional[pstats.Stats] = None
+        self.allocations: List[Dict[str, Any]] = []
+        self.peak_bytes = 0
+        self._profiler = cProfile.Profile()
+        self._snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        if self._snapshot is not None:
+            tracemalloc.reset_peak()
+        self._base = tracemalloc.get_traced_memory()[0] if self._snapshot is not None else 0
+        self._profiler.enable()
+
+    def stop(self):
+        self._profiler.disable()
+        if self._snapshot is not None:
+            self.peak_bytes = max(tracemalloc.get_traced_memory()[1] - self._base, 0)
+            end = tracemalloc.take_snapshot().filter_traces(_OWN_FILES)
+            diff = end.compare_to(self._snapshot.filter_traces(_OWN_FILES), 'lineno')
+            self.allocations = [{
+                "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff,
+                "size": stat.size,
+            } for stat in diff[:PROFILE_TOP]]
+        self.stats = pstats.Stats(self._profiler)
+        self._profiler = None
+        self._snapshot = None
+
+    @property
+    def name(self) -> str:
+        return re.sub(r'[^A-Za-z0-9_.-]+', '_', f"{self.stage}-{self.source}")
+
+_profiles: List[StageProfile] = []
+_skipped: List[str] = []
+_active = threading.local()
+_lock = threading.Lock()
+_enabled = False
+
+def requested(argv: Optional[List[str]] = None) -> bool:
+    """True when --profile is on the command line or INGEST_PROFILE=1"""
+    return PROFILE or '--profile' in (sys.argv[1:] if argv is None else argv)
+
+def _on_span(span: metrics.Span):
+    if getattr(_active, 'profile', None) is not None:
+        return None  # already inside a profiled span on this thread
+    try:
+        profile = StageProfile(span)
+    except ValueError:
+        # Another profiler owns this thread (python -m cProfile) or, on 3.12+, the process
+        with _lock:
+            _skipped.append(f"{span.stage} {span.source}")
+        print(f"⚠️  Not profiling {span.stage} {span.source}: another profiler is running")
+        return None
+    _active.profile = profile
+
+    def stop():
+        profile.stop()
+        _active.profile = None
+        with _lock:
+            _profiles.append(profile)
+    return stop
+
+def _function_rows(stats: pstats.Stats, key: str) -> List[Dict[str, Any]]:
+    index = {'tottime': 2, 'cumtime': 3}[key]
+    ranked = sorted(stats.stats.items(), key=lambda item: item[1][index], reverse=True)
+    rows = []
+    for (filename, line, function), (_cc, calls, tottime, cumtime, _callers) in ranked[:PROFILE_TOP]:
+        where = f"{os.path.basename(filename)}:{line}" if line else filename
+        rows.append({
+            "function": f"{function} ({where})",
+            "calls": calls,
+            "tottime": round(tottime, 6),
+            "cumtime": round(cumtime, 6),
+        })
+    return rows
+
+def _stage_report(profile: StageProfile) -> Dict[str, Any]:
+    return {
+        "stage": profile.stage,
+        "source": profile.source,
+        "prof": f"{profile.name}.prof",
+        "peak_bytes": profile.peak_bytes,
+        "hot_by_tottime": _function_rows(profile.stats, 'tottime'),
+        "hot_by_cumtime": _function_rows(profile.stats, 'cumtime'),
+        "allocations": profile.allocations,
+    }
+
+def _summary_text(script: str, stages: List[Dict[str, Any]], overall: List[Dict[str, Any]],
+                  skipped: List[str]) -> str:
+    out = io.StringIO()
+
+    def functions(title: str, rows: List[Dict[str, Any]], key: str):
+        out.write(f"  {title}\n")
+        for rank, row in enumerate(rows, 1):
+            out.write(f"    {rank:>3}. {row[key]:>9.4f}s  {row['calls']:>9,} calls  {row['function']}\n")
+
+    out.write(f"Profile of {script} (top {PROFILE_TOP})\n\n")
+    if skipped:
+        out.write(f"Not profiled, another profiler was running: {', '.join(skipped)}\n\n")
+    out.write("Overall\n")
+    functions('by own time', overall, 'tottime')
+    for stage in stages:
+        out.write(f"\n{stage['stage']} {stage['source']}  (peak {stage['peak_bytes'] / 1e6:.1f} MB, {stage['prof']})\n")
+        functions('by own time', stage['hot_by_tottime'], 'tottime')
+        functions('by cumulative time', stage['hot_by_cumtime'], 'cumtime')
+        if stage['allocations']:
+            out.write("  allocations still held at the end of the stage\n")
+            for rank, alloc in enumerate(stage['allocations'], 1):
+                out.write(f"    {rank:>3}. {alloc['size_diff'] / 1024:>+10.1f} KiB  {alloc['count_diff']:>+9,} blocks  {alloc['site']}\n")
+    return out.getvalue()
+
+def _export(run: metrics.RunMetrics, report: Dict[str, Any], directory: str):
+    with _lock:
+        profiles = [profile for profile in _profiles if profile.stats is not None]
+        _profiles.clear()
+        skipped = list(_skipped)
+        _skipped.clear()
+    if not profiles:
+        if skipped:
+            print(f"\n⚠️  No stage was profiled ({len(skipped)} skipped, another profiler was running)")
+        return
+    profile_dir = os.path.join(directory, f"{run.script}-profile")
+    os.makedirs(profile_dir, exist_ok=True)
+    for profile in profiles:
+        profile.stats.dump_stats(os.path.join(profile_dir, f"{profile.name}.prof"))
+
+    combined = pstats.Stats()
+    combined.add(*(profile.stats for profile in profiles))
+    combined.dump_stats(os.path.join(profile_dir, 'all.prof'))
+    stages = [_stage_report(profile) for profile in profiles]
+    overall = _function_rows(combined, 'tottime')
+
+    result = {
+        "script": run.script,
+        "started_at": report["started_at"],
+        "top": PROFILE_TOP,
+        "tracemalloc": tracemalloc.is_tracing(),
+        "peak_bytes": max(profile.peak_bytes for profile in profiles),
+        "hot_by_tottime": overall,
+        "hot_by_cumtime": _function_rows(combined, 'cumtime'),
+        "stages": stages,
+        "skipped": skipped,
+    }
+    with atomic_open(os.path.join(directory, f"{run.script}-profile.json")) as f:
+        json.dump(result, f, indent=2)
+    with atomic_open(os.path.join(directory, f"{run.script}-profile.txt")) as f:
+        f.write(_summary_text(run.script, stages, overall, skipped))
+
+    print(f"\n🔬 Profile ({len(profiles)} stages{f', {len(skipped)} skipped' if skipped else ''}) → {os.path.normpath(os.path.join(directory, run.script + '-profile.txt'))}")
+    for rank, row in enumerate(overall[:5], 1):
+        print(f"   {rank}. {row['tottime']:>8.3f}s  {row['function']}")
+
+def enable():
+    """Profile every span from now on; idempotent"""
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    metrics.add_span_hook(_on_span)
+    metrics.add_export_hook(_export)
+    print("🔬 Profiling enabled (cProfile + tracemalloc per stage)")
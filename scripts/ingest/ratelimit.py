@@ -0,0 +1,42 @@
+"""
+Token-bucket rate limiter for asyncio fetchers
+Sized from a provider's requests-per-minute limit (data_sources.rate_limit)
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+class TokenBucket:
+    """
+    Classic token bucket: tokens refill continuously at `rate` per second
+    up to `capacity`, and every request spends one token
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: int, burst: Optional[float] = None) -> "TokenBucket":
+        """Build a bucket from a requests-per-minute limit"""
+        return cls(requests_per_minute / 60.0, burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and spend it"""
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
@@ -0,0 +1,186 @@
+"""
+Resident ingest scheduler
+Imports the fetch scripts once and refreshes each source on its own cadence
+(with jitter) instead of re-running every source from cron. A source never
+has two runs in flight; when several are due the fastest-changing go first.
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from ingest import metrics
+from ingest.geojson_writer import RUN_STAMP_PROPERTIES, save_geojson
+from ingest.httpcache import NotModified, commit, unconditional
+from ingest.orchestrator import FETCH_MAX_WORKERS, fetch_layer, load_script, update_summary_source
+from ingest.pgload import mark_unchanged
+
+DATA_DIR = 'public/data'
+JITTER = float(os.environ.get('SCHEDULE_JITTER', '0.1'))  # +/- fraction of the cadence
+RETRY_DELAY = float(os.environ.get('SCHEDULE_RETRY_DELAY', '300'))
+
+# layer file -> (script, fetch function, args, cadence in seconds, summary file)
+# Cadences follow each feed's own update frequency; override with
+# SCHEDULE_<LAYER>=seconds, e.g. SCHEDULE_NASA_FIRMS=3600
+SOURCES = {
+    'usgs-earthquakes.json': ('fetch-real-data.py', 'fetch_usgs_earthquakes', (7,), 60, 'data-summary.json'),
+    'noaa-alerts.json': ('fetch-extended-data.py', 'fetch_noaa_alerts', (), 120, 'extended-data-summary.json'),
+    'solar-flares.json': ('fetch-extended-data.py', 'fetch_solar_flares', (), 300, 'extended-data-summary.json'),
+    'openweather.json': ('fetch-real-data.py', 'fetch_weather_data', (), 1800, 'data-summary.json'),
+    'nasa-eonet.json': ('fetch-extended-data.py', 'fetch_eonet_events', (), 1800, 'extended-data-summary.json'),
+    'air-quality.json': ('fetch-extended-data.py', 'fetch_air_quality', (), 3600, 'extended-data-summary.json'),
+    'nasa-firms.json': ('fetch-real-data.py', 'fetch_nasa_fires', (1,), 3 * 3600, 'data-summary.json'),
+    'carbon-monitor.json': ('fetch-real-data.py', 'fetch_carbon_emissions', (), 24 * 3600, 'data-summary.json'),
+    'volcanoes.json': ('fetch-extended-data.py', 'fetch_volcano_activity', (), 24 * 3600, 'extended-data-summary.json'),
+}
+
+def cadence_for(filename: str, default: float) -> float:
+    variable = 'SCHEDULE_' + filename.replace('.json', '').replace('-', '_').upper()
+    return float(os.environ.get(variable, default))
+
+def jittered(seconds: float, jitter: float = JITTER) -> float:
+    """Spread runs so sources sharing a cadence do not fire in lockstep"""
+    return seconds * (1 + random.uniform(-jitter, jitter))
+
+def summary_entry(data: Dict[str, Any], summary: str) -> Dict[str, Any]:
+    """Per-source summary fields, as the one-shot script owning that summary writes them"""
+    metadata = data.get('metadata', {})
+    entry = {"feature_count": len(data.get('features', []))}
+    if summary == 'extended-data-summary.json':
+        entry["trust_level"] = metadata.get('trust_level', 'unknown')
+    else:
+        entry["has_real_data"] = not metadata.get('source', '').startswith('Synthetic')
+    return entry
+
+# Summary files are shared by several sources; serialize their read-modify-write
+_summary_lock = threading.Lock()
+
+class Job:
+    """One source: its fetch callable, cadence and scheduling state"""
+
+    def __init__(self, filename: str, fetch: Callable[[], Dict[str, Any]], cadence: float, summary: str,
+                 run_stamps: Iterable[str] = ()):
+        self.filename = filename
+        self.fetch = fetch
+        self.cadence = cadence
+        self.summary = summary
+        self.run_stamps = run_stamps
+        self.next_run = 0.0
+        self.running: Optional[Future] = None
+        self.runs = 0
+        self.failures = 0
+
+    @property
+    def path(self) -> str:
+        return os.path.join(DATA_DIR, self.filename)
+
+    def run(self) -> bool:
+        """
+        Fetch and save once; True when the source succeeded
+        A failed fetch raises (FetchFailed when the fetcher fell back to demo or
+        empty data), so the existing layer is kept and the failure is counted
+        """
+        started = time.monotonic()
+        try:
+            data = fetch_layer(self.filename, self.fetch, strict=True)
+        except NotModified:
+            if os.path.exists(self.path):
+                mark_unchanged([self.filename])
+                print(f"♻️  {self.filename} unchanged upstream")
+                return True
+            with unconditional():
+                data = fetch_layer(self.filename, self.fetch, strict=True)
+
+        result = save_geojson(data, self.path, run_stamps=self.run_stamps)
+        commit(self.filename)
+        with _summary_lock:
+            update_summary_source(os.path.join(DATA_DIR, self.summary),
+                                  self.filename.replace('.json', ''), summary_entry(data, self.summary))
+        state = "saved" if result['changed'] else "unchanged"
+        print(f"💾 {self.filename}: {result['count']} features {state} in {time.monotonic() - started:.1f}s")
+        return True
+
+def build_jobs(only: Optional[List[str]] = None) -> List[Job]:
+    """Import each script once and bind its fetch functions"""
+    modules: Dict[str, Any] = {}
+    jobs = []
+    for filename, (script, function, args, cadence, summary) in SOURCES.items():
+        if only and filename not in only and filename.replace('.json', '') not in only:
+            continue
+        if script not in modules:
+            modules[script] = load_script(script)
+        fetch = getattr(modules[script], function)
+        # The script knows which of its layers are stamped at fetch time
+        stamped = filename in getattr(modules[script], 'RUN_STAMPED_LAYERS', ())
+        jobs.append(Job(filename, lambda fetch=fetch, args=args: fetch(*args), cadence_for(filename, cadence), summary,
+                        RUN_STAMP_PROPERTIES if stamped else ()))
+    # Fastest-changing feeds first whenever several are due at once
+    jobs.sort(key=lambda job: job.cadence)
+    return jobs
+
+class Scheduler:
+    """
+    Runs jobs on a thread pool; each job is rescheduled when its run ends,
+    so a slow run delays that source's next run instead of overlapping it
+    """
+
+    def __init__(self, jobs: List[Job], max_workers: int = FETCH_MAX_WORKERS):
+        self.jobs = jobs
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='ingest')
+        self.stopping = threading.Event()
+        self.wakeup = threading.Event()
+        metrics.start_run('ingest-scheduler')
+
+    def _finished(self, job: Job, future: Future):
+        try:
+            future.result()
+            delay = jittered(job.cadence)
+        except Exception as e:
+            job.failures += 1
+            delay = jittered(min(job.cadence, RETRY_DELAY))
+            print(f"❌ {job.filename} failed: {e} (retrying in {delay:.0f}s)")
+        job.runs += 1
+        job.next_run = time.monotonic() + delay
+        job.running = None
+        # The textfile always holds the latest fetch and save of every source
+        try:
+            metrics.export()
+        except OSError as e:
+            print(f"⚠️  Could not write ingest metrics: {e}")
+        self.wakeup.set()
+
+    def _start(self, job: Job):
+        job.running = self.executor.submit(job.run)
+        job.running.add_done_callback(lambda future, job=job: self._finished(job, future))
+
+    def tick(self) -> float:
+        """Start every due, idle job; returns seconds until the next one is due"""
+        now = time.monotonic()
+        for job in self.jobs:
+            if job.running is None and job.next_run <= now:
+                self._start(job)
+        idle = [job.next_run for job in self.jobs if job.running is None]
+        return max(0.0, min(idle) - now) if idle else 60.0
+
+    def run_forever(self):
+        print(f"🕒 Scheduling {len(self.jobs)} sources:")
+        for job in self.jobs:
+            print(f"   {job.filename:<24} every {job.cadence:>7.0f}s")
+        while not self.stopping.is_set():
+            self.wakeup.clear()
+            self.wakeup.wait(self.tick())
+        self.executor.shutdown(wait=True)
+
+    def run_once(self):
+        """Every source once, e.g. from cron; still fastest-first"""
+        for job in self.jobs:
+            self._start(job)
+        self.executor.shutdown(wait=True)
+
+    def stop(self, *_):
+        print("\n🛑 Stopping scheduler after in-flight runs finish...")
+        self.stopping.set()
+        self.wakeup.set()
@@ -0,0 +1,319 @@
+"""
+SQLite spatial/temporal index for layers
+Each layer gets public/data/index/<layer>.sqlite with an R*Tree over feature
+bounding boxes and B-tree indexes on event time, type and quality score,
+so bbox, radius and time-window queries touch only matching rows instead
+of parsing the whole layer. The database is built in a temp file while the
+layer is written and renamed into place after the layer commits.
+
+    from ingest.spatialindex import LayerIndex
+    with LayerIndex('public/data/nasa-firms.json') as index:
+        index.radius(-120.0, 37.0, 50, start='2024-01-08T00:00:00Z')
+"""
+
+import json
+import math
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from ingest.pgload import TIME_PROPERTIES
+
+INDEX_DIR = 'index'
+SPATIAL_INDEX = os.environ.get('SPATIAL_INDEX', '1') != '0'
+INSERT_BATCH = 5000
+
+EARTH_RADIUS_KM = 6371.0
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE features (
+    id INTEGER PRIMARY KEY,
+    type TEXT,
+    time REAL,
+    quality_score REAL,
+    feature TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE features_rtree USING rtree(id, min_lon, max_lon, min_lat, max_lat);
+"""
+
+# Built after the bulk insert, which is much faster than maintaining them row by row
+INDEXES = """
+CREATE INDEX features_time ON features (time);
+CREATE INDEX features_type ON features (type, time);
+CREATE INDEX features_quality ON features (quality_score);
+"""
+
+Time = Union[str, float, datetime, None]
+
+def index_path(path: str) -> str:
+    """public/data/nasa-firms.json -> public/data/index/nasa-firms.sqlite"""
+    name = os.path.splitext(os.path.basename(path))[0] + '.sqlite'
+    return os.path.join(os.path.dirname(path), INDEX_DIR, name)
+
+def _positions(coordinates: Any) -> Iterable[Tuple[float, float]]:
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        yield coordinates[0], coordinates[1]
+        return
+    for part in coordinates or ():
+        yield from _positions(part)
+
+def feature_bbox(feature: Dict[str, Any]) -> Optional[Tuple[float, float, float, float]]:
+    """(west, south, east, north), from the bbox property when the layer carries one"""
+    bbox = (feature.get('properties') or {}).get('bbox')
+    if isinstance(bbox, list) and len(bbox) == 4:
+        return tuple(bbox)
+    geometry = feature.get('geometry') or {}
+    try:
+        positions = list(_positions(geometry.get('coordinates')))
+    except (TypeError, IndexError):
+        return None
+    if not positions:
+        return None
+    lons = [p[0] for p in positions]
+    lats = [p[1] for p in positions]
+    return min(lons), min(lats), max(lons), max(lats)
+
+def epoch_seconds(value: Time) -> Optional[float]:
+    """ISO string, datetime or epoch seconds -> epoch seconds; naive times are UTC"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value[:-1] if value.endswith('Z') else value)
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def _feature_time(props: Dict[str, Any]) -> Optional[float]:
+    for name in TIME_PROPERTIES:
+        seconds = epoch_seconds(props.get(name)) if isinstance(props.get(name), str) else None
+        if seconds is not None:
+            return seconds
+    return None
+
+def _quality(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        return None
+    return float(value)
+
+class SpatialIndexBuilder:
+    """Streams features into a new index database at a temp path"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+        os.close(fd)
+        self.connection = sqlite3.connect(self.tmp_path)
+        self.connection.execute('PRAGMA journal_mode=OFF')
+        self.connection.execute('PRAGMA synchronous=OFF')
+        self.connection.executescript(SCHEMA)
+        self.encode = json.JSONEncoder(separators=(',', ':')).encode
+        self.rows: List[Tuple[Any, ...]] = []
+        self.boxes: List[Tuple[Any, ...]] = []
+        self.count = 0
+
+    def add(self, feature: Dict[str, Any]):
+        self.count += 1
+        props = feature.get('properties') or {}
+        kind = props.get('type')
+        self.rows.append((
+            self.count, kind if isinstance(kind, str) else None, _feature_time(props),
+            _quality(props.get('quality_score')), self.encode(feature)
+        ))
+        bbox = feature_bbox(feature)
+        if bbox is not None:
+            west, south, east, north = bbox
+            self.boxes.append((self.count, west, east, south, north))
+        if len(self.rows) >= INSERT_BATCH:
+            self._flush()
+
+    def _flush(self):
+        self.connection.executemany('INSERT INTO features VALUES (?, ?, ?, ?, ?)', self.rows)
+        self.connection.executemany('INSERT INTO features_rtree VALUES (?, ?, ?, ?, ?)', self.boxes)
+        self.rows, self.boxes = [], []
+
+    def commit(self, meta: Dict[str, Any]):
+        """Finish the database and rename it over the previous index"""
+        try:
+            self._flush()
+            self.connection.executescript(INDEXES)
+            self.connection.executemany('INSERT INTO meta VALUES (?, ?)',
+                                        [(key, json.dumps(value)) for key, value in meta.items()])
+            self.connection.commit()
+            self.connection.execute('ANALYZE')
+            self.connection.close()
+            os.chmod(self.tmp_path, 0o644)
+            os.replace(self.tmp_path, self.path)
+        except BaseException:
+            self.discard()
+            raise
+
+    def discard(self):
+        self.connection.close()
+        try:
+            os.unlink(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+class SpatialIndexExport:
+    """Layer export sink: builds the index alongside the layer, commits it once the layer commits"""
+
+    def __init__(self, layer_path: str):
+        self.path = index_path(layer_path)
+        self.layer = os.path.basename(layer_path)
+        self.builder: Optional[SpatialIndexBuilder] = None
+        self.failed = None
+
+    def add(self, feature: Dict[str, Any]):
+        if self.failed:
+            return
+        try:
+            if self.builder is None:
+                self.builder = SpatialIndexBuilder(self.path)
+            self.builder.add(feature)
+        except Exception as e:
+            self.failed = str(e)
+
+    def finish(self, result: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None):
+        if self.builder is None:
+            self.builder = SpatialIndexBuilder(self.path)
+        if self.failed or (not result['changed'] and os.path.exists(self.path)):
+            self.builder.discard()
+            if self.failed:
+                print(f"⚠️  Spatial index for {self.layer} not built: {self.failed}")
+            return
+        self.builder.commit({"layer": self.layer, "feature_hash": result['hash'], "count": self.builder.count})
+
+def _km_to_degrees(lat: float, km: float) -> Tuple[float, float]:
+    """Half-widths (lon, lat) in degrees of a box that contains a km radius around lat"""
+    dlat = math.degrees(km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+    dlon = 180.0 if cos_lat < 1e-9 else min(180.0, dlat / cos_lat)
+    return dlon, dlat
+
+def haversine_km(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+class LayerIndex:
+    """Read-only queries against one layer's index; results are GeoJSON feature dicts"""
+
+    def __init__(self, layer_path: str):
+        path = index_path(layer_path)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"no spatial index for {layer_path} (expected {path})")
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self) -> 'LayerIndex':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def meta(self) -> Dict[str, Any]:
+        return {key: json.loads(value) for key, value in self.connection.execute('SELECT key, value FROM meta')}
+
+    def _filters(self, start: Time, end: Time, kind: Optional[str],
+                 min_quality: Optional[float]) -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        if start is not None:
+            clauses.append('f.time >= ?')
+            params.append(epoch_seconds(start))
+        if end is not None:
+            clauses.append('f.time < ?')
+            params.append(epoch_seconds(end))
+        if kind is not None:
+            clauses.append('f.type = ?')
+            params.append(kind)
+        if min_quality is not None:
+            clauses.append('f.quality_score >= ?')
+            params.append(min_quality)
+        return clauses, params
+
+    def _bbox_rows(self, west: float, south: float, east: float, north: float, clauses: List[str],
+                   params: List[Any], limit: Optional[int]) -> List[Tuple[float, float, float, float, str]]:
+        # A box across the antimeridian (west > east) is searched as two boxes
+        spans = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+        where = ' OR '.join('(r.max_lon >= ? AND r.min_lon <= ?)' for _ in spans)
+        sql = (f"SELECT r.min_lon, r.max_lon, r.min_lat, r.max_lat, f.feature "
+               f"FROM features_rtree r JOIN features f ON f.id = r.id "
+               f"WHERE ({where}) AND r.max_lat >= ? AND r.min_lat <= ?")
+        sql += ''.join(f" AND {clause}" for clause in clauses) + " ORDER BY f.id"
+        args = [value for span in spans for value in span] + [south, north] + params
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return self.connection.execute(sql, args).fetchall()
+
+    def bbox(self, west: float, south: float, east: float, north: float, start: Time = None, end: Time = None,
+             kind: Optional[str] = None, min_quality: Optional[float] = None,
+             limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Features whose bounding box intersects [west, south, east, north]"""
+        clauses, params = self._filters(start, end, kind, min_quality)
+        return [json.loads(row[4]) for row in self._bbox_rows(west, south, east, north, clauses, params, limit)]
+
+    def radius(self, lon: float, lat: float, km: float, start: Time = None, end: Time = None,
+               kind: Optional[str] = None, min_quality: Optional[float] = None,
+               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Features within km of (lon, lat), nearest first
+        The R*Tree narrows to the enclosing box; distance is measured to the
+        nearest point of each feature's bounding box
+        """
+        dlon, dlat = _km_to_degrees(lat, km)
+        west, east = lon - dlon, lon + dlon
+        if dlon >= 180.0:
+            west, east = -180.0, 180.0
+        else:
+            west = west + 360.0 if west < -180.0 else west
+            east = east - 360.0 if east > 180.0 else east
+        clauses, params = self._filters(start, end, kind, min_quality)
+        matches = []
+        for min_lon, max_lon, min_lat, max_lat, feature in self._bbox_rows(
+                west, max(-90.0, lat - dlat), east, min(90.0, lat + dlat), clauses, params, None):
+            near_lat = min(max(lat, min_lat), max_lat)
+            candidates = [min(max(shifted, min_lon), max_lon) for shifted in (lon, lon - 360.0, lon + 360.0)]
+            distance = min(haversine_km(lon, lat, near_lon, near_lat) for near_lon in candidates)
+            if distance <= km:
+                matches.append((distance, feature))
+        matches.sort(key=lambda match: match[0])
+        return [json.loads(feature) for _, feature in matches[:limit]]
+
+    def time_window(self, start: Time = None, end: Time = None, kind: Optional[str] = None,
+                    min_quality: Optional[float] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Features with an event time in [start, end), oldest first"""
+        clauses, params = self._filters(start, end, kind, min_quality)
+        if start is None and end is None:
+            clauses.append('f.time IS NOT NULL')
+        sql = "SELECT f.feature FROM features f"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY f.time, f.id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [json.loads(row[0]) for row in self.connection.execute(sql, params)]
+
+def build_index(layer_path: str) -> int:
+    """(Re)build a layer's index from its GeoJSON file, e.g. for layers written before indexing existed"""
+    with open(layer_path, 'r') as f:
+        data = json.load(f)
+    builder = SpatialIndexBuilder(index_path(layer_path))
+    for feature in data.get('features', []):
+        builder.add(feature)
+    builder.commit({"layer": os.path.basename(layer_path), "count": builder.count})
+    return builder.count
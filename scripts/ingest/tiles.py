@@ -0,0 +1,231 @@
+"""
+Spatial tiling for point layers
+Cuts a layer into Web Mercator z/x/y tiles with grid clustering at low zooms,
+so the map only loads what is in view:
+
+    public/data/tiles/<layer>/index.json          current version, zooms, tile counts
+    public/data/tiles/<layer>/<version>/z/x/y.json one FeatureCollection per tile
+
+Zooms below TILE_MAX_ZOOM hold clusters; the original features are written
+once, at TILE_MAX_ZOOM, and clients overzoom those tiles beyond it. Encoded
+features are spilled to a temporary file while the layer streams, so memory
+holds per-point offsets and per-cell sums rather than the features.
+
+Each run writes a new version directory and then swaps index.json, so readers
+never see a mix of old and new tiles. The previous version is kept for
+requests already in flight; older ones are removed. Layers that stop
+qualifying (too small, not points) lose their tiles directory.
+"""
+
+import json
+import math
+import os
+import shutil
+import tempfile
+from array import array
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ingest.atomic import atomic_open
+
+TILES_DIR = 'tiles'
+TILE_EXPORT = os.environ.get('TILE_EXPORT', '1') != '0'
+TILE_MIN_FEATURES = int(os.environ.get('TILE_MIN_FEATURES', '1000'))  # smaller layers are served whole
+TILE_MAX_ZOOM = int(os.environ.get('TILE_MAX_ZOOM', '6'))  # original features at this zoom, clusters below
+CLUSTER_GRID = 16  # cluster cells per tile side
+KEEP_VERSIONS = 2
+
+MAX_LATITUDE = 85.05112878
+
+def mercator(lon: float, lat: float) -> Tuple[float, float]:
+    """Project lon/lat to unit Web Mercator coordinates in [0, 1)"""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    x = (lon + 180.0) / 360.0
+    sin_lat = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return min(max(x, 0.0), 1 - 1e-12), min(max(y, 0.0), 1 - 1e-12)
+
+def tile_for(lon: float, lat: float, zoom: int) -> Tuple[int, int]:
+    x, y = mercator(lon, lat)
+    scale = 1 << zoom
+    return int(x * scale), int(y * scale)
+
+def tiles_root(layer_path: str) -> str:
+    """public/data/nasa-firms.json -> public/data/tiles/nasa-firms"""
+    name = os.path.splitext(os.path.basename(layer_path))[0]
+    return os.path.join(os.path.dirname(layer_path), TILES_DIR, name)
+
+class TileBuilder:
+    """Collects points (spilled to disk) and writes a versioned tile pyramid"""
+
+    def __init__(self, max_zoom: int = TILE_MAX_ZOOM):
+        self.max_zoom = max(0, max_zoom)
+        self.count = 0
+        self.points_only = True
+        self.bounds: Optional[List[float]] = None
+        self._spill = None
+        self._offsets = array('Q')
+        self._lengths = array('I')
+        self._tiles = array('Q')  # tile of each point at max_zoom, as x << 32 | y
+        # Cluster cells one zoom above max_zoom: (cx, cy) -> [count, lon sum, lat sum, first point]
+        self._cells: Dict[Tuple[int, int], List[Any]] = {}
+        self._encode = json.JSONEncoder(separators=(',', ':')).encode
+
+    def add(self, feature: Dict[str, Any]):
+        if not self.points_only:
+            return
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') != 'Point' or not geometry.get('coordinates'):
+            self.points_only = False
+            self.close()
+            return
+        lon, lat = geometry['coordinates'][0], geometry['coordinates'][1]
+        mx, my = mercator(lon, lat)
+
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile()
+        encoded = self._encode(feature).encode('utf-8')
+        self._offsets.append(self._spill.tell())
+        self._lengths.append(len(encoded))
+        self._spill.write(encoded)
+
+        scale = 1 << self.max_zoom
+        self._tiles.append(int(mx * scale) << 32 | int(my * scale))
+        if self.max_zoom:
+            grid = (1 << (self.max_zoom - 1)) * CLUSTER_GRID
+            cell = self._cells.get((int(mx * grid), int(my * grid)))
+            if cell is None:
+                self._cells[(int(mx * grid), int(my * grid))] = [1, lon, lat, self.count]
+            else:
+                cell[0] += 1
+                cell[1] += lon
+                cell[2] += lat
+
+        if self.bounds is None:
+            self.bounds = [lon, lat, lon, lat]
+        else:
+            bounds = self.bounds
+            bounds[0], bounds[1] = min(bounds[0], lon), min(bounds[1], lat)
+            bounds[2], bounds[3] = max(bounds[2], lon), max(bounds[3], lat)
+        self.count += 1
+
+    def close(self):
+        """Drop the spilled features"""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+        self._offsets, self._lengths, self._tiles = array('Q'), array('I'), array('Q')
+        self._cells = {}
+
+    def _feature(self, point: int) -> bytes:
+        self._spill.seek(self._offsets[point])
+        return self._spill.read(self._lengths[point])
+
+    def _cluster_levels(self):
+        """(zoom, cells) from max_zoom - 1 down to 0; each level sums the one below"""
+        cells = self._cells
+        for zoom in range(self.max_zoom - 1, -1, -1):
+            yield zoom, cells
+            parents: Dict[Tuple[int, int], List[Any]] = {}
+            for (cx, cy), (count, lon, lat, first) in cells.items():
+                parent = parents.get((cx >> 1, cy >> 1))
+                if parent is None:
+                    parents[(cx >> 1, cy >> 1)] = [count, lon, lat, first]
+                else:
+                    parent[0] += count
+                    parent[1] += lon
+                    parent[2] += lat
+                    parent[3] = min(parent[3], first)
+            cells = parents
+
+    def _write_tile(self, version_dir: str, zoom: int, x: int, y: int, encoded: List[bytes]):
+        tile_dir = os.path.join(version_dir, str(zoom), str(x))
+        os.makedirs(tile_dir, exist_ok=True)
+        with open(os.path.join(tile_dir, f"{y}.json"), 'wb') as f:
+            f.write(b'{"type":"FeatureCollection","features":[')
+            f.write(b','.join(encoded))
+            f.write(b']}')
+
+    def write(self, root: str, version: str, layer: str) -> Dict[str, Any]:
+        """Write all tiles under root/version and swap in a new index.json"""
+        version_dir = os.path.join(root, version)
+        shutil.rmtree(version_dir, ignore_errors=True)
+        counts: Dict[str, int] = {}
+
+        # Clusters: points sharing a grid cell collapse into one cluster feature
+        for zoom, cells in self._cluster_levels():
+            tiles: Dict[Tuple[int, int], List[bytes]] = defaultdict(list)
+            for (cx, cy), (count, lon, lat, first) in cells.items():
+                tile = tiles[(cx // CLUSTER_GRID, cy // CLUSTER_GRID)]
+                if count == 1:
+                    tile.append(self._feature(first))
+                    continue
+                tile.append(self._encode({
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [round(lon / count, 5), round(lat / count, 5)]},
+                    "properties": {"cluster": True, "point_count": count}
+                }).encode('utf-8'))
+            for (x, y), encoded in tiles.items():
+                self._write_tile(version_dir, zoom, x, y, encoded)
+                counts[f"{zoom}/{x}/{y}"] = len(encoded)
+
+        # Original features, once, at max_zoom; spill offsets ascend within a tile
+        members: Dict[int, array] = defaultdict(lambda: array('I'))
+        for point, tile in enumerate(self._tiles):
+            members[tile].append(point)
+        for tile, points in members.items():
+            x, y = tile >> 32, tile & 0xFFFFFFFF
+            self._write_tile(version_dir, self.max_zoom, x, y, [self._feature(point) for point in points])
+            counts[f"{self.max_zoom}/{x}/{y}"] = len(points)
+
+        index = {
+            "layer": layer,
+            "version": version,
+            "count": self.count,
+            "min_zoom": 0,
+            "max_zoom": self.max_zoom,
+            "cluster_max_zoom": self.max_zoom - 1,
+            "overzoom": True,
+            "bounds": self.bounds,
+            "tile_url": f"{version}/{{z}}/{{x}}/{{y}}.json",
+            "tiles": counts
+        }
+        with atomic_open(os.path.join(root, 'index.json')) as f:
+            json.dump(index, f, separators=(',', ':'))
+
+        _prune_versions(root, keep=version)
+        return index
+
+def _prune_versions(root: str, keep: str):
+    """Remove all but the newest KEEP_VERSIONS version directories"""
+    versions = [
+        entry for entry in os.scandir(root)
+        if entry.is_dir() and entry.name != keep
+    ]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+class TileExport:
+    """Layer export sink: tiles the layer after it commits"""
+
+    def __init__(self, layer_path: str, min_features: int = TILE_MIN_FEATURES):
+        self.root = tiles_root(layer_path)
+        self.layer = os.path.basename(layer_path)
+        self.min_features = min_features
+        self.builder = TileBuilder()
+
+    def add(self, feature: Dict[str, Any]):
+        self.builder.add(feature)
+
+    def finish(self, result: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None):
+        try:
+            if not self.builder.points_only or self.builder.count < self.min_features:
+                # Served whole now; tiles from an earlier run would be stale
+                shutil.rmtree(self.root, ignore_errors=True)
+                return
+            if not result['changed'] and os.path.exists(os.path.join(self.root, 'index.json')):
+                return
+            self.builder.write(self.root, result['hash'][:12], self.layer)
+        finally:
+            self.builder.close()
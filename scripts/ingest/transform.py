@@ -0,0 +1,212 @@
+"""
+Process-pool transform stage
+Large upstream payloads are split into chunks and normalized on a shared
+pool of worker processes, so CPU-bound transforms use every core instead of
+one. Chunks travel as compact byte buffers (delimited rows, raw NumPy column
+bytes, JSON text) rather than pickled lists of dicts, and results come back
+in submission order, so output matches a sequential run exactly.
+
+Payloads under TRANSFORM_MIN_ROWS, and machines with one core, are
+normalized inline without starting the pool. Transforms of already-parsed
+JSON records (EONET events, OpenAQ results) always run inline: encoding
+the records for the workers and decoding their output in the parent costs
+more than the transform itself.
+"""
+
+import atexit
+import importlib.util
+import json
+import os
+import struct
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+TRANSFORM_WORKERS = int(os.environ.get('TRANSFORM_WORKERS', str(os.cpu_count() or 1)))
+TRANSFORM_CHUNK_ROWS = int(os.environ.get('TRANSFORM_CHUNK_ROWS', '50000'))
+TRANSFORM_MIN_ROWS = int(os.environ.get('TRANSFORM_MIN_ROWS', '100000'))
+PREFETCH = 2  # chunks in flight per worker
+
+# Delimiters of packed rows; CSV fields never contain these control characters
+FIELD_SEP = '\x1f'
+ROW_SEP = '\x1e'
+
+def parallel(rows: int, workers: int = TRANSFORM_WORKERS) -> bool:
+    """Whether a payload of this many rows is worth the pool"""
+    return workers > 1 and rows >= TRANSFORM_MIN_ROWS
+
+def chunked(items: Sequence[Any], size: int = TRANSFORM_CHUNK_ROWS) -> Iterator[Sequence[Any]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+# Buffers
+
+def pack_rows(rows: Sequence[Sequence[str]]) -> bytes:
+    """CSV rows as one delimited UTF-8 buffer (falls back to JSON if a field holds a delimiter)"""
+    text = ROW_SEP.join(map(FIELD_SEP.join, rows))
+    separators = sum(map(len, rows)) - len(rows) + max(len(rows) - 1, 0)
+    if text.count(FIELD_SEP) + text.count(ROW_SEP) != separators:
+        return b'J' + json.dumps(rows, separators=(',', ':')).encode('utf-8')
+    return b'R%d\n' % len(rows) + text.encode('utf-8')
+
+def unpack_rows(buffer: bytes) -> List[List[str]]:
+    if buffer[:1] == b'J':
+        return json.loads(buffer[1:])
+    count, _, body = buffer[1:].partition(b'\n')
+    if not int(count):
+        return []
+    return [row.split(FIELD_SEP) for row in body.decode('utf-8').split(ROW_SEP)]
+
+def _texts(values: Iterable[Any]) -> Optional[List[str]]:
+    values = list(values)
+    return values if all(type(value) is str for value in values) else None
+
+def pack_columns(columns: Dict[str, Any]) -> bytes:
+    """
+    A batch of columns as a header plus raw bytes
+    Numeric arrays are copied as their memory, string columns (lists or object
+    arrays of str) are delimiter-joined, anything else rides in the JSON header
+    """
+    header, parts = [], []
+    for name, value in columns.items():
+        if HAVE_NUMPY and isinstance(value, np.ndarray) and value.dtype != object:
+            data = np.ascontiguousarray(value).tobytes()
+            header.append([name, 'array', value.dtype.str, len(data)])
+        elif isinstance(value, (list, tuple)) or (HAVE_NUMPY and isinstance(value, np.ndarray)):
+            texts = _texts(value.tolist() if HAVE_NUMPY and isinstance(value, np.ndarray) else value)
+            joined = FIELD_SEP.join(texts) if texts is not None else None
+            if joined is None or joined.count(FIELD_SEP) != max(len(texts) - 1, 0):
+                header.append([name, 'json', isinstance(value, list), json.dumps(list(value))])
+                continue
+            data = joined.encode('utf-8')
+            header.append([name, 'text', [isinstance(value, list), len(texts)], len(data)])
+        else:
+            header.append([name, 'json', None, json.dumps(value)])
+            continue
+        parts.append(data)
+    head = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    return struct.pack('<I', len(head)) + head + b''.join(parts)
+
+def unpack_columns(buffer: bytes) -> Dict[str, Any]:
+    size = struct.unpack_from('<I', buffer)[0]
+    header = json.loads(buffer[4:4 + size])
+    view = memoryview(buffer)
+    offset = 4 + size
+    columns: Dict[str, Any] = {}
+    for name, kind, info, extra in header:
+        if kind == 'json':
+            value = json.loads(extra)
+            if info is False:  # an object array originally
+                array = np.empty(len(value), dtype=object)
+                array[:] = value
+                value = array
+            columns[name] = value
+            continue
+        data = view[offset:offset + extra]
+        offset += extra
+        if kind == 'array':
+            # Copy so the columns are writable and do not pin the whole buffer
+            columns[name] = np.frombuffer(data, dtype=np.dtype(info)).copy()
+        else:
+            as_list, count = info
+            texts = bytes(data).decode('utf-8').split(FIELD_SEP) if count else []
+            if as_list:
+                columns[name] = texts
+            else:
+                array = np.empty(count, dtype=object)
+                array[:] = texts
+                columns[name] = array
+    return columns
+
+# Functions that cross into workers
+
+class ScriptFunction:
+    """
+    Picklable reference to a function defined in a hyphenated script
+    Scripts run as __main__ or via orchestrator.load_script cannot be found by
+    module name in a worker, so the worker loads the script file itself
+    """
+
+    _loaded: Dict[str, Any] = {}
+
+    def __init__(self, function: Callable[..., Any]):
+        self.path = os.path.abspath(function.__code__.co_filename)
+        self.name = function.__qualname__
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        module = self._loaded.get(self.path)
+        if module is None:
+            name = '_transform_' + os.path.splitext(os.path.basename(self.path))[0].replace('-', '_')
+            spec = importlib.util.spec_from_file_location(name, self.path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            self._loaded[self.path] = module
+        return getattr(module, self.name)(*args, **kwargs)
+
+def portable(function: Callable[..., Any]) -> Callable[..., Any]:
+    """function itself when a worker can import it by name, otherwise a ScriptFunction"""
+    module = sys.modules.get(getattr(function, '__module__', None) or '')
+    if (module is not None and function.__module__ != '__main__'
+            and getattr(module, function.__qualname__, None) is function):
+        return function
+    return ScriptFunction(function)
+
+# The pool
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def pool(workers: int = TRANSFORM_WORKERS) -> ProcessPoolExecutor:
+    """
+    The process-wide worker pool, started on first use
+    Workers are spawned rather than forked: fetchers run on threads, and a
+    fork taken while another thread holds a lock can hang the child
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+                atexit.register(shutdown)
+    return _pool
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+def ordered_map(function: Callable[[bytes], bytes], buffers: Iterable[bytes],
+                workers: int = TRANSFORM_WORKERS) -> Iterator[bytes]:
+    """
+    function(buffer) for every buffer on the pool, yielded in input order
+    At most PREFETCH chunks per worker are in flight, so a long payload is
+    never held in memory twice
+    """
+    executor = pool(workers)
+    pending = deque()
+    try:
+        for buffer in buffers:
+            pending.append(executor.submit(function, buffer))
+            if len(pending) >= PREFETCH * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,159 @@
+"""
+NOAA zone-geometry resolver
+Many active alerts carry `geometry: null` and only list affectedZones. Zone
+shapes are looked up in batches from the /zones endpoint and kept in a
+per-zone disk cache with a long TTL (zones rarely change), so a refresh
+only goes to the network for zones it has not seen recently.
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from ingest.async_fetch import fetch_json_batch_sync
+from ingest.atomic import atomic_open
+
+NOAA_ZONES_URL = os.environ.get('NOAA_ZONES_URL', "https://api.weather.gov/zones")
+ZONE_CACHE_DIR = os.environ.get('NOAA_ZONE_CACHE_DIR', os.path.join(os.path.dirname(__file__), '..', '..', '.cache', 'zones'))
+ZONE_TTL = float(os.environ.get('NOAA_ZONE_TTL', str(30 * 24 * 3600)))
+ZONE_MISSING_TTL = float(os.environ.get('NOAA_ZONE_MISSING_TTL', str(24 * 3600)))  # zones that had no shape
+ZONE_BATCH = int(os.environ.get('NOAA_ZONE_BATCH', '50'))
+ZONE_RATE_LIMIT = int(os.environ.get('NOAA_ZONE_RATE_LIMIT', '300'))  # requests per minute
+RESOLVE_ZONES = os.environ.get('NOAA_RESOLVE_ZONES', '1') != '0'
+
+def zone_id(url: str) -> str:
+    """https://api.weather.gov/zones/forecast/TXZ211 -> TXZ211"""
+    return url.rstrip('/').rsplit('/', 1)[-1]
+
+class ZoneCache:
+    """<directory>/<zone id>.json holds {"fetched_at": ..., "geometry": ...}"""
+
+    def __init__(self, directory: str = ZONE_CACHE_DIR, ttl: float = ZONE_TTL, missing_ttl: float = ZONE_MISSING_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+
+    def _path(self, zone: str) -> str:
+        return os.path.join(self.directory, f"{zone}.json")
+
+    def get(self, zone: str) -> Optional[Dict[str, Any]]:
+        """The cached entry while it is fresh, else None"""
+        try:
+            with open(self._path(zone), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        ttl = self.ttl if entry.get('geometry') else self.missing_ttl
+        if time.time() - entry.get('fetched_at', 0) > ttl:
+            return None
+        return entry
+
+    def put(self, zone: str, geometry: Optional[Dict[str, Any]]):
+        os.makedirs(self.directory, exist_ok=True)
+        with atomic_open(self._path(zone)) as f:
+            # dumps, not dump: json.dump streams through the pure-Python encoder
+            f.write(json.dumps({"fetched_at": time.time(), "geometry": geometry}, separators=(',', ':')))
+
+class ZoneResolver:
+    """Resolves zone URLs to geometries through the cache, fetching misses in batches"""
+
+    def __init__(self, cache: Optional[ZoneCache] = None, zones_url: str = NOAA_ZONES_URL, batch: int = ZONE_BATCH):
+        self.cache = cache or ZoneCache()
+        self.zones_url = zones_url
+        self.batch = max(1, batch)
+        self.geometries: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    def load(self, zone_urls: Iterable[str]):
+        """Make geometries available for every zone; only cache misses hit the network"""
+        urls = {zone_id(url): url for url in zone_urls}
+        missing = []
+        for zone in urls:
+            if zone in self.geometries:
+                continue
+            entry = self.cache.get(zone)
+            if entry is None:
+                missing.append(zone)
+            else:
+                self.geometries[zone] = entry.get('geometry')
+        if not missing:
+            return
+
+        print(f"🗺️  Resolving {len(missing)} NOAA zone geometries ({len(self.geometries)} cached)...")
+        found = self._fetch_batches(missing)
+        # Zones the batch query did not return are looked up one by one
+        leftovers = [zone for zone in missing if zone not in found]
+        if leftovers:
+            results = fetch_json_batch_sync([(urls[zone], {}) for zone in leftovers], concurrency=8,
+                                            requests_per_minute=ZONE_RATE_LIMIT)
+            for zone, data in zip(leftovers, results):
+                if data is not None:
+                    found[zone] = data.get('geometry')
+
+        for zone in missing:
+            if zone in found:
+                self.cache.put(zone, found[zone])
+            self.geometries[zone] = found.get(zone)
+
+    def _fetch_batches(self, zones: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        requests = [
+            (self.zones_url, {"id": ','.join(zones[i:i + self.batch]), "include_geometry": "true"})
+            for i in range(0, len(zones), self.batch)
+        ]
+        found: Dict[str, Optional[Dict[str, Any]]] = {}
+        for data in fetch_json_batch_sync(requests, concurrency=4, requests_per_minute=ZONE_RATE_LIMIT):
+            for feature in (data or {}).get('features', []):
+                zone = feature.get('properties', {}).get('id') or zone_id(feature.get('id', ''))
+                if zone:
+                    found[zone] = feature.get('geometry')
+        return found
+
+    def merged_geometry(self, zone_urls: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """One Polygon/MultiPolygon covering all of an alert's zones, or None"""
+        polygons = []
+        for url in zone_urls:
+            geometry = self.geometries.get(zone_id(url))
+            if not geometry:
+                continue
+            if geometry.get('type') == 'Polygon':
+                polygons.append(geometry['coordinates'])
+            elif geometry.get('type') == 'MultiPolygon':
+                polygons.extend(geometry['coordinates'])
+        if not polygons:
+            return None
+        if len(polygons) == 1:
+            return {"type": "Polygon", "coordinates": polygons[0]}
+        return {"type": "MultiPolygon", "coordinates": polygons}
+
+def resolve_alert_geometries(
+    alerts: List[Dict[str, Any]],
+    resolver: Optional[ZoneResolver] = None
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Geometries for raw alerts that arrived without one
+
+    Returns:
+        Index into alerts -> merged zone geometry, for the alerts that could
+        be resolved. Lookup failures leave an alert unresolved, never raise.
+    """
+    if not RESOLVE_ZONES:
+        return {}
+    pending = {
+        i: alert.get('properties', {}).get('affectedZones') or []
+        for i, alert in enumerate(alerts)
+        if not alert.get('geometry')
+    }
+    pending = {i: zones for i, zones in pending.items() if zones}
+    if not pending:
+        return {}
+    resolver = resolver or ZoneResolver()
+    try:
+        resolver.load(url for zones in pending.values() for url in zones)
+    except Exception as e:
+        print(f"⚠️  NOAA zone lookup failed: {e}")
+    resolved = {}
+    for i, zones in pending.items():
+        geometry = resolver.merged_geometry(zones)
+        if geometry is not None:
+            resolved[i] = geometry
+    return resolved
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Terra Atlas Layer History
+Inspect, compact, prune and query the day-partitioned layer history the
+fetch scripts append to (public/data/history). Layers are appended
+automatically; this is for maintenance, backfills and playback exports.
+
+    python scripts/layer-history.py list
+    python scripts/layer-history.py compact nasa-firms --force
+    python scripts/layer-history.py prune --days 30
+    python scripts/layer-history.py query usgs-earthquakes --start 2024-01-01 --end 2024-01-15 > window.json
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from ingest.history import HISTORY_DIR, HISTORY_MAX_BYTES, HISTORY_RETENTION_DAYS, compact, prune, query, summary
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'public', 'data')
+
+def layer_path(layer: str) -> str:
+    return os.path.join(DATA_DIR, f"{layer.replace('.json', '')}.json")
+
+def layers(names):
+    if names:
+        return names
+    root = os.path.join(DATA_DIR, HISTORY_DIR)
+    return sorted(name for name in os.listdir(root) if not name.startswith('.')) if os.path.isdir(root) else []
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain and query the Terra Atlas layer history")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="days on disk per layer").add_argument('layers', nargs='*')
+    compact_parser = commands.add_parser('compact', help="merge day segments")
+    compact_parser.add_argument('layers', nargs='*')
+    compact_parser.add_argument('--force', action='store_true', help="also compact the open day")
+    prune_parser = commands.add_parser('prune', help="drop days past the retention window or byte budget")
+    prune_parser.add_argument('layers', nargs='*')
+    prune_parser.add_argument('--days', type=int, default=HISTORY_RETENTION_DAYS, help="days to keep")
+    prune_parser.add_argument('--max-bytes', type=int, default=HISTORY_MAX_BYTES,
+                              help="per-layer budget, oldest days go first (0: none)")
+    query_parser = commands.add_parser('query', help="write a time window as a FeatureCollection")
+    query_parser.add_argument('layer')
+    query_parser.add_argument('--start', help="ISO date or time, inclusive")
+    query_parser.add_argument('--end', help="ISO date or time, exclusive")
+    query_parser.add_argument('--type', dest='kind', help="only features of this properties.type")
+    query_parser.add_argument('--bbox', type=lambda s: tuple(float(v) for v in s.split(',')),
+                              help="west,south,east,north")
+    query_parser.add_argument('--limit', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'query':
+        features = query(layer_path(args.layer), args.start, args.end, args.kind, args.bbox, args.limit)
+        sys.stdout.write('{"type":"FeatureCollection","features":[')
+        for i, feature in enumerate(features):
+            sys.stdout.write((',' if i else '') + json.dumps(feature, separators=(',', ':')))
+        sys.stdout.write(']}\n')
+        return 0
+
+    for layer in layers(args.layers):
+        path = layer_path(layer)
+        if args.command == 'list':
+            info = summary(path)
+            size = sum(day['bytes'] for day in info['days'].values())
+            print(f"📚 {layer}: {len(info['days'])} days ({info['first_day']} .. {info['last_day']}), {size:,} B")
+        elif args.command == 'compact':
+            done = compact(path, force=args.force)
+            print(f"🗜️  {layer}: compacted {len(done)} days" + (f" ({sum(done.values()):,} features)" if done else ""))
+        elif args.command == 'prune':
+            removed = prune(path, args.days, max_bytes=args.max_bytes)
+            print(f"🧹 {layer}: removed {len(removed)} days (older than {args.days} days or past {args.max_bytes:,} B)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
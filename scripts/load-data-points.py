@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Terra Atlas Database Loader
+Bulk-loads existing public/data layer files into data_points (COPY + upsert),
+e.g. to backfill a fresh database. Fetch scripts load automatically when
+DATABASE_URL is set.
+"""
+
+import json
+import os
+import sys
+
+from ingest.config import load_env
+from ingest.pgload import DATABASE_URL, LAYER_SOURCES, load_features
+
+load_env()
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'public', 'data')
+
+def main():
+    dsn = os.getenv('DATABASE_URL', DATABASE_URL)
+    if not dsn:
+        print("❌ DATABASE_URL is not set")
+        return 1
+
+    layers = sys.argv[1:] or list(LAYER_SOURCES)
+    failures = 0
+    for layer in layers:
+        layer = layer.replace('.json', '')
+        source_id = LAYER_SOURCES.get(layer)
+        path = os.path.join(DATA_DIR, f"{layer}.json")
+        if source_id is None:
+            print(f"⚠️  {layer} has no data_sources entry, skipping")
+            continue
+        if not os.path.exists(path):
+            print(f"⚠️  {path} not found, skipping")
+            continue
+
+        with open(path) as f:
+            features = json.load(f).get('features', [])
+        try:
+            counts = load_features(source_id, features, dsn)
+            print(f"🗄️  {layer}: {counts['staged']} rows staged, {counts['merged']} inserted/updated"
+                  + (f", {counts['skipped']} without location" if counts['skipped'] else ""))
+        except Exception as e:
+            print(f"❌ {layer}: {e}")
+            failures += 1
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
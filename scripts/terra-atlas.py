@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Terra Atlas command line
+One fast-starting entry point for every ingest job; see ingest/cli.py.
+
+    python scripts/terra-atlas.py ingest usgs-earthquakes fires
+    python scripts/terra-atlas.py demo --fires 5000
+    python scripts/terra-atlas.py fetch real --profile
+    python scripts/terra-atlas.py history query volcanoes --start 2024-01-01
+
+Link it onto the PATH to run it as plain `terra-atlas`:
+
+    ln -s "$PWD/scripts/terra-atlas.py" /usr/local/bin/terra-atlas
+"""
+
+import os
+import sys
+
+# Resolve the ingest package next to this file, also when run through a symlink
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from ingest.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())